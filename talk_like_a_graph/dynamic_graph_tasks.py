@@ -0,0 +1,364 @@
+"""Graph tasks on graphs that change through a stream of edge updates.
+
+Each example describes a base graph with one of the usual encoders, followed by
+a log of edge insertions and deletions and a question about the graph after
+those updates. The answers are maintained incrementally while the updates are
+applied instead of being recomputed on the updated graph: degrees and the
+number of edges are counters, and connectivity is tracked with a union-find
+that only has to be rebuilt after a deletion.
+"""
+
+import collections
+from collections.abc import Iterator
+import random
+
+import networkx as nx
+
+from . import graph_cache
+from . import graph_tasks
+from . import graph_text_encoders
+
+
+class UnionFind:
+  """A union-find over the nodes of a graph, with path halving."""
+
+  def __init__(self, nodes):
+    self.parent = {node: node for node in nodes}
+    self.size = {node: 1 for node in nodes}
+    self.ncomponents = len(self.parent)
+
+  def find(self, node):
+    parent = self.parent
+    while parent[node] != node:
+      parent[node] = parent[parent[node]]
+      node = parent[node]
+    return node
+
+  def union(self, node1, node2) -> None:
+    root1, root2 = self.find(node1), self.find(node2)
+    if root1 == root2:
+      return
+    if self.size[root1] < self.size[root2]:
+      root1, root2 = root2, root1
+    self.parent[root2] = root1
+    self.size[root1] += self.size[root2]
+    self.ncomponents -= 1
+
+
+def is_simple_undirected(graph: nx.Graph) -> bool:
+  """Returns whether a graph is undirected, with no parallel edges or loops."""
+  return not (
+      graph.is_directed()
+      or graph.is_multigraph()
+      or nx.number_of_selfloops(graph)
+  )
+
+
+def simple_undirected_graph(graph: nx.Graph) -> nx.Graph:
+  """Returns the simple undirected graph underlying a graph."""
+  if is_simple_undirected(graph):
+    return graph
+  simple_graph = nx.Graph(graph.to_undirected())
+  simple_graph.remove_edges_from(list(nx.selfloop_edges(simple_graph)))
+  return simple_graph
+
+
+class DynamicGraph:
+  """An undirected graph under edge updates with incremental answers.
+
+  Attributes:
+    nodes: the nodes of the graph, which do not change.
+    edges: the current edges, as (node1, node2) tuples in no particular order.
+    degrees: the current degree of every node.
+  """
+
+  def __init__(self, graph: nx.Graph):
+    if not is_simple_undirected(graph):
+      raise ValueError('Dynamic graph tasks need simple undirected graphs.')
+    self.nodes = list(graph.nodes())
+    self.edges = []
+    # The position of each edge in `edges`, keyed by the frozenset of its nodes.
+    self._edge_positions = {}
+    self.degrees = dict.fromkeys(self.nodes, 0)
+    self._components = UnionFind(self.nodes)
+    # Deletions can split components, which a union-find cannot undo. It is
+    # then rebuilt from the current edges the next time it is needed.
+    self._components_stale = False
+    for node1, node2 in graph.edges():
+      self.add_edge(node1, node2)
+
+  @property
+  def nedges(self) -> int:
+    return len(self.edges)
+
+  def has_edge(self, node1, node2) -> bool:
+    return frozenset((node1, node2)) in self._edge_positions
+
+  def add_edge(self, node1, node2) -> None:
+    self._edge_positions[frozenset((node1, node2))] = len(self.edges)
+    self.edges.append((node1, node2))
+    self.degrees[node1] += 1
+    self.degrees[node2] += 1
+    if not self._components_stale:
+      self._components.union(node1, node2)
+
+  def remove_edge(self, node1, node2) -> None:
+    # Moving the last edge into the place of the removed one.
+    position = self._edge_positions.pop(frozenset((node1, node2)))
+    last_edge = self.edges.pop()
+    if position < len(self.edges):
+      self.edges[position] = last_edge
+      self._edge_positions[frozenset(last_edge)] = position
+    self.degrees[node1] -= 1
+    self.degrees[node2] -= 1
+    self._components_stale = True
+
+  def _get_components(self) -> UnionFind:
+    if self._components_stale:
+      self._components = UnionFind(self.nodes)
+      for node1, node2 in self.edges:
+        self._components.union(node1, node2)
+      self._components_stale = False
+    return self._components
+
+  def is_reachable(self, source, target) -> bool:
+    components = self._get_components()
+    return components.find(source) == components.find(target)
+
+  def has_cycle(self) -> bool:
+    # A simple undirected graph is a forest iff it has one edge less than nodes
+    # per connected component.
+    ncomponents = self._get_components().ncomponents
+    return self.nedges > len(self.nodes) - ncomponents
+
+
+def sample_update(
+    dynamic_graph: DynamicGraph, deletion_probability: float
+) -> tuple[bool, object, object]:
+  """Samples an edge update and applies it to the graph.
+
+  Args:
+    dynamic_graph: the graph to update. It needs at least two nodes.
+    deletion_probability: the probability of deleting an existing edge rather
+      than inserting a new one, when both are possible.
+
+  Returns:
+    An (is_insertion, node1, node2) tuple.
+  """
+  nnodes = len(dynamic_graph.nodes)
+  is_full = dynamic_graph.nedges == nnodes * (nnodes - 1) // 2
+  if dynamic_graph.edges and (
+      is_full or random.random() < deletion_probability
+  ):
+    node1, node2 = random.choice(dynamic_graph.edges)
+    dynamic_graph.remove_edge(node1, node2)
+    return False, node1, node2
+  while True:
+    node1, node2 = random.sample(dynamic_graph.nodes, k=2)
+    if not dynamic_graph.has_edge(node1, node2):
+      dynamic_graph.add_edge(node1, node2)
+      return True, node1, node2
+
+
+class DynamicGraphTask(graph_tasks.GraphTask):
+  """The parent class for the tasks on graphs changing through edge updates.
+
+  Every graph gets `num_updates` random edge updates, deleting an edge with
+  probability `deletion_probability` and inserting one otherwise. The graph is
+  asked `queries_per_graph` questions, after evenly spaced prefixes of the
+  updates ending with all of them. When there are more questions than updates,
+  several questions are asked after the same prefix. Each question sees the
+  base encoding of the graph and the log of the updates made before it.
+
+  The updates keep the graphs simple and undirected, so the tasks skip the
+  directed graphs, multigraphs and graphs with self-loops. Their few-shot
+  examples are made on the simple undirected graph underlying such graphs.
+  """
+
+  def __init__(
+      self,
+      num_updates: int = 10,
+      deletion_probability: float = 0.3,
+      queries_per_graph: int = 1,
+  ):
+    if num_updates < 0:
+      raise ValueError('num_updates must be non-negative.')
+    if queries_per_graph < 1:
+      raise ValueError('queries_per_graph must be positive.')
+    super().__init__()
+    self.num_updates = num_updates
+    self.deletion_probability = deletion_probability
+    self.queries_per_graph = queries_per_graph
+
+  def ask(
+      self, dynamic_graph: DynamicGraph, name_dict: dict[int, str]
+  ) -> tuple[str, str, list[int]]:
+    """Returns the task description, answer and node ids of a question."""
+    raise NotImplementedError()
+
+  def iterate_examples(
+      self,
+      graphs: list[nx.Graph],
+      generator_algorithms: list[str],
+      encoding_method: str,
+  ) -> Iterator[dict[str, str | list[int]]]:
+    name_dict = graph_text_encoders.get_tlag_node_encoder(None, encoding_method)
+    # The number of questions asked after each number of updates.
+    query_steps = collections.Counter(
+        round(self.num_updates * (query + 1) / self.queries_per_graph)
+        for query in range(self.queries_per_graph)
+    )
+    for ind, graph in enumerate(graphs):
+      if not is_simple_undirected(graph):
+        continue
+      encoded_graph = graph_cache.encode_graph(graph, encoding_method)
+      dynamic_graph = DynamicGraph(graph)
+      update_log = []
+      for step in range(self.num_updates + 1):
+        for _ in range(query_steps[step]):
+          task_description, answer, node_ids = self.ask(
+              dynamic_graph, name_dict
+          )
+          question = (
+              encoded_graph
+              + describe_updates(update_log, name_dict)
+              + task_description
+          )
+          # The sizes are those of the base graph, like 'graph'.
+          yield {
+              'question': question,
+              'answer': answer,
+              'nnodes': str(graph.number_of_nodes()),
+              'nedges': str(graph.number_of_edges()),
+              'task_description': task_description,
+              'graph': graph,
+              'algorithm': generator_algorithms[ind],
+              'node_ids': node_ids,
+          }
+        if step < self.num_updates:
+          update_log.append(
+              sample_update(dynamic_graph, self.deletion_probability)
+          )
+
+  def create_few_shot_example(
+      self, graph: nx.Graph, encoding_method: str, cot: bool
+  ) -> str:
+    graph = simple_undirected_graph(graph)
+    name_dict = graph_text_encoders.get_tlag_node_encoder(
+        graph, encoding_method
+    )
+    dynamic_graph = DynamicGraph(graph)
+    update_log = [
+        sample_update(dynamic_graph, self.deletion_probability)
+        for _ in range(self.num_updates)
+    ]
+    task_description, answer, _ = self.ask(dynamic_graph, name_dict)
+    return (
+        graph_cache.encode_graph(graph, encoding_method)
+        + describe_updates(update_log, name_dict)
+        + task_description
+        + answer
+    )
+
+
+def describe_updates(
+    update_log: list[tuple[bool, object, object]], name_dict: dict[int, str]
+) -> str:
+  """Encodes a log of edge updates as text."""
+  if not update_log:
+    return ''
+  lines = ['Then, the following changes are made to G, in order:\n']
+  for is_insertion, node1, node2 in update_log:
+    lines.append(
+        'The edge between node %s and node %s is %s.\n'
+        % (
+            name_dict[node1],
+            name_dict[node2],
+            'added' if is_insertion else 'removed',
+        )
+    )
+  return ''.join(lines)
+
+
+class DynamicNodeDegree(DynamicGraphTask):
+  """The task of finding the degree of a node after edge updates."""
+
+  def __init__(self, **kwargs):
+    super().__init__(**kwargs)
+    self.name = 'dynamic_node_degree'
+
+  def ask(
+      self, dynamic_graph: DynamicGraph, name_dict: dict[int, str]
+  ) -> tuple[str, str, list[int]]:
+    node = random.choice(dynamic_graph.nodes)
+    task_description = (
+        'Q: After these changes, what is the degree of node %s?\nA: '
+        % name_dict[node]
+    )
+    return task_description, '%d.' % dynamic_graph.degrees[node], [node]
+
+
+class DynamicEdgeCount(DynamicGraphTask):
+  """The task of counting the edges of a graph after edge updates."""
+
+  def __init__(self, **kwargs):
+    super().__init__(**kwargs)
+    self.name = 'dynamic_edge_count'
+
+  def ask(
+      self, dynamic_graph: DynamicGraph, name_dict: dict[int, str]
+  ) -> tuple[str, str, list[int]]:
+    task_description = (
+        'Q: After these changes, how many edges are in this graph?\nA: '
+    )
+    return task_description, '%d.' % dynamic_graph.nedges, []
+
+
+class DynamicReachability(DynamicGraphTask):
+  """The task of checking if there is a path between nodes after updates."""
+
+  def __init__(self, **kwargs):
+    super().__init__(**kwargs)
+    self.name = 'dynamic_reachability'
+
+  def ask(
+      self, dynamic_graph: DynamicGraph, name_dict: dict[int, str]
+  ) -> tuple[str, str, list[int]]:
+    source, target = random.sample(dynamic_graph.nodes, k=2)
+    task_description = (
+        'Q: After these changes, is there a path from node %s to node %s?\nA: '
+        % (name_dict[source], name_dict[target])
+    )
+    if dynamic_graph.is_reachable(source, target):
+      answer = 'Yes.'
+    else:
+      answer = 'No.'
+    return task_description, answer, [source, target]
+
+
+class DynamicCycleCheck(DynamicGraphTask):
+  """The task of checking if there is a cycle in a graph after updates."""
+
+  def __init__(self, **kwargs):
+    super().__init__(**kwargs)
+    self.name = 'dynamic_cycle_check'
+
+  def ask(
+      self, dynamic_graph: DynamicGraph, name_dict: dict[int, str]
+  ) -> tuple[str, str, list[int]]:
+    task_description = (
+        'Q: After these changes, is there a cycle in this graph?\nA: '
+    )
+    if dynamic_graph.has_cycle():
+      answer = 'Yes, there is a cycle.'
+    else:
+      answer = 'No, there is no cycle.'
+    return task_description, answer, []
+
+
+TASK_CLASS = {
+    'dynamic_node_degree': DynamicNodeDegree,
+    'dynamic_edge_count': DynamicEdgeCount,
+    'dynamic_reachability': DynamicReachability,
+    'dynamic_cycle_check': DynamicCycleCheck,
+}
@@ -0,0 +1,96 @@
+"""Testing for dynamic_graph_tasks.py."""
+
+import random
+
+import networkx as nx
+
+from . import dynamic_graph_tasks
+from absl.testing import absltest
+
+
+class DynamicGraphTasksTest(absltest.TestCase):
+
+  def test_incremental_answers_match_the_updated_graph(self):
+    random.seed(0)
+    graph = nx.gnp_random_graph(12, 0.2, seed=0)
+    dynamic_graph = dynamic_graph_tasks.DynamicGraph(graph)
+    updated_graph = graph.copy()
+    for _ in range(200):
+      is_insertion, node1, node2 = dynamic_graph_tasks.sample_update(
+          dynamic_graph, deletion_probability=0.5
+      )
+      if is_insertion:
+        updated_graph.add_edge(node1, node2)
+      else:
+        updated_graph.remove_edge(node1, node2)
+      self.assertEqual(dynamic_graph.nedges, updated_graph.number_of_edges())
+      self.assertEqual(dynamic_graph.degrees, dict(updated_graph.degree()))
+      self.assertEqual(
+          dynamic_graph.is_reachable(0, 11),
+          nx.has_path(updated_graph, 0, 11),
+      )
+      self.assertEqual(
+          dynamic_graph.has_cycle(), not nx.is_forest(updated_graph)
+      )
+
+  def test_examples_have_the_update_log(self):
+    random.seed(0)
+    task = dynamic_graph_tasks.DynamicEdgeCount(
+        num_updates=6, deletion_probability=0.0, queries_per_graph=3
+    )
+    examples_dict = task.prepare_examples_dict(
+        [nx.path_graph(5)], ['path'], 'adjacency'
+    )
+    self.assertLen(examples_dict, 3)
+    for query, value in examples_dict.items():
+      nupdates = 2 * (query + 1)
+      self.assertEqual(value['answer'], '%d.' % (4 + nupdates))
+      self.assertEqual(value['question'].count(' is added.\n'), nupdates)
+      self.assertTrue(value['question'].endswith(value['task_description']))
+      self.assertEqual((value['nnodes'], value['nedges']), ('5', '4'))
+
+  def test_more_queries_than_updates(self):
+    random.seed(0)
+    for num_updates, queries_per_graph in ((0, 3), (2, 4)):
+      task = dynamic_graph_tasks.DynamicEdgeCount(
+          num_updates=num_updates,
+          deletion_probability=0.0,
+          queries_per_graph=queries_per_graph,
+      )
+      examples_dict = task.prepare_examples_dict(
+          [nx.path_graph(5)], ['path'], 'adjacency'
+      )
+      self.assertLen(examples_dict, queries_per_graph)
+      self.assertEqual(
+          examples_dict[queries_per_graph - 1]['answer'],
+          '%d.' % (4 + num_updates),
+      )
+    for kwargs in (dict(num_updates=-1), dict(queries_per_graph=0)):
+      with self.assertRaises(ValueError):
+        dynamic_graph_tasks.DynamicEdgeCount(**kwargs)
+
+  def test_only_simple_undirected_graphs_have_examples(self):
+    random.seed(0)
+    task = dynamic_graph_tasks.DynamicNodeDegree(num_updates=2)
+    self_loop_graph = nx.path_graph(4)
+    self_loop_graph.add_edge(1, 1)
+    graphs = [
+        nx.DiGraph([(0, 1), (1, 2)]),
+        nx.MultiGraph([(0, 1), (0, 1), (1, 2)]),
+        self_loop_graph,
+        nx.path_graph(3),
+    ]
+    examples_dict = task.prepare_examples_dict(
+        graphs, ['path'] * len(graphs), 'adjacency'
+    )
+    self.assertLen(examples_dict, 1)
+    self.assertIs(examples_dict[0]['graph'], graphs[-1])
+    for graph in graphs[:-1]:
+      with self.assertRaises(ValueError):
+        dynamic_graph_tasks.DynamicGraph(graph)
+      example = task.create_few_shot_example(graph, 'adjacency', cot=False)
+      self.assertNotIn('(1, 1)', example)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,260 @@
+r"""Benchmarks the throughput of the graph encoders.
+
+This code encodes random graphs of increasing sizes with each graph encoder and
+reports the characters and edges encoded per second, the peak memory allocated
+while encoding and the size of the output. The results are written as JSON, and
+can be compared with the results of an earlier run to catch regressions, e.g.:
+
+python -m talk_like_a_graph.encoder_benchmark --output_path=new.json \
+  --baseline_path=old.json
+
+# Placeholder for Google-internal comments.
+"""
+
+from collections.abc import Sequence
+import json
+import platform
+import time
+import tracemalloc
+
+from absl import app
+from absl import flags
+import networkx as nx
+
+from . import graph_text_encoders
+
+_GRAPH_ENCODERS = flags.DEFINE_list(
+    "graph_encoders",
+    list(graph_text_encoders.EDGE_ENCODER_FN),
+    "The graph encoders to benchmark.",
+)
+_NUMBER_OF_EDGES = flags.DEFINE_list(
+    "number_of_edges",
+    ["10", "100", "1000", "10000", "100000", "1000000"],
+    "The numbers of edges of the benchmarked graphs.",
+)
+_AVERAGE_DEGREE = flags.DEFINE_integer(
+    "average_degree", 8, "The average degree of the benchmarked graphs."
+)
+_REPEATS = flags.DEFINE_integer(
+    "repeats", 3, "The number of timed encodings; the fastest one is kept."
+)
+_OUTPUT_PATH = flags.DEFINE_string(
+    "output_path", None, "The path of the JSON results."
+)
+_BASELINE_PATH = flags.DEFINE_string(
+    "baseline_path",
+    None,
+    "The path of the JSON results of an earlier run to compare with.",
+)
+_LABEL = flags.DEFINE_string(
+    "label", "", "A label for the run, e.g. the commit it benchmarks."
+)
+
+
+def benchmark_graph(number_of_edges: int, average_degree: int) -> nx.Graph:
+  """Returns a random undirected graph with the given number of edges.
+
+  The edges have an "id" attribute, so that nx_edge_encoder can encode them.
+
+  Args:
+    number_of_edges: the number of edges of the graph.
+    average_degree: the average degree of the nodes.
+  """
+  nnodes = max(2 * number_of_edges // average_degree, 2)
+  # Small graphs need enough nodes for their edges.
+  while nnodes * (nnodes - 1) // 2 < number_of_edges:
+    nnodes += 1
+  graph = nx.gnm_random_graph(nnodes, number_of_edges, seed=0)
+  nx.set_edge_attributes(graph, None, "id")
+  return graph
+
+
+def _encode(graph: nx.Graph, graph_encoder: str) -> str:
+  if graph_encoder == "nx_edge_encoder":
+    # An edge encoder only, which names the nodes by their networkx names.
+    return graph_text_encoders.encode_graph(
+        graph, node_encoder="nx_node_name", edge_encoder=graph_encoder
+    )
+  return graph_text_encoders.encode_graph(graph, graph_encoder)
+
+
+def benchmark_encoder(
+    graph: nx.Graph, graph_encoder: str, repeats: int = 3
+) -> dict[str, float | int | str]:
+  """Measures the encoding of a graph with a graph encoder.
+
+  The graph is encoded once before the timed encodings, which are timed
+  without tracing allocations since tracing slows them down. The allocations
+  are measured on one more encoding.
+
+  Args:
+    graph: the graph to encode.
+    graph_encoder: the name of the graph encoder.
+    repeats: the number of timed encodings. The fastest one is kept.
+
+  Returns:
+    A dict with the number of nodes and edges of the graph, the fastest encoding
+    time in seconds, the characters and edges encoded per second, the peak
+    memory allocated while encoding in bytes and the number of characters of the
+    encoding. Graphs the encoder does not support only have an "error".
+  """
+  result = {
+      "nodes": graph.number_of_nodes(),
+      "edges": graph.number_of_edges(),
+  }
+  # A first encoding, not timed, builds the shared name tables.
+  try:
+    _encode(graph, graph_encoder)
+  except (ValueError, KeyError, IndexError) as e:
+    result["error"] = "%s: %s" % (type(e).__name__, e)
+    return result
+  seconds = float("inf")
+  for _ in range(repeats):
+    start = time.perf_counter()
+    _encode(graph, graph_encoder)
+    seconds = min(seconds, time.perf_counter() - start)
+  tracemalloc.start()
+  try:
+    encoding = _encode(graph, graph_encoder)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+  finally:
+    tracemalloc.stop()
+  # Timers can report 0 seconds for the smallest graphs.
+  seconds = max(seconds, 1e-9)
+  result.update(
+      seconds=seconds,
+      chars_per_second=len(encoding) / seconds,
+      edges_per_second=graph.number_of_edges() / seconds,
+      peak_bytes=peak_bytes,
+      output_chars=len(encoding),
+  )
+  return result
+
+
+def run_benchmark(
+    graph_encoders: Sequence[str],
+    numbers_of_edges: Sequence[int],
+    average_degree: int = 8,
+    repeats: int = 3,
+) -> list[dict[str, float | int | str]]:
+  """Benchmarks graph encoders on random graphs of the given sizes.
+
+  Args:
+    graph_encoders: the names of the graph encoders.
+    numbers_of_edges: the numbers of edges of the graphs.
+    average_degree: the average degree of the graphs.
+    repeats: the number of timed encodings of each graph.
+
+  Returns:
+    The results of benchmark_encoder, with the "graph_encoder", for each graph
+    size and graph encoder.
+  """
+  results = []
+  for number_of_edges in numbers_of_edges:
+    graph = benchmark_graph(number_of_edges, average_degree)
+    for graph_encoder in graph_encoders:
+      result = {"graph_encoder": graph_encoder}
+      result.update(benchmark_encoder(graph, graph_encoder, repeats))
+      results.append(result)
+  return results
+
+
+def compare_results(
+    baseline: list[dict[str, float | int | str]],
+    results: list[dict[str, float | int | str]],
+) -> list[dict[str, float | int | str]]:
+  """Compares the results of two runs.
+
+  Args:
+    baseline: the results of the earlier run.
+    results: the results of the new run.
+
+  Returns:
+    For each graph encoder and number of edges measured by both runs, the
+    ratio of the new edges per second to the baseline ones ("speedup") and of
+    the new peak memory to the baseline one ("memory_ratio").
+  """
+  baseline_results = {
+      (result["graph_encoder"], result["edges"]): result
+      for result in baseline
+      if "error" not in result
+  }
+  comparison = []
+  for result in results:
+    key = (result["graph_encoder"], result["edges"])
+    if "error" in result or key not in baseline_results:
+      continue
+    baseline_result = baseline_results[key]
+    comparison.append({
+        "graph_encoder": result["graph_encoder"],
+        "edges": result["edges"],
+        "speedup": (
+            result["edges_per_second"] / baseline_result["edges_per_second"]
+        ),
+        "memory_ratio": (
+            result["peak_bytes"] / max(baseline_result["peak_bytes"], 1)
+        ),
+    })
+  return comparison
+
+
+def main(argv: Sequence[str]) -> None:
+  if len(argv) > 1:
+    raise app.UsageError("Too many command-line arguments.")
+
+  results = run_benchmark(
+      _GRAPH_ENCODERS.value,
+      [int(number_of_edges) for number_of_edges in _NUMBER_OF_EDGES.value],
+      _AVERAGE_DEGREE.value,
+      _REPEATS.value,
+  )
+  print(
+      "encoder", "edges", "chars/s", "edges/s", "peak MB", "chars", sep="\t"
+  )
+  for result in results:
+    if "error" in result:
+      print(result["graph_encoder"], result["edges"], result["error"], sep="\t")
+      continue
+    print(
+        result["graph_encoder"],
+        result["edges"],
+        "%.3g" % result["chars_per_second"],
+        "%.3g" % result["edges_per_second"],
+        "%.2f" % (result["peak_bytes"] / 2**20),
+        result["output_chars"],
+        sep="\t",
+    )
+
+  if _OUTPUT_PATH.value:
+    with open(_OUTPUT_PATH.value, "w") as f:
+      json.dump(
+          {
+              "label": _LABEL.value,
+              "python": platform.python_version(),
+              "networkx": nx.__version__,
+              "average_degree": _AVERAGE_DEGREE.value,
+              "repeats": _REPEATS.value,
+              "results": results,
+          },
+          f,
+          indent=2,
+      )
+
+  if _BASELINE_PATH.value:
+    with open(_BASELINE_PATH.value) as f:
+      baseline = json.load(f)
+    print()
+    print("encoder", "edges", "speedup", "memory ratio", sep="\t")
+    for comparison in compare_results(baseline["results"], results):
+      print(
+          comparison["graph_encoder"],
+          comparison["edges"],
+          "%.2fx" % comparison["speedup"],
+          "%.2fx" % comparison["memory_ratio"],
+          sep="\t",
+      )
+
+
+if __name__ == "__main__":
+  app.run(main)
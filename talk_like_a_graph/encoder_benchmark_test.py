@@ -0,0 +1,64 @@
+"""Testing for encoder_benchmark.py."""
+
+from . import encoder_benchmark
+from . import graph_text_encoders
+from absl.testing import absltest
+
+
+class EncoderBenchmarkTest(absltest.TestCase):
+
+  def test_benchmark_graph(self):
+    graph = encoder_benchmark.benchmark_graph(10, 8)
+    self.assertEqual(graph.number_of_edges(), 10)
+    graph = encoder_benchmark.benchmark_graph(1000, 8)
+    self.assertEqual(graph.number_of_edges(), 1000)
+    self.assertEqual(graph.number_of_nodes(), 250)
+
+  def test_run_benchmark(self):
+    results = encoder_benchmark.run_benchmark(
+        list(graph_text_encoders.EDGE_ENCODER_FN), [10, 100], repeats=1
+    )
+    self.assertLen(results, 2 * len(graph_text_encoders.EDGE_ENCODER_FN))
+    graph = encoder_benchmark.benchmark_graph(100, 8)
+    for result in results:
+      if result['graph_encoder'] == 'expert':
+        # The expert names have no node encoder.
+        self.assertIn('error', result)
+        continue
+      self.assertNotIn('error', result)
+      self.assertGreater(result['edges_per_second'], 0)
+      self.assertGreater(result['peak_bytes'], 0)
+      if result['edges'] == 100 and result['graph_encoder'] == 'adjacency':
+        self.assertEqual(
+            result['output_chars'],
+            len(graph_text_encoders.encode_graph(graph, 'adjacency')),
+        )
+
+  def test_compare_results(self):
+    baseline = [
+        {
+            'graph_encoder': 'adjacency',
+            'edges': 10,
+            'edges_per_second': 100.0,
+            'peak_bytes': 1000,
+        },
+        {'graph_encoder': 'expert', 'edges': 10, 'error': 'ValueError'},
+    ]
+    results = [
+        dict(baseline[0], edges_per_second=200.0, peak_bytes=500),
+        {'graph_encoder': 'expert', 'edges': 10, 'error': 'ValueError'},
+        dict(baseline[0], edges=100),
+    ]
+    self.assertEqual(
+        encoder_benchmark.compare_results(baseline, results),
+        [{
+            'graph_encoder': 'adjacency',
+            'edges': 10,
+            'speedup': 2.0,
+            'memory_ratio': 0.5,
+        }],
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,75 @@
+r"""Reports the number of tokens the graph encoders spend per node and edge.
+
+This code generates random graphs and encodes them with each graph encoder,
+then prints the tokens per node and per edge under a SentencePiece vocabulary.
+
+# Placeholder for Google-internal comments.
+"""
+
+from collections.abc import Sequence
+import math
+
+from absl import app
+from absl import flags
+import seqio
+
+from . import graph_generators
+from . import graph_text_encoders
+
+_VOCAB_PATH = flags.DEFINE_string(
+    "vocab_path",
+    None,
+    "The path of the SentencePiece vocabulary to count tokens with.",
+    required=True,
+)
+_ALGORITHMS = flags.DEFINE_list(
+    "algorithms", ["er"], "The graph generating algorithms to use."
+)
+_NUMBER_OF_GRAPHS = flags.DEFINE_integer(
+    "number_of_graphs", 100, "The number of graphs per algorithm."
+)
+_DIRECTED = flags.DEFINE_bool(
+    "directed", False, "Whether to generate directed graphs."
+)
+_GRAPH_ENCODERS = flags.DEFINE_list(
+    "graph_encoders",
+    list(graph_text_encoders.EDGE_ENCODER_FN),
+    "The graph encoders to report on.",
+)
+
+
+def main(argv: Sequence[str]) -> None:
+  if len(argv) > 1:
+    raise app.UsageError("Too many command-line arguments.")
+
+  graphs = []
+  for algorithm in _ALGORITHMS.value:
+    graphs += graph_generators.generate_graphs(
+        number_of_graphs=_NUMBER_OF_GRAPHS.value,
+        algorithm=algorithm,
+        directed=_DIRECTED.value,
+    )
+  sp_vocab = seqio.SentencePieceVocabulary(_VOCAB_PATH.value)
+  report = graph_text_encoders.measure_tokens(
+      graphs, _GRAPH_ENCODERS.value, sp_vocab.encode
+  )
+  print("encoder", "graphs", "tokens/node", "tokens/edge", sep="\t")
+  # The most compact encoders first, then the ones without measurements.
+  for graph_encoder, stats in sorted(
+      report.items(),
+      key=lambda item: (
+          math.isnan(item[1]["tokens_per_edge"]),
+          item[1]["tokens_per_edge"],
+      ),
+  ):
+    print(
+        graph_encoder,
+        stats["graphs"],
+        "%.2f" % stats["tokens_per_node"],
+        "%.2f" % stats["tokens_per_edge"],
+        sep="\t",
+    )
+
+
+if __name__ == "__main__":
+  app.run(main)
@@ -0,0 +1,351 @@
+"""Per-graph state shared by all the tasks and encoders run on a graph.
+
+The state is keyed by the graph object and released together with it. Graphs
+are assumed not to gain or lose nodes or edges once their state is built.
+
+Values that only depend on the content of a graph (its encodings, the answers
+of some tasks, its graph tensor) are also memoized by the fingerprint of the
+graph, so that identical graphs, e.g. all complete or path graphs of one size,
+only compute them once.
+
+Encodings can also be kept on disk in an EncodingStore (see
+set_encoding_store), which outlives the process and is shared by the workers
+of graph_tasks_parallel, so later runs do not encode the same graphs again.
+"""
+
+import collections
+from collections.abc import Callable, Hashable
+import hashlib
+import os
+import sys
+import tempfile
+from typing import Any
+import weakref
+
+import networkx as nx
+
+from . import graph_index
+from . import graph_text_encoders
+
+# Graph encoders drawing random node names on every call. Their output is never
+# reused so that each call keeps its own names and random draws.
+_RANDOM_GRAPH_ENCODERS = frozenset({'random'})
+
+# The number of values memoized by graph fingerprint, and their estimated
+# memory in bytes (see _value_nbytes). The least recently used ones are dropped
+# first, and values larger than MEMO_MAX_BYTES, e.g. the encodings of huge
+# graphs, are not kept at all.
+MEMO_SIZE = 4096
+MEMO_MAX_BYTES = 2**30
+
+# The number of edges from which graphs are encoded from their index with
+# graph_text_encoders.encode_edge_arrays. Below it, building the index costs
+# more than it saves.
+ARRAY_ENCODING_MIN_EDGES = 2048
+
+_INDICES = weakref.WeakKeyDictionary()
+# From memo key to (value, estimated bytes).
+_MEMO = collections.OrderedDict()
+_MEMO_STATS = collections.Counter()
+_memo_nbytes = 0
+
+
+class EncodingStore:
+  """An on-disk store of graph encodings keyed by graph fingerprint and encoder.
+
+  Each encoding is a text file, written to a temporary file first and renamed,
+  so that several processes can share a store.
+
+  Unlike the graphs and the tasks, which are read and written through os.Open,
+  the store uses builtin files: it is a local cache of a machine, and the
+  atomic renames of temporary files it relies on are not available on all the
+  file systems os.Open reaches. Its directory must therefore be a local path,
+  rather than one on the storage of --graphs_dir or --task_dir.
+
+  Attributes:
+    directory: the root directory of the store.
+  """
+
+  # Part of the paths, to be bumped when the encoders or the name dictionaries
+  # change the encodings of a graph.
+  VERSION = 'v1'
+
+  def __init__(self, directory: str):
+    self.directory = directory
+
+  def path(self, fingerprint: str, graph_encoder: str) -> str:
+    return os.path.join(
+        self.directory,
+        self.VERSION,
+        fingerprint[:2],
+        '%s.%s.txt' % (fingerprint, graph_encoder),
+    )
+
+  def get(self, fingerprint: str, graph_encoder: str) -> str | None:
+    """Returns the stored encoding, or None if there is none."""
+    try:
+      with open(
+          self.path(fingerprint, graph_encoder), encoding='utf-8', newline=''
+      ) as f:
+        return f.read()
+    except FileNotFoundError:
+      return None
+
+  def put(self, fingerprint: str, graph_encoder: str, encoding: str) -> None:
+    path = self.path(fingerprint, graph_encoder)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        'w',
+        encoding='utf-8',
+        newline='',
+        dir=os.path.dirname(path),
+        delete=False,
+    ) as f:
+      f.write(encoding)
+    os.replace(f.name, path)
+
+
+_ENCODING_STORE = None
+
+
+def set_encoding_store(directory: str | None) -> None:
+  """Keeps the encodings in an EncodingStore in directory, or in memory only."""
+  global _ENCODING_STORE
+  _ENCODING_STORE = None if directory is None else EncodingStore(directory)
+
+
+def encoding_store_directory() -> str | None:
+  """Returns the directory of the encoding store, if there is one."""
+  return None if _ENCODING_STORE is None else _ENCODING_STORE.directory
+
+
+def get_index(graph: nx.Graph) -> graph_index.GraphIndex:
+  """Returns the GraphIndex of the graph, building it on first use.
+
+  Identical graphs share one index, and with it its cached distances and name
+  orders.
+
+  Args:
+    graph: the graph to index.
+
+  Returns:
+    The index of the graph or of an identical one.
+  """
+  if graph not in _INDICES:
+    index = graph_index.GraphIndex(graph)
+    _INDICES[graph] = _memoize(('index', index.fingerprint()), lambda: index)
+  return _INDICES[graph]
+
+
+def graph_fingerprint(graph: nx.Graph) -> str:
+  """Returns the fingerprint of the nodes and edges of the graph."""
+  return get_index(graph).fingerprint()
+
+
+def edge_data_fingerprint(graph: nx.Graph) -> str:
+  """Returns a hash of the attributes of the edges, e.g. their weights.
+
+  It is computed on every call as attributes may be added to a graph after its
+  state is built.
+
+  Args:
+    graph: the graph to hash the edges of.
+
+  Returns:
+    A hex digest.
+  """
+  return hashlib.blake2b(
+      repr(list(graph.edges(data=True))).encode(), digest_size=16
+  ).hexdigest()
+
+
+def node_data_fingerprint(graph: nx.Graph) -> str:
+  """Returns a hash of the attributes of the nodes, e.g. their SBM blocks.
+
+  Like edge_data_fingerprint, it is computed on every call.
+
+  Args:
+    graph: the graph to hash the nodes of.
+
+  Returns:
+    A hex digest.
+  """
+  return hashlib.blake2b(
+      repr(list(graph.nodes(data=True))).encode(), digest_size=16
+  ).hexdigest()
+
+
+def memoize(
+    graph: nx.Graph,
+    key: Hashable,
+    compute: Callable[[], Any],
+    with_edge_data: bool = False,
+    nbytes: int | None = None,
+    with_node_data: bool = False,
+) -> Any:
+  """Returns compute(), reusing the value computed for an identical graph.
+
+  Args:
+    graph: the graph the value is computed from.
+    key: what is computed, e.g. the name of a task oracle and its query.
+    compute: computes the value. It must only depend on the nodes and edges of
+      the graph, and also on the edge attributes if with_edge_data is set and
+      on the node attributes if with_node_data is set.
+    with_edge_data: whether the value depends on the edge attributes.
+    nbytes: the estimated memory of the value in bytes, for values whose size
+      _value_nbytes cannot measure, e.g. graph tensors.
+    with_node_data: whether the value depends on the node attributes.
+
+  Returns:
+    The value of compute() for the graph.
+  """
+  memo_key = (graph_fingerprint(graph), key)
+  if with_edge_data:
+    memo_key += (edge_data_fingerprint(graph),)
+  if with_node_data:
+    memo_key += ('nodes', node_data_fingerprint(graph))
+  return _memoize(memo_key, compute, nbytes)
+
+
+def _value_nbytes(value: Any) -> int:
+  """Estimates the memory of a memoized value in bytes."""
+  if isinstance(value, graph_index.GraphIndex):
+    return value.nbytes()
+  if hasattr(value, 'ByteSize'):
+    # Protocol buffers, e.g. serialized graphs.
+    return value.ByteSize()
+  return sys.getsizeof(value)
+
+
+def _memoize(
+    memo_key: Hashable, compute: Callable[[], Any], nbytes: int | None = None
+) -> Any:
+  global _memo_nbytes
+  if memo_key in _MEMO:
+    _MEMO.move_to_end(memo_key)
+    _MEMO_STATS['hits'] += 1
+    return _MEMO[memo_key][0]
+  _MEMO_STATS['misses'] += 1
+  value = compute()
+  if nbytes is None:
+    nbytes = _value_nbytes(value)
+  if nbytes > MEMO_MAX_BYTES:
+    return value
+  _MEMO[memo_key] = (value, nbytes)
+  _memo_nbytes += nbytes
+  while len(_MEMO) > MEMO_SIZE or _memo_nbytes > MEMO_MAX_BYTES:
+    _, (_, dropped_nbytes) = _MEMO.popitem(last=False)
+    _memo_nbytes -= dropped_nbytes
+  return value
+
+
+def is_reusable(graph_encoder: str) -> bool:
+  """Returns whether the encodings of a graph encoder are reused.
+
+  Encoding a graph again with the other graph encoders gives the same text
+  without drawing random numbers.
+
+  Args:
+    graph_encoder: the name of the graph encoder.
+  """
+  return graph_encoder not in _RANDOM_GRAPH_ENCODERS
+
+
+def encode_graph(graph: nx.Graph, graph_encoder: str) -> str:
+  """Encodes a graph as text, reusing earlier encodings of identical graphs.
+
+  Args:
+    graph: the graph to be encoded.
+    graph_encoder: the name of the graph encoder to use.
+
+  Returns:
+    The same string as `graph_text_encoders.encode_graph(graph, graph_encoder)`.
+  """
+  if graph_encoder in _RANDOM_GRAPH_ENCODERS:
+    return graph_text_encoders.encode_graph(graph, graph_encoder)
+  fingerprint = graph_fingerprint(graph)
+  return _memoize(
+      (fingerprint, ('encoding', graph_encoder)),
+      lambda: _load_or_encode(graph, graph_encoder, fingerprint),
+  )
+
+
+def _load_or_encode(
+    graph: nx.Graph, graph_encoder: str, fingerprint: str
+) -> str:
+  if _ENCODING_STORE is not None:
+    encoding = _ENCODING_STORE.get(fingerprint, graph_encoder)
+    if encoding is not None:
+      _MEMO_STATS['store_hits'] += 1
+      return encoding
+  if graph.number_of_edges() >= ARRAY_ENCODING_MIN_EDGES:
+    encoding = graph_text_encoders.encode_edge_arrays(
+        graph, graph_encoder, *get_index(graph).edge_arrays()
+    )
+  else:
+    encoding = graph_text_encoders.encode_graph(graph, graph_encoder)
+  if _ENCODING_STORE is not None:
+    _ENCODING_STORE.put(fingerprint, graph_encoder, encoding)
+  return encoding
+
+
+def prefill_encodings(graph: nx.Graph, graph_encoders: list[str]) -> None:
+  """Memoizes the encodings of a graph with several encoders in one pass.
+
+  The encodings that are neither memoized nor in the encoding store are
+  rendered together by graph_text_encoders.encode_graph_multi, so that the
+  encode_graph calls of the tasks run on the graph afterwards are memo hits.
+  Random encoders are skipped, as their encodings are never reused.
+
+  Args:
+    graph: the graph to be encoded.
+    graph_encoders: the names of the graph encoders to use.
+  """
+  fingerprint = graph_fingerprint(graph)
+  missing = [
+      graph_encoder
+      for graph_encoder in dict.fromkeys(graph_encoders)
+      if graph_encoder not in _RANDOM_GRAPH_ENCODERS
+      and (fingerprint, ('encoding', graph_encoder)) not in _MEMO
+  ]
+  encodings = {}
+  if _ENCODING_STORE is not None:
+    for graph_encoder in missing:
+      encoding = _ENCODING_STORE.get(fingerprint, graph_encoder)
+      if encoding is not None:
+        _MEMO_STATS['store_hits'] += 1
+        encodings[graph_encoder] = encoding
+  missing = [
+      graph_encoder
+      for graph_encoder in missing
+      if graph_encoder not in encodings
+  ]
+  if missing:
+    edge_arrays = None
+    if graph.number_of_edges() >= ARRAY_ENCODING_MIN_EDGES:
+      edge_arrays = get_index(graph).edge_arrays()
+    rendered = graph_text_encoders.encode_graph_multi(
+        graph, missing, edge_arrays
+    )
+    if _ENCODING_STORE is not None:
+      for graph_encoder, encoding in rendered.items():
+        _ENCODING_STORE.put(fingerprint, graph_encoder, encoding)
+    encodings.update(rendered)
+  for graph_encoder, encoding in encodings.items():
+    _memoize(
+        (fingerprint, ('encoding', graph_encoder)), lambda value=encoding: value
+    )
+
+
+def memo_stats() -> dict[str, int]:
+  """Returns the number of memo and store hits and misses since clear()."""
+  return dict(_MEMO_STATS)
+
+
+def clear() -> None:
+  """Drops the in-memory state of all graphs."""
+  global _memo_nbytes
+  _INDICES.clear()
+  _MEMO.clear()
+  _MEMO_STATS.clear()
+  _memo_nbytes = 0
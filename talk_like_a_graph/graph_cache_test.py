@@ -0,0 +1,130 @@
+"""Testing for graph_cache.py."""
+
+import tempfile
+from unittest import mock
+
+import networkx as nx
+
+from . import graph_cache
+from . import graph_text_encoders
+from absl.testing import absltest
+
+
+class GraphCacheTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    graph_cache.clear()
+
+  def test_identical_graphs_share_index_and_encoding(self):
+    graph = nx.path_graph(5)
+    same_graph = nx.path_graph(5)
+    self.assertIs(
+        graph_cache.get_index(graph), graph_cache.get_index(same_graph)
+    )
+    self.assertEqual(
+        graph_cache.encode_graph(graph, 'adjacency'),
+        graph_text_encoders.encode_graph(graph, 'adjacency'),
+    )
+    graph_cache.encode_graph(same_graph, 'adjacency')
+    self.assertEqual(graph_cache.memo_stats(), {'hits': 2, 'misses': 2})
+
+  def test_prefill_encodings(self):
+    graph = nx.cycle_graph(6)
+    graph_cache.prefill_encodings(
+        graph, ['adjacency', 'friendship', 'random', 'adjacency']
+    )
+    self.assertEqual(graph_cache.memo_stats(), {'misses': 3})
+    for graph_encoder in ('adjacency', 'friendship'):
+      self.assertEqual(
+          graph_cache.encode_graph(graph, graph_encoder),
+          graph_text_encoders.encode_graph(graph, graph_encoder),
+      )
+    self.assertEqual(graph_cache.memo_stats(), {'hits': 2, 'misses': 3})
+
+  def test_encoding_store(self):
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    graph_cache.set_encoding_store(directory.name)
+    self.addCleanup(graph_cache.set_encoding_store, None)
+    graph = nx.star_graph(4)
+    encoding = graph_cache.encode_graph(graph, 'incident')
+    graph_cache.prefill_encodings(
+        graph, ['incident', 'coauthorship', 'politician']
+    )
+    graph_cache.clear()
+    self.assertEqual(graph_cache.encode_graph(graph, 'incident'), encoding)
+    graph_cache.prefill_encodings(graph, ['politician'])
+    self.assertEqual(
+        graph_cache.encode_graph(nx.star_graph(4), 'politician'),
+        graph_text_encoders.encode_graph(graph, 'politician'),
+    )
+    self.assertEqual(
+        graph_cache.memo_stats(), {'hits': 2, 'misses': 3, 'store_hits': 2}
+    )
+
+  def test_edge_order_is_part_of_the_fingerprint(self):
+    self.assertNotEqual(
+        graph_cache.graph_fingerprint(nx.Graph([(0, 1), (1, 2)])),
+        graph_cache.graph_fingerprint(nx.Graph([(1, 2), (0, 1)])),
+    )
+    self.assertNotEqual(
+        graph_cache.graph_fingerprint(nx.path_graph(3)),
+        graph_cache.graph_fingerprint(nx.path_graph(3, nx.DiGraph)),
+    )
+
+  def test_memoize_with_edge_data(self):
+    graph = nx.Graph([(0, 1)])
+    weighted_graph = nx.Graph([(0, 1, {'weight': 3})])
+    self.assertEqual(graph_cache.memoize(graph, 'value', lambda: 1), 1)
+    self.assertEqual(graph_cache.memoize(weighted_graph, 'value', lambda: 2), 1)
+    self.assertEqual(
+        graph_cache.memoize(
+            weighted_graph, 'value', lambda: 2, with_edge_data=True
+        ),
+        2,
+    )
+
+  def test_memoize_with_node_data(self):
+    graph = nx.Graph([(0, 1)])
+    labeled_graph = nx.Graph([(0, 1)])
+    nx.set_node_attributes(labeled_graph, {0: 0, 1: 1}, name='block')
+    self.assertEqual(
+        graph_cache.memoize(graph, 'value', lambda: 1, with_node_data=True), 1
+    )
+    self.assertEqual(
+        graph_cache.memoize(
+            labeled_graph, 'value', lambda: 2, with_node_data=True
+        ),
+        2,
+    )
+    self.assertEqual(
+        graph_cache.memoize(
+            nx.Graph([(0, 1)]), 'value', lambda: 3, with_node_data=True
+        ),
+        1,
+    )
+
+  def test_memo_is_bounded_by_bytes(self):
+    self.enter_context(
+        mock.patch.object(graph_cache, 'MEMO_MAX_BYTES', 10_000)
+    )
+    graphs = [nx.path_graph(nnodes) for nnodes in range(1, 5)]
+    for graph in graphs:
+      graph_cache.memoize(graph, 'value', lambda: 'old' * 1000)
+    self.assertEqual(
+        graph_cache.memoize(graphs[-1], 'value', lambda: 'new'), 'old' * 1000
+    )
+    # The oldest values were dropped to stay within the budget.
+    self.assertEqual(
+        graph_cache.memoize(graphs[0], 'value', lambda: 'new'), 'new'
+    )
+    # Values over the budget are not kept.
+    graph_cache.memoize(graphs[0], 'large', lambda: 'old' * 10_000)
+    self.assertEqual(
+        graph_cache.memoize(graphs[0], 'large', lambda: 'new'), 'new'
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
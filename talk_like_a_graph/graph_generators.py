@@ -16,6 +16,11 @@ _NUMBER_OF_COMMUNITIES_RANGE = {
     "medium": np.arange(2, 8),
     "large": np.arange(2, 10),
 }
+# The file written next to <ind>.graphml with the SBM block of each node.
+BLOCK_LABELS_SUFFIX = ".blocks.npy"
+# The algorithms whose graphs keep the SBM block of each node, as the labels of
+# the node classification task.
+BLOCK_LABELED_ALGORITHMS = ("two_block_sbm",)
 
 
 def generate_graphs(
@@ -102,6 +107,22 @@ def generate_graphs(
       # sbm graph generator automatically adds dictionary attributes.
       sbm_graph = remove_graph_data(sbm_graph)
       generated_graphs.append(sbm_graph)
+  elif algorithm == "two_block_sbm":
+    # Two equal communities, for the node classification task.
+    for _ in range(number_of_graphs):
+      # Sampling a small number as the probability of the two nodes in
+      # different communities being connected.
+      small_number = random.uniform(0, 0.05)
+      # Sampling a large number as probability of the nodes in one community
+      # being connected.
+      large_number = random.uniform(0.6, 0.8)
+      number_of_nodes = random.choice(np.arange(5, 20))
+      sizes = [number_of_nodes // 2, number_of_nodes // 2]
+      probs = [[large_number, small_number], [small_number, large_number]]
+      sbm_graph = nx.stochastic_block_model(
+          sizes, probs, seed=random_state, directed=directed
+      )
+      generated_graphs.append(remove_graph_data(sbm_graph, keep_blocks=True))
   elif algorithm == "sfn":
     for i in range(number_of_graphs):
       number_of_nodes = random.choice(_NUMBER_OF_NODES_RANGE[graph_sizes[i]])
@@ -139,16 +160,42 @@ def generate_graphs(
   return generated_graphs
 
 
-def remove_graph_data(graph: nx.Graph) -> nx.Graph:
-  # GraphML writer does not support dictionary data for nodes or graphs.
-  for ind in range((graph.number_of_nodes())):
-    graph.nodes[ind].pop("block", None)
+def remove_graph_data(graph: nx.Graph, keep_blocks: bool = False) -> nx.Graph:
+  # GraphML writer does not support dictionary data for nodes or graphs. The
+  # kept blocks are stored next to the graph by write_graphs.
+  if not keep_blocks:
+    for node in graph.nodes():
+      graph.nodes[node].pop("block", None)
   graph_data_keys = list(graph.graph.keys())
   for _, node in enumerate(graph_data_keys):
     graph.graph.pop(node, None)
   return graph
 
 
+def get_block_labels(graph: nx.Graph) -> np.ndarray | None:
+  """Returns the SBM block of each node in node order, if the graph has them."""
+  blocks = [data.get("block") for _, data in graph.nodes(data=True)]
+  if not blocks or None in blocks:
+    return None
+  return np.asarray(blocks, dtype=np.int32)
+
+
+def set_block_labels(graph: nx.Graph, block_labels: np.ndarray) -> nx.Graph:
+  """Sets the SBM block of each node from an array in node order."""
+  nx.set_node_attributes(
+      graph, dict(zip(graph.nodes(), block_labels.tolist())), name="block"
+  )
+  return graph
+
+
+def without_block_labels(graph: nx.Graph) -> nx.Graph:
+  """Returns a copy of the graph without the SBM blocks of its nodes."""
+  graph = graph.copy()
+  for _, data in graph.nodes(data=True):
+    data.pop("block", None)
+  return graph
+
+
 def randomize_directions(graph: nx.Graph) -> nx.DiGraph:
   # Converting the undirected graph to a directed graph.
   directed_graph = graph.to_directed()
@@ -11,6 +11,7 @@ import os
 from absl import app
 from absl import flags
 import networkx as nx
+import numpy as np
 
 # Internal import.
 from . import graph_generators
@@ -41,11 +42,32 @@ _MAX_SPARSITY = flags.DEFINE_float("max_sparsity", 1.0, "The maximum sparsity.")
 
 
 def write_graphs(graphs: list[nx.Graph], output_dir: str) -> None:
+  """Writes each graph to <ind>.graphml.
+
+  The SBM blocks of the nodes are written to <ind>.blocks.npy, in node order,
+  rather than as GraphML node data. graph_tasks_utils.load_graphs restores
+  them.
+
+  Args:
+    graphs: the graphs to write.
+    output_dir: the directory to write the graphs to.
+  """
   if not os.path.isdir(output_dir):
     os.makedirs(output_dir)
   for ind, graph in enumerate(graphs):
+    block_labels = graph_generators.get_block_labels(graph)
+    if block_labels is not None:
+      np.save(
+          os.Open(
+              os.path.join(
+                  output_dir, str(ind) + graph_generators.BLOCK_LABELS_SUFFIX
+              ),
+              "wb",
+          ),
+          block_labels,
+      )
     nx.write_graphml(
-        graph,
+        graph_generators.without_block_labels(graph),
         os.Open(
             os.path.join(output_dir, str(ind) + ".graphml"),
             "wb",
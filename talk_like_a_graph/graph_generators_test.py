@@ -66,6 +66,16 @@ class GraphGenerationTest(absltest.TestCase, parameterized.TestCase):
           algorithm='sbm',
           directed=True,
       ),
+      dict(
+          testcase_name='two_block_sbm_undirected',
+          algorithm='two_block_sbm',
+          directed=False,
+      ),
+      dict(
+          testcase_name='two_block_sbm_directed',
+          algorithm='two_block_sbm',
+          directed=True,
+      ),
       dict(
           testcase_name='sfn_undirected',
           algorithm='sfn',
@@ -111,6 +121,24 @@ class GraphGenerationTest(absltest.TestCase, parameterized.TestCase):
     generated_graph = graph_generators.generate_graphs(1, algorithm, directed)
     self.assertEqual(generated_graph[0].is_directed(), directed)
 
+  def test_block_labels(self):
+    graph = graph_generators.generate_graphs(1, 'two_block_sbm', False)[0]
+    block_labels = graph_generators.get_block_labels(graph)
+    nnodes = graph.number_of_nodes()
+    self.assertEqual(
+        block_labels.tolist(), [0] * (nnodes // 2) + [1] * (nnodes // 2)
+    )
+    stripped_graph = graph_generators.without_block_labels(graph)
+    self.assertIsNone(graph_generators.get_block_labels(stripped_graph))
+    graph_generators.set_block_labels(stripped_graph, block_labels)
+    self.assertEqual(
+        dict(stripped_graph.nodes(data='block')),
+        dict(graph.nodes(data='block')),
+    )
+    for directed in (False, True):
+      graph = graph_generators.generate_graphs(1, 'sbm', directed)[0]
+      self.assertIsNone(graph_generators.get_block_labels(graph))
+
 
 if __name__ == '__main__':
   googletest.main()
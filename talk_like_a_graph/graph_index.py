@@ -0,0 +1,400 @@
+"""Array-based indices over graphs for computing task answers quickly."""
+
+import hashlib
+import random
+
+import networkx as nx
+import numpy as np
+
+# The number of source nodes whose BFS distances an index caches, and of name
+# dicts whose node names and orders it caches. The oldest entries are dropped
+# first, so that the memory of an index is bounded (see GraphIndex.nbytes).
+_MAX_CACHED_SOURCES = 16
+_MAX_CACHED_NAME_DICTS = 4
+# Rough bytes per node of the node list and the position dict.
+_NODE_BYTES = 128
+
+
+class GraphIndex:
+  """A CSR neighbor index over a networkx graph.
+
+  Nodes are addressed by their position in `graph.nodes()`. The targets of each
+  node are stored in the order `graph.edges(node)` yields them (including
+  parallel edges of multigraphs), so answers computed from the index match the
+  ones computed from the graph itself.
+  """
+
+  def __init__(self, graph: nx.Graph):
+    self.is_directed = graph.is_directed()
+    self.is_multigraph = graph.is_multigraph()
+    self.nodes = list(graph.nodes())
+    self.position = {node: ind for ind, node in enumerate(self.nodes)}
+    position = self.position
+    if graph.is_multigraph():
+      rows = [
+          [
+              position[target]
+              for target, keys in graph.adj[node].items()
+              for _ in keys
+          ]
+          for node in self.nodes
+      ]
+    else:
+      rows = [
+          [position[target] for target in graph.adj[node]]
+          for node in self.nodes
+      ]
+    degrees = np.fromiter((len(row) for row in rows), dtype=np.int64)
+    self.indptr = np.concatenate(([0], np.cumsum(degrees)))
+    self.indices = np.fromiter(
+        (target for row in rows for target in row),
+        dtype=np.int64,
+        count=int(self.indptr[-1]),
+    )
+    self._fingerprint = None
+    self._reverse = None
+    self._distances = {}
+    # Per name dict caches. The name dict itself is kept alongside the cached
+    # value so that its id cannot be reused while the entry is alive. Random
+    # name dicts are new on every call, so only the last few are kept.
+    self._node_names = {}
+    self._name_orders = {}
+
+  def __len__(self) -> int:
+    return len(self.nodes)
+
+  def nbytes(self) -> int:
+    """Returns an upper bound of the memory of the index and its caches."""
+    nnodes = len(self.nodes)
+    arrays_nbytes = self.indptr.nbytes + self.indices.nbytes
+    if self.is_directed:
+      # The reversed CSR of sources_of.
+      arrays_nbytes *= 2
+    return (
+        arrays_nbytes
+        + _NODE_BYTES * nnodes
+        + _MAX_CACHED_SOURCES * 8 * nnodes
+        + _MAX_CACHED_NAME_DICTS * 16 * nnodes
+    )
+
+  def fingerprint(self) -> str:
+    """Returns a hash of the nodes and edges of the graph, in their order.
+
+    Graphs with the same fingerprint have the same nodes and edges, visited in
+    the same order, so they get the same encodings and answers. Edge and node
+    attributes are not part of the fingerprint.
+
+    Returns:
+      A hex digest.
+    """
+    if self._fingerprint is None:
+      digest = hashlib.blake2b(digest_size=16)
+      digest.update(
+          repr((self.is_directed, self.is_multigraph, self.nodes)).encode()
+      )
+      digest.update(self.indptr.tobytes())
+      digest.update(self.indices.tobytes())
+      self._fingerprint = digest.hexdigest()
+    return self._fingerprint
+
+  def neighbors(self, node) -> np.ndarray:
+    """Returns the positions of the targets of `node`, in edge order."""
+    ind = self.position[node]
+    return self.indices[self.indptr[ind] : self.indptr[ind + 1]]
+
+  def edge_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the (sources, targets) positions of the edges, in edge order.
+
+    The edges are in the order `graph.edges()` yields them. In undirected
+    graphs, it yields each edge from the endpoint visited first, i.e. the CSR
+    entries whose target is not before their source.
+
+    Returns:
+      Two arrays of node positions.
+    """
+    sources = np.repeat(np.arange(len(self.nodes)), np.diff(self.indptr))
+    targets = self.indices
+    if not self.is_directed:
+      keep = targets >= sources
+      sources, targets = sources[keep], targets[keep]
+    return sources, targets
+
+  def targets_of(self, positions: np.ndarray) -> np.ndarray:
+    """Returns the concatenated targets of the nodes at `positions`."""
+    return _gather(self.indptr, self.indices, positions)
+
+  def sources_of(self, positions: np.ndarray) -> np.ndarray:
+    """Returns the concatenated nodes linking to the nodes at `positions`."""
+    if not self.is_directed:
+      return self.targets_of(positions)
+    if self._reverse is None:
+      # The CSR of the reversed graph, built on first use.
+      sources = np.repeat(np.arange(len(self.nodes)), np.diff(self.indptr))
+      in_degrees = np.bincount(self.indices, minlength=len(self.nodes))
+      self._reverse = (
+          np.concatenate(([0], np.cumsum(in_degrees))),
+          sources[np.argsort(self.indices, kind='stable')],
+      )
+    return _gather(*self._reverse, positions)
+
+  def ego_positions(
+      self, positions: list[int], radius: int
+  ) -> np.ndarray:
+    """Returns the nodes within `radius` hops of any of `positions`.
+
+    Edges are followed in both directions, so the in-neighbors of a node are
+    part of its ego network in directed graphs too. Only the visited nodes are
+    touched, so the cost does not depend on the size of the graph.
+
+    Args:
+      positions: the positions of the center nodes.
+      radius: the number of hops.
+
+    Returns:
+      The sorted positions of the nodes of the ego network.
+    """
+    visited = set(positions)
+    frontier = np.asarray(sorted(visited), dtype=np.int64)
+    for _ in range(radius):
+      if not frontier.size:
+        break
+      targets = np.unique(
+          np.concatenate((self.targets_of(frontier), self.sources_of(frontier)))
+      )
+      frontier = np.asarray(
+          [ind for ind in targets.tolist() if ind not in visited],
+          dtype=np.int64,
+      )
+      visited.update(frontier.tolist())
+    return np.asarray(sorted(visited), dtype=np.int64)
+
+  def shortest_path(self, source, target) -> list[int] | None:
+    """Returns the nodes of a shortest path, or None if there is none.
+
+    The BFS stops as soon as `target` is reached.
+
+    Args:
+      source: the first node of the path.
+      target: the last node of the path.
+
+    Returns:
+      The list of nodes from source to target.
+    """
+    source_position, target_position = (
+        self.position[source],
+        self.position[target],
+    )
+    parents = {source_position: source_position}
+    frontier = np.asarray([source_position], dtype=np.int64)
+    while frontier.size and target_position not in parents:
+      lengths = self.indptr[frontier + 1] - self.indptr[frontier]
+      new_frontier = []
+      for parent, child in zip(
+          np.repeat(frontier, lengths).tolist(),
+          self.targets_of(frontier).tolist(),
+      ):
+        if child not in parents:
+          parents[child] = parent
+          new_frontier.append(child)
+      frontier = np.asarray(new_frontier, dtype=np.int64)
+    if target_position not in parents:
+      return None
+    path = [target_position]
+    while path[-1] != source_position:
+      path.append(parents[path[-1]])
+    return [self.nodes[ind] for ind in reversed(path)]
+
+  def induced_subgraph(
+      self, positions: np.ndarray
+  ) -> tuple[nx.Graph, dict[int, int]]:
+    """Returns the subgraph induced by some nodes, relabeled to 0..k-1.
+
+    Nodes keep their relative order, and so do the targets of each node. Edge
+    attributes are not copied.
+
+    Args:
+      positions: the sorted positions of the nodes to keep.
+
+    Returns:
+      The subgraph, of the same class as the graph, and a dict from the
+      original nodes to their new labels.
+    """
+    new_labels = np.full(len(self.nodes), -1, dtype=np.int64)
+    new_labels[positions] = np.arange(len(positions))
+    if self.is_multigraph:
+      subgraph = nx.MultiDiGraph() if self.is_directed else nx.MultiGraph()
+    else:
+      subgraph = nx.DiGraph() if self.is_directed else nx.Graph()
+    subgraph.add_nodes_from(range(len(positions)))
+    for position, new_label in zip(positions.tolist(), range(len(positions))):
+      targets = new_labels[self.neighbors(self.nodes[position])]
+      targets = targets[targets >= 0]
+      if not self.is_directed:
+        # The edges of undirected graphs are seen from both ends.
+        targets = targets[targets >= new_label]
+      subgraph.add_edges_from(
+          (new_label, target) for target in targets.tolist()
+      )
+    return subgraph, {
+        self.nodes[position]: new_label
+        for new_label, position in enumerate(positions.tolist())
+    }
+
+  def distances_from(self, node) -> np.ndarray:
+    """Returns the BFS distance from `node` to every node, -1 if unreachable.
+
+    Distances are cached per source node, so answering several queries that
+    share a source only traverses the graph once.
+
+    Args:
+      node: the source node.
+
+    Returns:
+      An int array indexed by node position.
+    """
+    if node not in self._distances:
+      distances = np.full(len(self.nodes), -1, dtype=np.int64)
+      frontier = np.asarray([self.position[node]], dtype=np.int64)
+      distances[frontier] = 0
+      depth = 0
+      while frontier.size:
+        depth += 1
+        targets = self.targets_of(frontier)
+        frontier = np.unique(targets[distances[targets] < 0])
+        distances[frontier] = depth
+      _cache(self._distances, node, distances, _MAX_CACHED_SOURCES)
+    return self._distances[node]
+
+  def adjacency_matrix(self) -> np.ndarray:
+    """Returns a boolean matrix whose (i, j) entry is set if i links to j."""
+    adjacency = np.zeros((len(self.nodes), len(self.nodes)), dtype=bool)
+    sources = np.repeat(np.arange(len(self.nodes)), np.diff(self.indptr))
+    adjacency[sources, self.indices] = True
+    return adjacency
+
+  def distance_matrix(self) -> np.ndarray:
+    """Returns the BFS distances between all pairs, -1 if unreachable."""
+    if not self.nodes:
+      return np.zeros((0, 0), dtype=np.int64)
+    return np.stack([self.distances_from(node) for node in self.nodes])
+
+  def sample_pairs_by_label(
+      self,
+      labels: np.ndarray,
+      label_distribution: dict[int | bool, float],
+      k: int,
+  ) -> list[tuple[int, int]]:
+    """Samples distinct ordered pairs of nodes to follow a label distribution.
+
+    The label of each query is drawn from `label_distribution` first and a pair
+    with that label is then drawn uniformly, so no pair is ever rejected.
+    Labels that no pair of the graph has left are dropped and the remaining
+    weights renormalized. Labels missing from `label_distribution` are never
+    sampled.
+
+    Args:
+      labels: an nnodes x nnodes matrix with the answer for each ordered pair,
+        e.g. `adjacency_matrix()` or `distance_matrix()`. The diagonal is
+        ignored.
+      label_distribution: the target weight of each label.
+      k: the number of pairs to sample.
+
+    Returns:
+      A list of at most k (source, target) tuples of nodes.
+    """
+    off_diagonal = ~np.eye(len(self.nodes), dtype=bool)
+    pools = {}
+    for label, weight in label_distribution.items():
+      if weight > 0:
+        pool = np.flatnonzero(off_diagonal & (labels == label))
+        if pool.size:
+          pools[label] = [pool, pool.size, weight]
+    pairs = []
+    while pools and len(pairs) < k:
+      label = random.choices(
+          list(pools), weights=[pool[2] for pool in pools.values()]
+      )[0]
+      pool = pools[label]
+      # Swap-removing a uniformly chosen entry from the live part of the pool.
+      ind = random.randrange(pool[1])
+      pool[1] -= 1
+      code = pool[0][ind]
+      pool[0][ind] = pool[0][pool[1]]
+      if not pool[1]:
+        del pools[label]
+      source, target = divmod(int(code), len(self.nodes))
+      pairs.append((self.nodes[source], self.nodes[target]))
+    return pairs
+
+  def node_names(self, name_dict: dict[int, str]) -> list[str]:
+    """Returns the name of every node, indexed by position."""
+    key = id(name_dict)
+    if key not in self._node_names:
+      _cache(
+          self._node_names,
+          key,
+          (name_dict, [name_dict[node] for node in self.nodes]),
+          _MAX_CACHED_NAME_DICTS,
+      )
+    return self._node_names[key][1]
+
+  def name_order(self, name_dict: dict[int, str]) -> np.ndarray:
+    """Returns node positions sorted by node name."""
+    key = id(name_dict)
+    if key not in self._name_orders:
+      names = self.node_names(name_dict)
+      order = sorted(range(len(names)), key=names.__getitem__)
+      _cache(
+          self._name_orders,
+          key,
+          (name_dict, np.asarray(order, dtype=np.int64)),
+          _MAX_CACHED_NAME_DICTS,
+      )
+    return self._name_orders[key][1]
+
+  def sorted_neighbor_names(
+      self, node, name_dict: dict[int, str]
+  ) -> list[str]:
+    """Returns the names of the targets of `node` in alphabetical order."""
+    counts = np.bincount(self.neighbors(node), minlength=len(self.nodes))
+    order = self.name_order(name_dict)
+    names = self.node_names(name_dict)
+    return [names[ind] for ind in np.repeat(order, counts[order])]
+
+  def sorted_non_neighbor_names(
+      self, node, name_dict: dict[int, str]
+  ) -> list[str]:
+    """Returns the names of the nodes `node` has no edge to, sorted by name.
+
+    The node itself is excluded.
+
+    Args:
+      node: the node to find the non neighbors of.
+      name_dict: a dictionary from node ids to names.
+
+    Returns:
+      The names of the non neighbors in alphabetical order.
+    """
+    mask = np.ones(len(self.nodes), dtype=bool)
+    mask[self.neighbors(node)] = False
+    mask[self.position[node]] = False
+    order = self.name_order(name_dict)
+    names = self.node_names(name_dict)
+    return [names[ind] for ind in order[mask[order]]]
+
+
+def _cache(cache: dict, key, value, max_size: int) -> None:
+  """Adds an entry to a cache, dropping its oldest entry if it is full."""
+  if len(cache) >= max_size:
+    del cache[next(iter(cache))]
+  cache[key] = value
+
+
+def _gather(
+    indptr: np.ndarray, indices: np.ndarray, positions: np.ndarray
+) -> np.ndarray:
+  """Returns the concatenated CSR rows at `positions`."""
+  starts = indptr[positions]
+  lengths = indptr[positions + 1] - starts
+  offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+  return indices[np.arange(lengths.sum()) + offsets]
@@ -0,0 +1,120 @@
+"""Testing for graph_index.py."""
+
+import random
+
+import networkx as nx
+
+from . import graph_index
+from absl.testing import absltest
+
+_NAMES = {0: 'Robert', 1: 'James', 2: 'Mary', 3: 'John', 4: 'Anna'}
+
+
+class GraphIndexTest(absltest.TestCase):
+
+  def test_neighbors_follow_edge_order(self):
+    graph = nx.Graph([(0, 3), (0, 1), (1, 2)])
+    index = graph_index.GraphIndex(graph)
+    self.assertEqual(
+        [index.nodes[ind] for ind in index.neighbors(0)],
+        [target for _, target in graph.edges(0)],
+    )
+
+  def test_neighbors_keep_parallel_edges(self):
+    graph = nx.MultiDiGraph([(0, 1), (0, 1), (0, 2), (2, 0)])
+    index = graph_index.GraphIndex(graph)
+    self.assertEqual(list(index.neighbors(0)), [1, 1, 2])
+    self.assertEqual(list(index.neighbors(1)), [])
+
+  def test_sorted_neighbor_names(self):
+    graph = nx.Graph([(0, 2), (0, 4), (0, 1), (3, 4)])
+    index = graph_index.GraphIndex(graph)
+    self.assertEqual(
+        index.sorted_neighbor_names(0, _NAMES), ['Anna', 'James', 'Mary']
+    )
+
+  def test_sorted_non_neighbor_names(self):
+    graph = nx.Graph([(0, 2), (0, 4), (3, 4), (1, 3)])
+    index = graph_index.GraphIndex(graph)
+    self.assertEqual(
+        index.sorted_non_neighbor_names(0, _NAMES), ['James', 'John']
+    )
+    self.assertEqual(
+        index.sorted_non_neighbor_names(4, _NAMES), ['James', 'Mary']
+    )
+
+  def test_distance_matrix(self):
+    index = graph_index.GraphIndex(nx.DiGraph([(0, 1), (1, 2), (3, 2)]))
+    self.assertEqual(
+        index.distance_matrix().tolist(),
+        [[0, 1, 2, -1], [-1, 0, 1, -1], [-1, -1, 0, -1], [-1, -1, 1, 0]],
+    )
+
+  def test_edge_arrays_follow_edge_order(self):
+    for graph in (
+        nx.MultiGraph([(2, 0), (0, 1), (0, 1), (1, 1), (2, 1)]),
+        nx.DiGraph([(2, 0), (0, 1), (1, 0), (1, 1)]),
+    ):
+      index = graph_index.GraphIndex(graph)
+      sources, targets = index.edge_arrays()
+      self.assertEqual(
+          [(index.nodes[i], index.nodes[j]) for i, j in zip(sources, targets)],
+          list(graph.edges()),
+      )
+
+  def test_ego_positions_follow_edges_both_ways(self):
+    index = graph_index.GraphIndex(
+        nx.DiGraph([(0, 1), (1, 2), (3, 1), (2, 4), (5, 5)])
+    )
+    self.assertEqual(index.ego_positions([1], 0).tolist(), [1])
+    self.assertEqual(index.ego_positions([1], 1).tolist(), [0, 1, 2, 3])
+    self.assertEqual(index.ego_positions([0, 4], 1).tolist(), [0, 1, 2, 4])
+
+  def test_shortest_path(self):
+    graph = nx.DiGraph([(0, 1), (1, 2), (0, 3), (3, 4), (4, 2), (2, 5)])
+    index = graph_index.GraphIndex(graph)
+    self.assertEqual(index.shortest_path(0, 5), [0, 1, 2, 5])
+    self.assertEqual(index.shortest_path(3, 3), [3])
+    self.assertIsNone(index.shortest_path(5, 0))
+
+  def test_induced_subgraph(self):
+    graph = nx.MultiGraph([(7, 3), (3, 5), (5, 7), (5, 7), (3, 9), (9, 9)])
+    index = graph_index.GraphIndex(graph)
+    subgraph, new_labels = index.induced_subgraph(
+        index.ego_positions([index.position[9]], 1)
+    )
+    # The nodes 3 and 9 are the second and fourth ones of the graph.
+    self.assertEqual(new_labels, {3: 0, 9: 1})
+    self.assertIsInstance(subgraph, nx.MultiGraph)
+    self.assertEqual(sorted(subgraph.edges()), [(0, 1), (1, 1)])
+
+  def test_sample_pairs_by_label(self):
+    random.seed(0)
+    graph = nx.Graph([(0, 1), (2, 3), (3, 4)])
+    index = graph_index.GraphIndex(graph)
+    pairs = index.sample_pairs_by_label(
+        index.adjacency_matrix(), {True: 1.0, False: 0.0}, 10
+    )
+    # Only the six ordered pairs with an edge can be drawn.
+    self.assertLen(pairs, 6)
+    self.assertTrue(all(graph.has_edge(*pair) for pair in pairs))
+    pairs = index.sample_pairs_by_label(
+        index.distance_matrix() >= 0, {True: 0.5, False: 0.5}, 4
+    )
+    self.assertLen(set(pairs), 4)
+
+  def test_caches_are_bounded(self):
+    graph = nx.path_graph(100)
+    index = graph_index.GraphIndex(graph)
+    for node in graph:
+      self.assertEqual(index.distances_from(node)[0], node)
+    for _ in range(10):
+      name_dict = {node: str(node) for node in graph}
+      self.assertEqual(index.sorted_neighbor_names(1, name_dict), ['0', '2'])
+    self.assertLen(index._distances, graph_index._MAX_CACHED_SOURCES)
+    self.assertLen(index._name_orders, graph_index._MAX_CACHED_NAME_DICTS)
+    self.assertLen(index._node_names, graph_index._MAX_CACHED_NAME_DICTS)
+
+
+if __name__ == '__main__':
+  absltest.main()
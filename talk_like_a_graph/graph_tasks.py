@@ -1,11 +1,16 @@
 """The graph tasks to be tried with LLMs."""
 
+from collections.abc import Callable, Iterator
 import random
+from typing import Any
 
 import networkx as nx
 import numpy as np
 
+from . import graph_cache
+from . import graph_index
 from . import graph_text_encoders
+from . import oracle_guards
 
 
 class GraphTask:
@@ -14,6 +19,9 @@ class GraphTask:
   def __init__(self):
     self.name = 'default'
     self.maximum_nnodes_cot_graph = 10
+    # Optionally, an oracle_guards.CostGuard bounding the cost of the oracles.
+    # The examples of the graphs exceeding a budget are dropped.
+    self.cost_guard = None
 
   def prepare_examples_dict(
       self,
@@ -21,6 +29,19 @@ class GraphTask:
       generator_algorithms: list[str],
       encoding_method: str,
   ) -> dict[int, dict[str, str | list[int]]]:
+    return dict(
+        enumerate(
+            self.iterate_examples(graphs, generator_algorithms, encoding_method)
+        )
+    )
+
+  def iterate_examples(
+      self,
+      graphs: list[nx.Graph],
+      generator_algorithms: list[str],
+      encoding_method: str,
+  ) -> Iterator[dict[str, str | list[int]]]:
+    """Yields the examples of prepare_examples_dict one at a time."""
     raise NotImplementedError()
 
   def create_few_shot_example(
@@ -28,6 +49,31 @@ class GraphTask:
   ):
     raise NotImplementedError()
 
+  def run_oracle(
+      self,
+      oracle: str,
+      graph: nx.Graph,
+      algorithm: str,
+      compute: Callable[[], Any],
+  ) -> Any:
+    """Runs compute() within the budgets of cost_guard, if any.
+
+    Args:
+      oracle: the name of the oracle, one of oracle_guards.ORACLES.
+      graph: the graph the oracle runs on.
+      algorithm: the algorithm that generated the graph.
+      compute: runs the oracle.
+
+    Returns:
+      The value of compute().
+
+    Raises:
+      oracle_guards.BudgetExceededError: if the oracle exceeds a budget.
+    """
+    if self.cost_guard is None:
+      return compute()
+    return self.cost_guard.run(oracle, graph, algorithm, compute)
+
 
 class CycleCheck(GraphTask):
   """The graph task to check if there is at least one cycle or not."""
@@ -37,24 +83,35 @@ class CycleCheck(GraphTask):
     self.name = 'cycle_check'
     self._task_description = 'Q: Is there a cycle in this graph?\nA: '
 
-  def prepare_examples_dict(
+  def iterate_examples(
       self,
       graphs: list[nx.Graph],
       generator_algorithms: list[str],
       encoding_method: str,
-  ) -> dict[int, dict[str, str | list[int]]]:
-    examples_dict = {}
+  ) -> Iterator[dict[str, str | list[int]]]:
     for ind, graph in enumerate(graphs):
       question = (
-          graph_text_encoders.encode_graph(graph, encoding_method)
+          graph_cache.encode_graph(graph, encoding_method)
           + self._task_description
       )
       try:
-        nx.find_cycle(graph)
+        graph_has_cycle = graph_cache.memoize(
+            graph,
+            'has_cycle',
+            lambda: self.run_oracle(
+                'find_cycle',
+                graph,
+                generator_algorithms[ind],
+                lambda: has_cycle(graph),
+            ),
+        )
+      except oracle_guards.BudgetExceededError:
+        continue
+      if graph_has_cycle:
         answer = 'Yes, there is a cycle.'
-      except nx.NetworkXNoCycle:
+      else:
         answer = 'No, there is no cycle.'
-      examples_dict[ind] = {
+      yield {
           'question': question,
           'answer': answer,
           'nnodes': str(len(graph.nodes())),
@@ -64,7 +121,6 @@ class CycleCheck(GraphTask):
           'algorithm': generator_algorithms[ind],
           'node_ids': [],
       }
-    return examples_dict
 
   def create_few_shot_example(
       self, graph: nx.Graph, encoding_method: str, cot: bool
@@ -74,7 +130,7 @@ class CycleCheck(GraphTask):
         graph, encoding_method
     )
     question = (
-        graph_text_encoders.encode_graph(graph, encoding_method)
+        graph_cache.encode_graph(graph, encoding_method)
         + self._task_description
     )
     try:
@@ -117,46 +173,79 @@ class CycleCheck(GraphTask):
 
 
 class EdgeExistence(GraphTask):
-  """The graph task to check if an edge exist in a graph or not."""
+  """The graph task to check if an edge exist in a graph or not.
 
-  def __init__(self):
+  Each graph is asked `queries_per_graph` questions about distinct node pairs,
+  all sharing the encoding of the graph. If `label_distribution` is set (e.g.
+  `{True: 0.5, False: 0.5}`), the pairs are drawn from the adjacency matrix so
+  that the answers follow it.
+
+  If `ego_radius` is set, each question only encodes the subgraph within
+  `ego_radius` hops of its two nodes, which keeps the prompts of large graphs
+  short. As the subgraph is induced, it has the edge asked about iff the graph
+  does.
+  """
+
+  def __init__(
+      self,
+      queries_per_graph: int = 1,
+      label_distribution: dict[bool, float] | None = None,
+      ego_radius: int | None = None,
+  ):
     super().__init__()
     self.name = 'edge_existence'
+    self.queries_per_graph = queries_per_graph
+    self.label_distribution = label_distribution
+    self.ego_radius = ego_radius
 
-  def prepare_examples_dict(
+  def iterate_examples(
       self,
       graphs: list[nx.Graph],
       generator_algorithms: list[str],
       encoding_method: str,
-  ) -> dict[int, dict[str, str | list[int]]]:
-    examples_dict = {}
+  ) -> Iterator[dict[str, str | list[int]]]:
     name_dict = graph_text_encoders.get_tlag_node_encoder(None, encoding_method)
 
     for ind, graph in enumerate(graphs):
-      source, target = random.sample(list(graph.nodes()), k=2)
-      question = graph_text_encoders.encode_graph(graph, encoding_method)
-      task_description = 'Q: Is node %s connected to node %s?\nA: ' % (
-          name_dict[source],
-          name_dict[target],
-      )
-      question += task_description
-      if ((source, target) in graph.edges()) or (
-          (target, source) in graph.edges()
-      ):
-        answer = 'Yes.'
+      if self.label_distribution is None:
+        pairs = sample_node_pairs(graph, self.queries_per_graph)
       else:
-        answer = 'No.'
-      examples_dict[ind] = {
-          'question': question,
-          'answer': answer,
-          'nnodes': str(len(graph.nodes())),
-          'nedges': str(len(graph.edges())),
-          'task_description': task_description,
-          'graph': graph,
-          'algorithm': generator_algorithms[ind],
-          'node_ids': [source, target],
-      }
-    return examples_dict
+        index = graph_cache.get_index(graph)
+        adjacency = index.adjacency_matrix()
+        pairs = index.sample_pairs_by_label(
+            adjacency | adjacency.T,
+            self.label_distribution,
+            self.queries_per_graph,
+        )
+      if self.ego_radius is None:
+        query_graph = graph
+        encoded_graph = graph_cache.encode_graph(graph, encoding_method)
+      for source, target in pairs:
+        if self.ego_radius is not None:
+          query_graph, (source, target) = ego_subgraph(
+              graph, [source, target], self.ego_radius
+          )
+          encoded_graph = graph_cache.encode_graph(query_graph, encoding_method)
+        task_description = 'Q: Is node %s connected to node %s?\nA: ' % (
+            name_dict[source],
+            name_dict[target],
+        )
+        if query_graph.has_edge(source, target) or query_graph.has_edge(
+            target, source
+        ):
+          answer = 'Yes.'
+        else:
+          answer = 'No.'
+        yield {
+            'question': encoded_graph + task_description,
+            'answer': answer,
+            'nnodes': str(len(query_graph.nodes())),
+            'nedges': str(len(query_graph.edges())),
+            'task_description': task_description,
+            'graph': query_graph,
+            'algorithm': generator_algorithms[ind],
+            'node_ids': [source, target],
+        }
 
   def create_few_shot_example(
       self, graph: nx.Graph, encoding_method: str, cot: bool
@@ -165,7 +254,7 @@ class EdgeExistence(GraphTask):
         graph, encoding_method
     )
     source, target = random.sample(list(graph.nodes()), k=2)
-    question = graph_text_encoders.encode_graph(graph, encoding_method)
+    question = graph_cache.encode_graph(graph, encoding_method)
     question += 'Q: Is node %s connected to node %s?\nA: ' % (
         name_dict[source],
         name_dict[target],
@@ -197,18 +286,17 @@ class NodeCount(GraphTask):
     self.name = 'node_count'
     self._task_description = 'Q: How many nodes are in this graph?\nA: '
 
-  def prepare_examples_dict(
+  def iterate_examples(
       self,
       graphs: list[nx.Graph],
       generator_algorithms: list[str],
       encoding_method: str,
-  ) -> dict[int, dict[str, str | list[int]]]:
-    examples_dict = {}
+  ) -> Iterator[dict[str, str | list[int]]]:
     for ind, graph in enumerate(graphs):
-      question = graph_text_encoders.encode_graph(graph, encoding_method)
+      question = graph_cache.encode_graph(graph, encoding_method)
       question += self._task_description
       answer = ' %d.' % len(graph.nodes())
-      examples_dict[ind] = {
+      yield {
           'question': question,
           'answer': answer,
           'nnodes': str(len(graph.nodes())),
@@ -218,7 +306,6 @@ class NodeCount(GraphTask):
           'algorithm': generator_algorithms[ind],
           'node_ids': [],
       }
-    return examples_dict
 
   def get_nodes_string(self, name_dict: dict[int, str], nnodes: int) -> str:
     node_string = ''
@@ -233,7 +320,7 @@ class NodeCount(GraphTask):
     name_dict = graph_text_encoders.get_tlag_node_encoder(
         graph, encoding_method
     )
-    question = graph_text_encoders.encode_graph(graph, encoding_method)
+    question = graph_cache.encode_graph(graph, encoding_method)
     question += self._task_description
     answer = '%d.' % len(graph.nodes())
     if cot:
@@ -245,39 +332,55 @@ class NodeCount(GraphTask):
 
 
 class NodeDegree(GraphTask):
-  """The graph task for finding degree of a node in a graph."""
+  """The graph task for finding degree of a node in a graph.
 
-  def __init__(self):
+  Each graph is asked `queries_per_graph` questions about distinct nodes, all
+  sharing the encoding of the graph.
+
+  If `ego_radius` is set, each question only encodes the subgraph within
+  `ego_radius` hops of its node, which keeps the prompts of large graphs short.
+  The radius is at least one, so that the subgraph has all edges of the node.
+  """
+
+  def __init__(
+      self, queries_per_graph: int = 1, ego_radius: int | None = None
+  ):
     super().__init__()
     self.name = 'node_degree'
+    self.queries_per_graph = queries_per_graph
+    self.ego_radius = ego_radius
 
-  def prepare_examples_dict(
+  def iterate_examples(
       self,
       graphs: list[nx.Graph],
       generator_algorithms: list[str],
       encoding_method: str,
-  ) -> dict[int, dict[str, str | list[int]]]:
-    examples_dict = {}
+  ) -> Iterator[dict[str, str | list[int]]]:
     name_dict = graph_text_encoders.get_tlag_node_encoder(None, encoding_method)
     for ind, graph in enumerate(graphs):
-      question = graph_text_encoders.encode_graph(graph, encoding_method)
-      source_node = random.sample(list(graph.nodes()), k=1)[0]
-      task_description = (
-          'Q: What is the degree of node %s?\nA: ' % name_dict[source_node]
-      )
-      question += task_description
-      answer = '%d.' % graph.degree[source_node]
-      examples_dict[ind] = {
-          'question': question,
-          'answer': answer,
-          'nnodes': str(len(graph.nodes())),
-          'nedges': str(len(graph.edges())),
-          'task_description': task_description,
-          'graph': graph,
-          'algorithm': generator_algorithms[ind],
-          'node_ids': [source_node],
-      }
-    return examples_dict
+      if self.ego_radius is None:
+        query_graph = graph
+        encoded_graph = graph_cache.encode_graph(graph, encoding_method)
+      for source_node in sample_nodes(graph, self.queries_per_graph):
+        if self.ego_radius is not None:
+          query_graph, (source_node,) = ego_subgraph(
+              graph, [source_node], max(self.ego_radius, 1)
+          )
+          encoded_graph = graph_cache.encode_graph(query_graph, encoding_method)
+        task_description = (
+            'Q: What is the degree of node %s?\nA: ' % name_dict[source_node]
+        )
+        answer = '%d.' % query_graph.degree[source_node]
+        yield {
+            'question': encoded_graph + task_description,
+            'answer': answer,
+            'nnodes': str(len(query_graph.nodes())),
+            'nedges': str(len(query_graph.edges())),
+            'task_description': task_description,
+            'graph': query_graph,
+            'algorithm': generator_algorithms[ind],
+            'node_ids': [source_node],
+        }
 
   def get_edge_string(
       self, name_dict: dict[int, str], graph: nx.Graph, source_node: int
@@ -302,7 +405,7 @@ class NodeDegree(GraphTask):
     name_dict = graph_text_encoders.get_tlag_node_encoder(
         graph, encoding_method
     )
-    question = graph_text_encoders.encode_graph(graph, encoding_method)
+    question = graph_cache.encode_graph(graph, encoding_method)
     source_node = random.sample(list(graph.nodes()), k=1)[0]
     question += (
         'Q: What is the degree of node %s?\nA: ' % name_dict[source_node]
@@ -324,18 +427,17 @@ class EdgeCount(GraphTask):
     self.name = 'edge_count'
     self._task_description = 'Q: How many edges are in this graph?\nA: '
 
-  def prepare_examples_dict(
+  def iterate_examples(
       self,
       graphs: list[nx.Graph],
       generator_algorithms: list[str],
       encoding_method: str,
-  ) -> dict[int, dict[str, str | list[int]]]:
-    examples_dict = {}
+  ) -> Iterator[dict[str, str | list[int]]]:
     for ind, graph in enumerate(graphs):
-      question = graph_text_encoders.encode_graph(graph, encoding_method)
+      question = graph_cache.encode_graph(graph, encoding_method)
       question += self._task_description
       answer = ' %d.' % len(graph.edges())
-      examples_dict[ind] = {
+      yield {
           'question': question,
           'answer': answer,
           'nnodes': str(len(graph.nodes())),
@@ -345,7 +447,6 @@ class EdgeCount(GraphTask):
           'algorithm': generator_algorithms[ind],
           'node_ids': [],
       }
-    return examples_dict
 
   def get_edges_string(
       self, name_dict: dict[int, str], edges: list[tuple[int, int]]
@@ -363,7 +464,7 @@ class EdgeCount(GraphTask):
     name_dict = graph_text_encoders.get_tlag_node_encoder(
         graph, encoding_method
     )
-    question = graph_text_encoders.encode_graph(graph, encoding_method)
+    question = graph_cache.encode_graph(graph, encoding_method)
     question += self._task_description
     answer = '%d.' % len(graph.edges())
     if cot:
@@ -374,61 +475,82 @@ class EdgeCount(GraphTask):
 
 
 class ConnectedNodes(GraphTask):
-  """The graph task for finding connected nodes to a given node in a graph."""
+  """The graph task for finding connected nodes to a given node in a graph.
 
-  def __init__(self):
+  Each graph is asked `queries_per_graph` questions about distinct nodes, all
+  sharing the encoding of the graph.
+
+  If `ego_radius` is set, each question only encodes the subgraph within
+  `ego_radius` hops of its node, which keeps the prompts of large graphs short.
+  The radius is at least one, so that the subgraph has all edges of the node.
+  """
+
+  def __init__(
+      self, queries_per_graph: int = 1, ego_radius: int | None = None
+  ):
     super().__init__()
     self.name = 'connected_nodes'
+    self.queries_per_graph = queries_per_graph
+    self.ego_radius = ego_radius
 
-  def prepare_examples_dict(
+  def iterate_examples(
       self,
       graphs: list[nx.Graph],
       generator_algorithms: list[str],
       encoding_method: str,
-  ) -> dict[int, dict[str, str | list[int]]]:
-    examples_dict = {}
+  ) -> Iterator[dict[str, str | list[int]]]:
     name_dict = graph_text_encoders.get_tlag_node_encoder(None, encoding_method)
     for ind, graph in enumerate(graphs):
-      question = graph_text_encoders.encode_graph(graph, encoding_method)
-      source_node = random.sample(list(graph.nodes()), k=1)[0]
-      task_description = (
-          'Q: List all the nodes connected to %s in alphabetical order.\nA: '
-          % name_dict[source_node]
-      )
-      question += task_description
-      outgoing_edges = list(graph.edges(source_node))
-      if outgoing_edges:
-        answer = self.get_connected_nodes(outgoing_edges, name_dict) + '.'
-      else:
-        answer = ' No nodes.'
-      examples_dict[ind] = {
-          'question': question,
-          'answer': answer,
-          'nnodes': str(len(graph.nodes())),
-          'nedges': str(len(graph.edges())),
-          'task_description': task_description,
-          'graph': graph,
-          'algorithm': generator_algorithms[ind],
-          'node_ids': [source_node],
-      }
-    return examples_dict
+      if self.ego_radius is None:
+        query_graph = graph
+        encoded_graph = graph_cache.encode_graph(graph, encoding_method)
+        index = graph_cache.get_index(graph)
+      for source_node in sample_nodes(graph, self.queries_per_graph):
+        if self.ego_radius is not None:
+          query_graph, (source_node,) = ego_subgraph(
+              graph, [source_node], max(self.ego_radius, 1)
+          )
+          encoded_graph = graph_cache.encode_graph(query_graph, encoding_method)
+          index = graph_cache.get_index(query_graph)
+        task_description = (
+            'Q: List all the nodes connected to %s in alphabetical order.\nA: '
+            % name_dict[source_node]
+        )
+        if index.neighbors(source_node).size:
+          answer = (
+              self.get_connected_nodes(index, source_node, name_dict) + '.'
+          )
+        else:
+          answer = ' No nodes.'
+        yield {
+            'question': encoded_graph + task_description,
+            'answer': answer,
+            'nnodes': str(len(query_graph.nodes())),
+            'nedges': str(len(query_graph.edges())),
+            'task_description': task_description,
+            'graph': query_graph,
+            'algorithm': generator_algorithms[ind],
+            'node_ids': [source_node],
+        }
 
   def get_connected_nodes(
-      self, edges: list[tuple[int, int]], name_dict: dict[int, str]
+      self,
+      index: graph_index.GraphIndex,
+      source: int,
+      name_dict: dict[int, str],
   ) -> str:
     """Gets a string including all the nodes that are connected to source."""
-    connected_nodes = []
-    for edge in edges:
-      connected_nodes.append(name_dict[edge[1]])
-    connected_nodes_string = ''
-    if connected_nodes:
-      try:
-        int(connected_nodes[0])
-        connected_nodes_string = ', '.join(map(str, connected_nodes))
-      except ValueError:
-        # Check if these are not integers, sort
-        connected_nodes_string = ', '.join(map(str, sorted(connected_nodes)))
-    return connected_nodes_string
+    targets = index.neighbors(source)
+    if not targets.size:
+      return ''
+    names = index.node_names(name_dict)
+    try:
+      int(names[targets[0]])
+      # Integer names are listed in edge order.
+      return ', '.join([names[ind] for ind in targets])
+    except ValueError:
+      # Check if these are not integers, sort
+      return ', '.join(index.sorted_neighbor_names(source, name_dict))
 
   def create_few_shot_example(
       self, graph: nx.Graph, encoding_method: str, cot: bool
@@ -436,16 +558,16 @@ class ConnectedNodes(GraphTask):
     name_dict = graph_text_encoders.get_tlag_node_encoder(
         graph, encoding_method
     )
-    question = graph_text_encoders.encode_graph(graph, encoding_method)
+    question = graph_cache.encode_graph(graph, encoding_method)
     source_node = random.sample(list(graph.nodes()), k=1)[0]
     question += (
         'Q: List all the nodes connected to %s in alphabetical order.\nA: '
         % name_dict[source_node]
     )
-    outgoing_edges = list(graph.edges(source_node))
+    index = graph_cache.get_index(graph)
     answer = ''
-    if outgoing_edges:
-      answer = self.get_connected_nodes(outgoing_edges, name_dict) + '.'
+    if index.neighbors(source_node).size:
+      answer = self.get_connected_nodes(index, source_node, name_dict) + '.'
       if cot:
         answer += ' This is because there is an edge from %s to %s.' % (
             name_dict[source_node],
@@ -462,77 +584,57 @@ class ConnectedNodes(GraphTask):
 
 
 class DisconnectedNodes(GraphTask):
-  """The task for finding disconnected nodes for a given node in a graph."""
+  """The task for finding disconnected nodes for a given node in a graph.
 
-  def __init__(self):
+  Each graph is asked `queries_per_graph` questions about distinct nodes, all
+  sharing the encoding of the graph.
+  """
+
+  def __init__(self, queries_per_graph: int = 1):
     super().__init__()
     self.name = 'disconnected_nodes'
+    self.queries_per_graph = queries_per_graph
 
-  def prepare_examples_dict(
+  def iterate_examples(
       self,
       graphs: list[nx.Graph],
       generator_algorithms: list[str],
       encoding_method: str,
-  ) -> dict[int, dict[str, str | list[int]]]:
-    examples_dict = {}
+  ) -> Iterator[dict[str, str | list[int]]]:
     name_dict = graph_text_encoders.get_tlag_node_encoder(None, encoding_method)
     for ind, graph in enumerate(graphs):
-      question = graph_text_encoders.encode_graph(graph, encoding_method)
-      source_node = random.sample(list(graph.nodes()), k=1)[0]
-      task_description = (
-          'Q: List all the nodes that are not connected to %s in alphabetical'
-          ' order.\nA: '
-          % name_dict[source_node]
-      )
-      question += task_description
-      outgoing_edges = list(graph.edges(source_node))
-      answer = self.get_disconnected_nodes(
-          source_node, outgoing_edges, name_dict, list(graph.nodes())
-      )
-      if not answer:
-        answer = 'No nodes'
-
-      answer += '.'
-      examples_dict[ind] = {
-          'question': question,
-          'answer': answer,
-          'nnodes': str(len(graph.nodes())),
-          'nedges': str(len(graph.edges())),
-          'task_description': task_description,
-          'graph': graph,
-          'algorithm': generator_algorithms[ind],
-          'node_ids': [source_node],
-      }
-    return examples_dict
+      encoded_graph = graph_cache.encode_graph(graph, encoding_method)
+      index = graph_cache.get_index(graph)
+      for source_node in sample_nodes(graph, self.queries_per_graph):
+        task_description = (
+            'Q: List all the nodes that are not connected to %s in'
+            ' alphabetical order.\nA: '
+            % name_dict[source_node]
+        )
+        answer = self.get_disconnected_nodes(index, source_node, name_dict)
+        if not answer:
+          answer = 'No nodes'
+
+        answer += '.'
+        yield {
+            'question': encoded_graph + task_description,
+            'answer': answer,
+            'nnodes': str(len(graph.nodes())),
+            'nedges': str(len(graph.edges())),
+            'task_description': task_description,
+            'graph': graph,
+            'algorithm': generator_algorithms[ind],
+            'node_ids': [source_node],
+        }
 
   def get_disconnected_nodes(
       self,
+      index: graph_index.GraphIndex,
       source: int,
-      edges: list[tuple[int, int]],
       name_dict: dict[int, str],
-      all_nodes: list[int],
   ) -> str:
     """Gets a string with all the nodes that are not connected to source."""
-    for edge in edges:
-      if edge[1] in all_nodes:
-        all_nodes.remove(edge[1])
-    if source in all_nodes:
-      all_nodes.remove(source)
-    all_nodes_names = []
-    for node in all_nodes:
-      all_nodes_names.append(name_dict[node])
-    # sorted operation should be different for integers vs strings.
-    if all_nodes_names:
-      try:
-        int(all_nodes_names[0])
-        for ind, value in enumerate(all_nodes_names):
-          all_nodes_names[ind] = int(value)
-        all_nodes_names = sorted(all_nodes_names)
-        for ind, value in enumerate(all_nodes_names):
-          all_nodes_names[ind] = str(value)
-      except ValueError:
-        pass
-    return ', '.join(map(str, sorted(all_nodes_names)))
+    return ', '.join(index.sorted_non_neighbor_names(source, name_dict))
 
   def create_few_shot_example(
       self, graph: nx.Graph, encoding_method: str, cot: bool
@@ -540,19 +642,19 @@ class DisconnectedNodes(GraphTask):
     name_dict = graph_text_encoders.get_tlag_node_encoder(
         graph, encoding_method
     )
-    question = graph_text_encoders.encode_graph(graph, encoding_method)
+    question = graph_cache.encode_graph(graph, encoding_method)
     source_node = random.sample(list(graph.nodes()), k=1)[0]
     question += (
         'Q: List all the nodes that are not connected to %s in alphabetical'
         ' order.\nA: '
         % name_dict[source_node]
     )
-    outgoing_edges = list(graph.edges(source_node))
+    index = graph_cache.get_index(graph)
     answer = ''
     disconnected_nodes_string = self.get_disconnected_nodes(
-        source_node, outgoing_edges, name_dict, list(graph.nodes())
+        index, source_node, name_dict
     )
-    if outgoing_edges:
+    if index.neighbors(source_node).size:
       if not disconnected_nodes_string:
         disconnected_nodes_string = 'No nodes'
       answer = disconnected_nodes_string + '.'
@@ -572,44 +674,110 @@ class DisconnectedNodes(GraphTask):
 
 
 class Reachability(GraphTask):
-  """The graph task to check if there is a path from a source to target."""
+  """The graph task to check if there is a path from a source to target.
 
-  def __init__(self):
+  Each graph is asked `queries_per_graph` questions about distinct node pairs,
+  all sharing the encoding of the graph and the BFS from each source. If
+  `label_distribution` is set (e.g. `{True: 0.5, False: 0.5}`), the pairs are
+  drawn from the reachability matrix so that the answers follow it.
+
+  If `ego_radius` is set, each question only encodes the subgraph within
+  `ego_radius` hops of its two nodes, together with a shortest path between
+  them, which keeps the prompts of large graphs short. The subgraph then has
+  the same paths between the nodes as the graph.
+  """
+
+  def __init__(
+      self,
+      queries_per_graph: int = 1,
+      label_distribution: dict[bool, float] | None = None,
+      ego_radius: int | None = None,
+  ):
     super().__init__()
     self.name = 'reachability'
+    self.queries_per_graph = queries_per_graph
+    self.label_distribution = label_distribution
+    self.ego_radius = ego_radius
 
-  def prepare_examples_dict(
+  def iterate_examples(
       self,
       graphs: list[nx.Graph],
       generator_algorithms: list[str],
       encoding_method: str,
-  ) -> dict[int, dict[str, str | list[int]]]:
-    examples_dict = {}
+  ) -> Iterator[dict[str, str | list[int]]]:
     name_dict = graph_text_encoders.get_tlag_node_encoder(None, encoding_method)
 
     for ind, graph in enumerate(graphs):
-      source, target = random.sample(list(graph.nodes()), k=2)
-      question = graph_text_encoders.encode_graph(graph, encoding_method)
-      task_description = 'Q: Is there a path from node %s to node %s?\nA: ' % (
-          name_dict[source],
-          name_dict[target],
-      )
-      question += task_description
-      if nx.has_path(graph, source, target):
-        answer = 'Yes.'
-      else:
-        answer = 'No.'
-      examples_dict[ind] = {
-          'question': question,
-          'answer': answer,
-          'nnodes': str(len(graph.nodes())),
-          'nedges': str(len(graph.edges())),
-          'task_description': task_description,
-          'graph': graph,
-          'algorithm': generator_algorithms[ind],
-          'node_ids': [source, target],
-      }
-    return examples_dict
+      index = graph_cache.get_index(graph)
+      try:
+        if self.label_distribution is None:
+          pairs = sample_node_pairs(graph, self.queries_per_graph)
+        else:
+          pairs = self.run_oracle(
+              'distance_matrix',
+              graph,
+              generator_algorithms[ind],
+              lambda: index.sample_pairs_by_label(
+                  index.distance_matrix() >= 0,
+                  self.label_distribution,
+                  self.queries_per_graph,
+              ),
+          )
+        if self.ego_radius is None:
+          distances = self.run_oracle(
+              'shortest_path',
+              graph,
+              generator_algorithms[ind],
+              lambda: [
+                  index.distances_from(source)[index.position[target]]
+                  for source, target in pairs
+              ],
+          )
+        else:
+          paths = self.run_oracle(
+              'shortest_path',
+              graph,
+              generator_algorithms[ind],
+              lambda: [
+                  index.shortest_path(source, target)
+                  for source, target in pairs
+              ],
+          )
+          distances = [-1 if path is None else len(path) - 1 for path in paths]
+      except oracle_guards.BudgetExceededError:
+        continue
+      if self.ego_radius is None:
+        query_graph = graph
+        encoded_graph = graph_cache.encode_graph(graph, encoding_method)
+      for query, ((source, target), distance) in enumerate(
+          zip(pairs, distances)
+      ):
+        if self.ego_radius is not None:
+          query_graph, (source, target) = ego_subgraph(
+              graph, [source, target], self.ego_radius, paths[query]
+          )
+          encoded_graph = graph_cache.encode_graph(query_graph, encoding_method)
+        task_description = (
+            'Q: Is there a path from node %s to node %s?\nA: '
+            % (
+                name_dict[source],
+                name_dict[target],
+            )
+        )
+        if distance >= 0:
+          answer = 'Yes.'
+        else:
+          answer = 'No.'
+        yield {
+            'question': encoded_graph + task_description,
+            'answer': answer,
+            'nnodes': str(len(query_graph.nodes())),
+            'nedges': str(len(query_graph.edges())),
+            'task_description': task_description,
+            'graph': query_graph,
+            'algorithm': generator_algorithms[ind],
+            'node_ids': [source, target],
+        }
 
   def create_few_shot_example(
       self, graph: nx.Graph, encoding_method: str, cot: bool
@@ -618,7 +786,7 @@ class Reachability(GraphTask):
         graph, encoding_method
     )
     source, target = random.sample(list(graph.nodes()), k=2)
-    question = graph_text_encoders.encode_graph(graph, encoding_method)
+    question = graph_cache.encode_graph(graph, encoding_method)
     question += 'Q: Is there a path from node %s to node %s?\nA: ' % (
         name_dict[source],
         name_dict[target],
@@ -653,52 +821,115 @@ class Reachability(GraphTask):
 
 
 class ShortestPath(GraphTask):
-  """The graph task to check if there is a path from a source to target."""
+  """The graph task to check if there is a path from a source to target.
 
-  def __init__(self):
+  Each graph is asked `queries_per_graph` questions about distinct node pairs,
+  all sharing the encoding of the graph and the BFS from each source. If
+  `label_distribution` is set (e.g. `{1: 0.25, 2: 0.25, 3: 0.25, -1: 0.25}`,
+  where -1 stands for no path), the pairs are drawn from the distance matrix
+  so that the path lengths follow it.
+
+  If `ego_radius` is set, each question only encodes the subgraph within
+  `ego_radius` hops of its two nodes, together with a shortest path between
+  them, which keeps the prompts of large graphs short. The subgraph then has
+  the same distance between the nodes as the graph.
+  """
+
+  def __init__(
+      self,
+      queries_per_graph: int = 1,
+      label_distribution: dict[int, float] | None = None,
+      ego_radius: int | None = None,
+  ):
     super().__init__()
     self.name = 'shortest_path'
+    self.queries_per_graph = queries_per_graph
+    self.label_distribution = label_distribution
+    self.ego_radius = ego_radius
 
-  def prepare_examples_dict(
+  def iterate_examples(
       self,
       graphs: list[nx.Graph],
       generator_algorithms: list[str],
       encoding_method: str,
-  ) -> dict[int, dict[str, str | list[int]]]:
-    examples_dict = {}
+  ) -> Iterator[dict[str, str | list[int]]]:
     name_dict = graph_text_encoders.get_tlag_node_encoder(None, encoding_method)
 
     for ind, graph in enumerate(graphs):
-      source, target = random.sample(list(graph.nodes()), k=2)
-      question = graph_text_encoders.encode_graph(graph, encoding_method)
-      task_description = (
-          'Q: What is the length of the shortest path from node %s to node'
-          ' %s?\nA: '
-          % (
+      index = graph_cache.get_index(graph)
+      try:
+        if self.label_distribution is None:
+          pairs = sample_node_pairs(graph, self.queries_per_graph)
+        else:
+          pairs = self.run_oracle(
+              'distance_matrix',
+              graph,
+              generator_algorithms[ind],
+              lambda: index.sample_pairs_by_label(
+                  index.distance_matrix(),
+                  self.label_distribution,
+                  self.queries_per_graph,
+              ),
+          )
+        if self.ego_radius is None:
+          distances = self.run_oracle(
+              'shortest_path',
+              graph,
+              generator_algorithms[ind],
+              lambda: [
+                  index.distances_from(source)[index.position[target]]
+                  for source, target in pairs
+              ],
+          )
+        else:
+          paths = self.run_oracle(
+              'shortest_path',
+              graph,
+              generator_algorithms[ind],
+              lambda: [
+                  index.shortest_path(source, target)
+                  for source, target in pairs
+              ],
+          )
+          distances = [-1 if path is None else len(path) - 1 for path in paths]
+      except oracle_guards.BudgetExceededError:
+        continue
+      if self.ego_radius is None:
+        query_graph = graph
+        encoded_graph = graph_cache.encode_graph(graph, encoding_method)
+      for query, ((source, target), distance) in enumerate(
+          zip(pairs, distances)
+      ):
+        if self.ego_radius is not None:
+          query_graph, (source, target) = ego_subgraph(
+              graph, [source, target], self.ego_radius, paths[query]
+          )
+          encoded_graph = graph_cache.encode_graph(query_graph, encoding_method)
+        task_description = (
+            'Q: What is the length of the shortest path from node %s to node'
+            ' %s?\nA: '
+            % (
+                name_dict[source],
+                name_dict[target],
+            )
+        )
+        if distance >= 0:
+          answer = str(distance) + '.'
+        else:
+          answer = 'There is no path from node %s to node %s.' % (
               name_dict[source],
               name_dict[target],
           )
-      )
-      question += task_description
-      try:
-        path = nx.shortest_path(graph, source, target)
-        answer = str(len(path) - 1) + '.'
-      except nx.NetworkXNoPath:
-        answer = 'There is no path from node %s to node %s.' % (
-            name_dict[source],
-            name_dict[target],
-        )
-      examples_dict[ind] = {
-          'question': question,
-          'answer': answer,
-          'nnodes': str(len(graph.nodes())),
-          'nedges': str(len(graph.edges())),
-          'task_description': task_description,
-          'graph': graph,
-          'algorithm': generator_algorithms[ind],
-          'node_ids': [source, target],
-      }
-    return examples_dict
+        yield {
+            'question': encoded_graph + task_description,
+            'answer': answer,
+            'nnodes': str(len(query_graph.nodes())),
+            'nedges': str(len(query_graph.edges())),
+            'task_description': task_description,
+            'graph': query_graph,
+            'algorithm': generator_algorithms[ind],
+            'node_ids': [source, target],
+        }
 
   def create_few_shot_example(
       self, graph: nx.Graph, encoding_method: str, cot: bool
@@ -707,7 +938,7 @@ class ShortestPath(GraphTask):
         graph, encoding_method
     )
     source, target = random.sample(list(graph.nodes()), k=2)
-    question = graph_text_encoders.encode_graph(graph, encoding_method)
+    question = graph_cache.encode_graph(graph, encoding_method)
     question += (
         'Q: What is the length of the shortest path from node %s to node'
         ' %s?\nA: '
@@ -756,22 +987,33 @@ class TriangleCounting(GraphTask):
     self.name = 'triangle_counting'
     self._task_description = 'Q: How many triangles are in this graph?\nA: '
 
-  def prepare_examples_dict(
+  def iterate_examples(
       self,
       graphs: list[nx.Graph],
       generator_algorithms: list[str],
       encoding_method: str,
-  ) -> dict[int, dict[str, str | list[int]]]:
-    examples_dict = {}
+  ) -> Iterator[dict[str, str | list[int]]]:
     for ind, graph in enumerate(graphs):
       question = (
-          graph_text_encoders.encode_graph(graph, encoding_method)
+          graph_cache.encode_graph(graph, encoding_method)
           + self._task_description
       )
-      ntriangles = int(np.sum(list(nx.triangles(graph).values())) / 3)
+      try:
+        ntriangles = graph_cache.memoize(
+            graph,
+            'ntriangles',
+            lambda: self.run_oracle(
+                'triangles',
+                graph,
+                generator_algorithms[ind],
+                lambda: int(np.sum(list(nx.triangles(graph).values())) / 3),
+            ),
+        )
+      except oracle_guards.BudgetExceededError:
+        continue
 
       answer = '%i.' % ntriangles
-      examples_dict[ind] = {
+      yield {
           'question': question,
           'answer': answer,
           'nnodes': str(len(graph.nodes())),
@@ -781,7 +1023,6 @@ class TriangleCounting(GraphTask):
           'algorithm': generator_algorithms[ind],
           'node_ids': [],
       }
-    return examples_dict
 
   def create_few_shot_example(
       self, graph: nx.Graph, encoding_method: str, cot: bool
@@ -791,7 +1032,7 @@ class TriangleCounting(GraphTask):
         graph, encoding_method
     )
     question = (
-        graph_text_encoders.encode_graph(graph, encoding_method)
+        graph_cache.encode_graph(graph, encoding_method)
         + self._task_description
     )
     triangles_dict = nx.triangles(graph)
@@ -833,39 +1074,52 @@ class MaximumFlow(GraphTask):
     super().__init__()
     self.name = 'maximum_flow'
 
-  def prepare_examples_dict(
+  def iterate_examples(
       self,
       graphs: list[nx.Graph],
       generator_algorithms: list[str],
       encoding_method: str,
-  ) -> dict[int, dict[str, str | list[int]]]:
-    examples_dict = {}
+  ) -> Iterator[dict[str, str | list[int]]]:
     name_dict = graph_text_encoders.get_tlag_node_encoder(None, encoding_method)
 
     for ind, graph in enumerate(graphs):
-      graph = add_edge_weight(graph)
-      source, target = random.sample(list(graph.nodes()), k=2)
-      question = graph_text_encoders.encode_graph(graph, encoding_method)
+      weighted_graph = add_edge_weight(graph)
+      source, target = random.sample(list(weighted_graph.nodes()), k=2)
+      question = graph_cache.encode_graph(weighted_graph, encoding_method)
       task_description = (
           'Q: What is the maximum capacity of the flow from node %s to node'
           ' %s?\nA: ' % (name_dict[source], name_dict[target])
       )
       question += task_description
-      maximum_flow_value = nx.maximum_flow(
-          graph, source, target, capacity='weight'
-      )[0]
+      try:
+        maximum_flow_value = graph_cache.memoize(
+            weighted_graph,
+            ('maximum_flow', source, target),
+            # The cost guard defers the graph given to the task, rather than
+            # its weighted copy.
+            lambda: self.run_oracle(
+                'maximum_flow',
+                graph,
+                generator_algorithms[ind],
+                lambda: nx.maximum_flow(
+                    weighted_graph, source, target, capacity='weight'
+                )[0],
+            ),
+            with_edge_data=True,
+        )
+      except oracle_guards.BudgetExceededError:
+        continue
       answer = str(maximum_flow_value) + '.'
-      examples_dict[ind] = {
+      yield {
           'question': question,
           'answer': answer,
-          'nnodes': str(len(graph.nodes())),
-          'nedges': str(len(graph.edges())),
+          'nnodes': str(len(weighted_graph.nodes())),
+          'nedges': str(len(weighted_graph.edges())),
           'task_description': task_description,
-          'graph': graph,
+          'graph': weighted_graph,
           'algorithm': generator_algorithms[ind],
           'node_ids': [source, target],
       }
-    return examples_dict
 
   def create_few_shot_example(
       self, graph: nx.Graph, encoding_method: str, cot: bool
@@ -875,7 +1129,7 @@ class MaximumFlow(GraphTask):
         graph, encoding_method
     )
     source, target = random.sample(list(graph.nodes()), k=2)
-    question = graph_text_encoders.encode_graph(graph, encoding_method)
+    question = graph_cache.encode_graph(graph, encoding_method)
     question += (
         'Q: What is the maximum capacity of the flow from node %s to'
         ' node %s?\nA: ' % (name_dict[source], name_dict[target])
@@ -916,13 +1170,100 @@ def has_edge_weights(graph):
   return True
 
 
+def has_cycle(graph: nx.Graph) -> bool:
+  try:
+    nx.find_cycle(graph)
+    return True
+  except nx.NetworkXNoCycle:
+    return False
+
+
 def add_edge_weight(graph):
+  """Returns the graph with random weights on its edges.
+
+  A graph without weights is copied rather than changed in place, so that the
+  other tasks on the graph, and the later calls on it, do not see the weights.
+
+  Args:
+    graph: the graph to weight.
+
+  Returns:
+    The graph if all its edges have weights, or a weighted copy.
+  """
   if has_edge_weights(graph):
     return graph
-  else:
-    for edge in graph.edges():
-      graph[edge[0]][edge[1]]['weight'] = random.randint(1, 10)
-    return graph
+  graph = graph.copy()
+  for edge in graph.edges():
+    graph[edge[0]][edge[1]]['weight'] = random.randint(1, 10)
+  return graph
+
+
+def sample_nodes(graph: nx.Graph, k: int) -> list[int]:
+  """Samples k distinct nodes of the graph, or all of them if it is smaller."""
+  nodes = list(graph.nodes())
+  return random.sample(nodes, k=min(k, len(nodes)))
+
+
+def sample_node_pairs(graph: nx.Graph, k: int) -> list[tuple[int, int]]:
+  """Samples k distinct ordered pairs of different nodes of the graph.
+
+  A single pair is drawn exactly as `random.sample(nodes, k=2)` would, so that
+  one query per graph reproduces the examples of earlier versions.
+
+  Args:
+    graph: the graph to sample the pairs from.
+    k: the number of pairs. Capped by the number of ordered pairs.
+
+  Returns:
+    A list of (source, target) tuples.
+  """
+  nodes = list(graph.nodes())
+  if k == 1:
+    return [tuple(random.sample(nodes, k=2))]
+  nnodes = len(nodes)
+  npairs = nnodes * (nnodes - 1)
+  pairs = []
+  for code in random.sample(range(npairs), k=min(k, npairs)):
+    source, target = divmod(code, nnodes - 1)
+    # Skipping the diagonal of the nnodes x nnodes pair matrix.
+    if target >= source:
+      target += 1
+    pairs.append((nodes[source], nodes[target]))
+  return pairs
+
+
+def ego_subgraph(
+    graph: nx.Graph,
+    centers: list[int],
+    radius: int,
+    extra_nodes: list[int] | None = None,
+) -> tuple[nx.Graph, list[int]]:
+  """Extracts the subgraph within `radius` hops of some nodes.
+
+  Edges are followed in both directions. The subgraph is induced by the nodes
+  found and `extra_nodes`, and its nodes are relabeled 0..k-1 in graph order so
+  that the names of the encoders cover them. Only the nodes and edges near the
+  centers are visited.
+
+  Args:
+    graph: the graph to extract the subgraph from.
+    centers: the nodes the questions are about.
+    radius: the number of hops around the centers.
+    extra_nodes: more nodes to keep, e.g. the ones of a shortest path.
+
+  Returns:
+    The subgraph and the new labels of the centers.
+  """
+  index = graph_cache.get_index(graph)
+  positions = index.ego_positions(
+      [index.position[node] for node in centers], radius
+  )
+  if extra_nodes:
+    positions = np.union1d(
+        positions, [index.position[node] for node in extra_nodes]
+    )
+  subgraph, new_labels = index.induced_subgraph(positions)
+  return subgraph, [new_labels[node] for node in centers]
 
 
 class NodeClassification(GraphTask):
@@ -940,17 +1281,16 @@ class NodeClassification(GraphTask):
         'surfing',
     ]
 
-  def prepare_examples_dict(
+  def iterate_examples(
       self,
       graphs: list[nx.Graph],
       generator_algorithms: list[str],
       encoding_method: str,
-  ) -> dict[int, dict[str, str | list[int]]]:
+  ) -> Iterator[dict[str, str | list[int]]]:
     classes = random.sample(list(self.classes), k=2)
-    examples_dict = {}
     name_dict = graph_text_encoders.get_tlag_node_encoder(None, encoding_method)
     for ind, graph in enumerate(graphs):
-      question = graph_text_encoders.encode_graph(graph, encoding_method)
+      question = graph_cache.encode_graph(graph, encoding_method)
       nnodes = len(graph.nodes())
       # Sampling nnodes // 2 + 1 nodes.
       sampled_nodes = random.sample(
@@ -971,7 +1311,7 @@ class NodeClassification(GraphTask):
       question += task_description
       answer = classes[sampled_nodes[-1][1]['block']]
 
-      examples_dict[ind] = {
+      yield {
           'question': question,
           'answer': answer,
           'nnodes': str(nnodes),
@@ -983,8 +1323,6 @@ class NodeClassification(GraphTask):
           'node_ids': [sampled_nodes[-1][0]],
       }
 
-    return examples_dict
-
   def create_few_shot_example(
       self, graph: nx.Graph, encoding_method: str, cot: bool
   ) -> str:
@@ -992,7 +1330,7 @@ class NodeClassification(GraphTask):
     name_dict = graph_text_encoders.get_tlag_node_encoder(
         graph, encoding_method
     )
-    question = graph_text_encoders.encode_graph(graph, encoding_method)
+    question = graph_cache.encode_graph(graph, encoding_method)
     nnodes = len(graph.nodes())
     sampled_nodes = random.sample(
         list(graph.nodes(data=True)), k=nnodes // 2 + 1
@@ -1018,3 +1356,20 @@ class NodeClassification(GraphTask):
       )
       answer += explanation
     return question + answer
+
+
+# A dictionary from task name to the corresponding task class.
+TASK_CLASS = {
+    'edge_existence': EdgeExistence,
+    'node_degree': NodeDegree,
+    'node_count': NodeCount,
+    'edge_count': EdgeCount,
+    'connected_nodes': ConnectedNodes,
+    'disconnected_nodes': DisconnectedNodes,
+    'cycle_check': CycleCheck,
+    'reachability': Reachability,
+    'shortest_path': ShortestPath,
+    'maximum_flow': MaximumFlow,
+    'node_classification': NodeClassification,
+    'triangle_counting': TriangleCounting,
+}
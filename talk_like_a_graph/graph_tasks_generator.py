@@ -7,16 +7,21 @@ a recordio file in the task directory provided.
 """
 
 from collections.abc import Sequence
+import math
 import os
 import random
 
 from absl import app
 from absl import flags
 import networkx as nx
-import numpy as np
 
+from . import dynamic_graph_tasks
+from . import graph_cache
 from . import graph_tasks
 from . import graph_tasks_utils as utils
+from . import oracle_guards
+from . import prompt_prefixes
+from . import work_scheduler
 
 _TASK_DIR = flags.DEFINE_string(
     'task_dir', None, 'The directory to write tasks.', required=True
@@ -30,39 +35,196 @@ _RANDOM_SEED = flags.DEFINE_integer(
     'The random seed to use for task generation.',
     required=True,
 )
+_TASKS = flags.DEFINE_list(
+    'tasks',
+    ['shortest_path'],
+    'The tasks to create examples for. All of them are created in a single'
+    ' pass over the graphs.',
+)
+_QUERIES_PER_GRAPH = flags.DEFINE_integer(
+    'queries_per_graph',
+    1,
+    'The number of questions to ask about each graph in the node and pair'
+    ' based tasks and in the dynamic graph tasks.',
+)
+_EGO_RADIUS = flags.DEFINE_integer(
+    'ego_radius',
+    0,
+    'If positive, the questions of the node and pair based tasks other than'
+    ' disconnected_nodes only encode the subgraph within this many hops of'
+    ' their nodes, for tasks on large graphs.',
+)
+_NUM_UPDATES = flags.DEFINE_integer(
+    'num_updates',
+    10,
+    'The number of edge insertions and deletions applied to each graph in the'
+    ' dynamic graph tasks (e.g. dynamic_reachability).',
+)
+_NUM_WORKERS = flags.DEFINE_integer(
+    'num_workers',
+    0,
+    'If positive, every example is seeded from its task, the random seed, its'
+    ' graph index and its text encoder, and the examples are created by this'
+    ' many processes. The output does not depend on the number of workers.',
+)
+_CHUNK_SIZE = flags.DEFINE_integer(
+    'chunk_size',
+    64,
+    'The number of graphs handed to a worker at a time with --num_workers.',
+)
+_CALIBRATION_GRAPHS = flags.DEFINE_integer(
+    'calibration_graphs',
+    0,
+    'If positive with --num_workers, the tasks are first timed on this many'
+    ' graphs to fit a cost model, the chunks handed to the workers have about'
+    ' the same predicted cost, and the estimated time to completion is'
+    ' printed.',
+)
+_ORACLE_MAX_SECONDS = flags.DEFINE_float(
+    'oracle_max_seconds',
+    0,
+    'If positive, the time budget of the task oracles (e.g. maximum flow) on'
+    ' each graph. The graphs exceeding it are skipped, or deferred with'
+    ' --defer_over_budget.',
+)
+_ORACLE_MAX_MEMORY_MB = flags.DEFINE_integer(
+    'oracle_max_memory_mb',
+    0,
+    'If positive, the estimated memory budget in MB of the task oracles on'
+    ' each graph.',
+)
+_ENCODING_CACHE_DIR = flags.DEFINE_string(
+    'encoding_cache_dir',
+    None,
+    'If set, the text encodings of the graphs are also stored in this local'
+    ' directory, and reused by later runs on the same machine. It is written'
+    ' with builtin files, so it cannot be on the storage of --graphs_dir or'
+    ' --task_dir.',
+)
+_DEFER_OVER_BUDGET = flags.DEFINE_bool(
+    'defer_over_budget',
+    False,
+    'Whether the graphs exceeding an oracle budget get their examples created'
+    ' after the others without budgets, in separate *_test_deferred.recordio'
+    ' files.',
+)
+_MAX_TOKENS = flags.DEFINE_integer(
+    'max_tokens',
+    0,
+    'If positive, the few-shot examples over this number of tokens get a'
+    ' compact graph encoding, or a compact encoding of a subgraph keeping the'
+    ' answer, and are dropped if they still do not fit.',
+)
+_PRETOKENIZE = flags.DEFINE_bool(
+    'pretokenize',
+    False,
+    'Whether the few-shot examples also store the token ids of their questions'
+    ' and answers, and their lengths, as int64 features.',
+)
+_PROMPT_LAYOUT = flags.DEFINE_enum(
+    'prompt_layout',
+    'default',
+    prompt_prefixes.PROMPT_LAYOUTS,
+    'The layout of the few-shot prompts. With shared_prefix, the few-shot'
+    ' examples are shared by all the prompts of a text encoder, the examples'
+    ' are written grouped by shared prefix, and the spans of the groups are'
+    ' written to <file>.prefixes.json.',
+)
+_SBM_FEW_SHOT_SPLIT = flags.DEFINE_string(
+    'sbm_few_shot_split',
+    'validation',
+    'The split of the two block SBM graphs of the few-shot examples of node'
+    ' classification. It must differ from the train split, whose graphs are'
+    ' asked about.',
+)
 
+# The graphs of the node classification task, see graph_generators.
+_SBM_ALGORITHM = 'two_block_sbm'
+# The tasks asking questions about given nodes or node pairs.
+_QUERY_TASKS = (
+    'edge_existence',
+    'node_degree',
+    'connected_nodes',
+    'disconnected_nodes',
+    'reachability',
+    'shortest_path',
+)
+# The query tasks whose answers an ego subgraph preserves.
+_EGO_TASKS = (
+    'edge_existence',
+    'node_degree',
+    'connected_nodes',
+    'reachability',
+    'shortest_path',
+)
 
-def zero_shot(
-    task: graph_tasks.GraphTask,
+
+def zero_shot_tasks(
+    tasks: list[graph_tasks.GraphTask],
     graphs: list[nx.Graph],
     algorithms: list[str],
     text_encoders: list[str],
-    cot: bool,
     random_seed: int,
     split: str,
 ) -> None:
-  """Creating zero-shot or zero-cot examples for the given task.
+  """Creating zero-shot and zero-cot examples for several tasks in one pass.
 
   Args:
-    task: the corresponding graph task.
-    graphs: the list of graphs to use for the task.
+    tasks: the graph tasks to create examples for.
+    graphs: the list of graphs to use for the tasks.
     algorithms: the algorithm used to generate the graphs.
     text_encoders: the encoders to use in the tasks.
-    cot: whether to apply cot or not.
     random_seed: the random seed to use in the process.
     split: whether we are creating a train or test split.
   """
-  random.seed(random_seed)
-  zero_shot_examples = utils.create_zero_shot_task(
-      task, graphs, algorithms, text_encoders, cot=cot
+  if not tasks:
+    return
+  cost_model = None
+  if _NUM_WORKERS.value and _CALIBRATION_GRAPHS.value:
+    cost_model = work_scheduler.CostModel.calibrate(
+        tasks,
+        graphs,
+        algorithms,
+        text_encoders,
+        num_samples=_CALIBRATION_GRAPHS.value,
+    )
+    plan = work_scheduler.WorkPlan(
+        cost_model,
+        tasks,
+        graphs,
+        text_encoders,
+        math.ceil(len(graphs) / _CHUNK_SIZE.value),
+    )
+    print(
+        'Estimated time to create the %s examples: %.0f seconds'
+        % (split, plan.estimated_seconds(_NUM_WORKERS.value, False))
+    )
+  examples = utils.iterate_zero_shot_tasks(
+      tasks,
+      graphs,
+      algorithms,
+      text_encoders,
+      random_seed,
+      num_workers=_NUM_WORKERS.value or None,
+      chunk_size=_CHUNK_SIZE.value,
+      cost_model=cost_model,
   )
-
-  file_name = task.name + ('_zero_cot_' if cot else '_zero_shot_')
-
-  file_name += split + '.recordio'
-  utils.write_examples(
-      zero_shot_examples,
-      os.path.join(_TASK_DIR.value, file_name),
+  # The examples are written while they are created.
+  utils.write_zero_shot_tasks(
+      examples,
+      {
+          task.name: (
+              os.path.join(
+                  _TASK_DIR.value,
+                  task.name + '_zero_shot_' + split + '.recordio',
+              ),
+              os.path.join(
+                  _TASK_DIR.value,
+                  task.name + '_zero_cot_' + split + '.recordio',
+              ),
+          )
+          for task in tasks
+      },
   )
 
 
@@ -75,6 +237,7 @@ def few_shot(
     cot: bool,
     bag: bool,
     random_seed: int,
+    split: str = 'test',
 ) -> None:
   """Creating few-shot, cot, or cot-bag examples for the given task.
 
@@ -87,6 +250,7 @@ def few_shot(
     cot: whether to apply cot or not.
     bag: whether to apply build-a-graph method or not.
     random_seed: the random seed to use in the process.
+    split: the split of the graphs, in the file names.
   """
   random.seed(random_seed)
   few_shot_examples = utils.create_few_shot_task(
@@ -98,37 +262,158 @@ def few_shot(
       cot=cot,
       bag=bag,
       random_seed=random_seed,
+      num_workers=_NUM_WORKERS.value or None,
+      max_tokens=_MAX_TOKENS.value or None,
+      pretokenize=_PRETOKENIZE.value,
+      prompt_layout=_PROMPT_LAYOUT.value,
   )
   file_name = task.name
   if cot and bag:
-    file_name += '_few_shot_cot_bag_test.recordio'
+    file_name += '_few_shot_cot_bag_'
   elif cot:
-    file_name += '_few_shot_cot_test.recordio'
+    file_name += '_few_shot_cot_'
   else:
-    file_name += '_few_shot_test.recordio'
+    file_name += '_few_shot_'
+  file_name += split + '.recordio'
 
   utils.write_examples(
       few_shot_examples,
       os.path.join(_TASK_DIR.value, file_name),
   )
+  if _PROMPT_LAYOUT.value == 'shared_prefix':
+    utils.write_prefix_manifest(
+        few_shot_examples,
+        os.path.join(_TASK_DIR.value, file_name + '.prefixes.json'),
+    )
+
+
+def create_task(task_name: str) -> graph_tasks.GraphTask:
+  if task_name in dynamic_graph_tasks.TASK_CLASS:
+    task = dynamic_graph_tasks.TASK_CLASS[task_name](
+        num_updates=_NUM_UPDATES.value,
+        queries_per_graph=_QUERIES_PER_GRAPH.value,
+    )
+  elif task_name in _EGO_TASKS and _EGO_RADIUS.value > 0:
+    task = graph_tasks.TASK_CLASS[task_name](
+        queries_per_graph=_QUERIES_PER_GRAPH.value,
+        ego_radius=_EGO_RADIUS.value,
+    )
+  elif task_name in _QUERY_TASKS:
+    task = graph_tasks.TASK_CLASS[task_name](
+        queries_per_graph=_QUERIES_PER_GRAPH.value
+    )
+  else:
+    task = graph_tasks.TASK_CLASS[task_name]()
+  if _ORACLE_MAX_SECONDS.value or _ORACLE_MAX_MEMORY_MB.value:
+    task.cost_guard = oracle_guards.CostGuard(
+        max_seconds={
+            oracle: _ORACLE_MAX_SECONDS.value
+            for oracle in oracle_guards.ORACLES
+        },
+        max_memory={
+            oracle: _ORACLE_MAX_MEMORY_MB.value * 2**20
+            for oracle in oracle_guards.ORACLES
+        },
+        defer=_DEFER_OVER_BUDGET.value,
+    )
+  return task
+
+
+def zero_shot_deferred(
+    tasks: list[graph_tasks.GraphTask],
+    text_encoders: list[str],
+    random_seed: int,
+    split: str,
+) -> None:
+  """Creating the zero-shot examples of the graphs deferred by cost guards.
 
+  This is the slow queue of the run: the deferred graphs of each task are
+  processed after all the others, without budgets.
 
-def generate_random_sbm_graph(random_state: np.random.RandomState):
-  # Sampling a small number as the probability of the two nodes in different
-  # communities being connected.
-  small_number = random.uniform(0, 0.05)
-  # Sampling a large number as probability of the nodes in one community
-  # being connected.
-  large_number = random.uniform(0.6, 0.8)
-  number_of_nodes = random.choice(np.arange(5, 20))
-  sizes = [number_of_nodes // 2, number_of_nodes // 2]
-  probs = [[large_number, small_number], [small_number, large_number]]
-  return nx.stochastic_block_model(sizes, probs, seed=random_state)
+  Args:
+    tasks: the graph tasks, with or without cost guards.
+    text_encoders: the encoders to use in the tasks.
+    random_seed: the random seed to use in the process.
+    split: whether we are creating a train or test split.
+  """
+  for task in tasks:
+    deferred = _take_deferred(task)
+    if not deferred:
+      continue
+    cost_guard = task.cost_guard
+    task.cost_guard = None
+    zero_shot_tasks(
+        [task],
+        list(deferred),
+        list(deferred.values()),
+        text_encoders,
+        random_seed,
+        split + '_deferred',
+    )
+    task.cost_guard = cost_guard
+
+
+def few_shot_deferred(
+    task: graph_tasks.GraphTask,
+    few_shot_graphs: list[nx.Graph],
+    text_encoders: list[str],
+    cot: bool,
+    bag: bool,
+    random_seed: int,
+) -> None:
+  """Creating the few-shot examples of the graphs deferred by a few-shot pass.
+
+  Like zero_shot_deferred, the deferred graphs are processed without budgets,
+  and written to <task>_few_shot[_cot[_bag]]_test_deferred.recordio files.
+
+  Args:
+    task: the graph task, with or without a cost guard.
+    few_shot_graphs: the list of graphs to generate few shot examples for.
+    text_encoders: the encoders to use in the tasks.
+    cot: whether to apply cot or not.
+    bag: whether to apply build-a-graph method or not.
+    random_seed: the random seed to use in the process.
+  """
+  deferred = _take_deferred(task)
+  if not deferred:
+    return
+  cost_guard = task.cost_guard
+  task.cost_guard = None
+  few_shot(
+      task,
+      list(deferred),
+      few_shot_graphs,
+      list(deferred.values()),
+      text_encoders,
+      cot=cot,
+      bag=bag,
+      random_seed=random_seed,
+      split='test_deferred',
+  )
+  task.cost_guard = cost_guard
+
+
+def _take_deferred(task: graph_tasks.GraphTask) -> dict[nx.Graph, str]:
+  """Returns the graphs deferred by the cost guard of a task, and forgets them.
+  """
+  if task.cost_guard is None:
+    return {}
+  deferred = task.cost_guard.deferred
+  task.cost_guard.deferred = {}
+  return deferred
 
 
 def main(argv: Sequence[str]) -> None:
   if len(argv) > 1:
     raise app.UsageError('Too many command-line arguments.')
+  if _SBM_FEW_SHOT_SPLIT.value == 'train':
+    raise app.UsageError(
+        'The node classification few-shot examples would come from its test'
+        ' graphs with --sbm_few_shot_split=train.'
+    )
+
+  if _ENCODING_CACHE_DIR.value:
+    graph_cache.set_encoding_store(_ENCODING_CACHE_DIR.value)
 
   algorithms = ['er']
   directions = ['undirected']
@@ -148,39 +433,57 @@ def main(argv: Sequence[str]) -> None:
       graphs += loaded_graphs
       generator_algorithms += [algorithm] * len(loaded_graphs)
 
-  # Defining a task on the graphs
-  task = graph_tasks.ShortestPath()
-
-  if isinstance(task, graph_tasks.NodeClassification):
-    # The node classification task requires SBM graphs. As it's not possible to
-    # write graphs with data (e.g., blocks data as in SBM graphs), we regenerate
-    # graphs.
-
-    random_state = np.random.RandomState(_RANDOM_SEED.value)
-    print('Generating sbm graphs')
-    graphs = [
-        generate_random_sbm_graph(random_state) for _ in range(len(graphs))
-    ]
+  # Defining the tasks on the graphs.
+  tasks = [create_task(task_name) for task_name in _TASKS.value]
+  sbm_tasks = [
+      task for task in tasks if isinstance(task, graph_tasks.NodeClassification)
+  ]
+  tasks_on_graphs = [task for task in tasks if task not in sbm_tasks]
+
+  # The node classification task runs on stored two block SBM graphs, whose
+  # node blocks are restored by load_graphs.
+  sbm_graphs = []
+  if sbm_tasks:
+    for direction in directions:
+      sbm_graphs += utils.load_graphs(
+          _GRAPHS_DIR.value,
+          _SBM_ALGORITHM,
+          'train',
+          direction,
+      )
+  sbm_generator_algorithms = [_SBM_ALGORITHM] * len(sbm_graphs)
 
-  zero_shot(
-      task,
+  zero_shot_tasks(
+      tasks_on_graphs,
       graphs,
       generator_algorithms,
       text_encoders,
-      cot=False,
       random_seed=_RANDOM_SEED.value,
       split='test',
   )
-  zero_shot(
-      task,
-      graphs,
-      generator_algorithms,
+  zero_shot_deferred(
+      tasks_on_graphs,
       text_encoders,
-      cot=True,
       random_seed=_RANDOM_SEED.value,
       split='test',
   )
 
+  if sbm_tasks:
+    zero_shot_tasks(
+        sbm_tasks,
+        sbm_graphs,
+        sbm_generator_algorithms,
+        text_encoders,
+        random_seed=_RANDOM_SEED.value,
+        split='test',
+    )
+    zero_shot_deferred(
+        sbm_tasks,
+        text_encoders,
+        random_seed=_RANDOM_SEED.value,
+        split='test',
+    )
+
   # Loading few-shot graphs.
   few_shot_graphs = []
   for algorithm in algorithms:
@@ -192,49 +495,48 @@ def main(argv: Sequence[str]) -> None:
           direction,
       )
 
-  if isinstance(task, graph_tasks.NodeClassification):
-    # The node classification task requires SBM graphs. As it's not possible to
-    # write graphs with data (e.g., blocks data as in SBM graphs), we regenerate
-    # graphs.
-    random_state = np.random.RandomState(_RANDOM_SEED.value + 1)
-    print('Generating few shot sbm graphs')
-    few_shot_graphs = [
-        generate_random_sbm_graph(random_state)
-        for _ in range(len(few_shot_graphs))
-    ]
-
-  few_shot(
-      task,
-      graphs,
-      few_shot_graphs,
-      generator_algorithms,
-      text_encoders,
-      cot=False,
-      bag=False,
-      random_seed=_RANDOM_SEED.value,
-  )
+  sbm_few_shot_graphs = []
+  if sbm_tasks:
+    for direction in directions:
+      sbm_few_shot_graphs += utils.load_graphs(
+          _GRAPHS_DIR.value,
+          _SBM_ALGORITHM,
+          _SBM_FEW_SHOT_SPLIT.value,
+          direction,
+      )
 
-  few_shot(
-      task,
-      graphs,
-      few_shot_graphs,
-      generator_algorithms,
-      text_encoders,
-      cot=True,
-      bag=False,
-      random_seed=_RANDOM_SEED.value,
-  )
+  # The test and few-shot graphs are shared by all tasks, so each graph is only
+  # encoded once per text encoder (see graph_cache).
+  for task in tasks:
+    if task in sbm_tasks:
+      task_graphs, task_few_shot_graphs = sbm_graphs, sbm_few_shot_graphs
+      task_generator_algorithms = sbm_generator_algorithms
+    else:
+      task_graphs, task_few_shot_graphs = graphs, few_shot_graphs
+      task_generator_algorithms = generator_algorithms
+    for cot, bag in ((False, False), (True, False), (True, True)):
+      few_shot(
+          task,
+          task_graphs,
+          task_few_shot_graphs,
+          task_generator_algorithms,
+          text_encoders,
+          cot=cot,
+          bag=bag,
+          random_seed=_RANDOM_SEED.value,
+      )
+      few_shot_deferred(
+          task,
+          task_few_shot_graphs,
+          text_encoders,
+          cot=cot,
+          bag=bag,
+          random_seed=_RANDOM_SEED.value,
+      )
 
-  few_shot(
-      task,
-      graphs,
-      few_shot_graphs,
-      generator_algorithms,
-      text_encoders,
-      cot=True,
-      bag=True,
-      random_seed=_RANDOM_SEED.value,
-  )
+  for task in tasks:
+    if task.cost_guard is not None:
+      print('Cost guard counts of %s: %s' % (task.name, task.cost_guard.counts))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,404 @@
+"""Seeded, parallel creation of the examples of graph tasks.
+
+In this mode the global random state is seeded before every example from
+(task, split seed, graph index, text encoder), so the examples do not depend on
+the order in which the graphs are visited. The graphs can then be split into
+chunks and handed to a pool of processes, and the output is the same for any
+number of workers and any chunk size.
+"""
+
+import collections
+from collections.abc import Iterator
+from concurrent import futures
+import copy
+import hashlib
+import math
+import random
+
+import networkx as nx
+
+from . import graph_cache
+from . import graph_tasks
+from . import work_scheduler
+
+
+def example_seed(
+    task_name: str, random_seed: int, graph_index: int, encoding_method: str
+) -> int:
+  """Derives the random seed of the examples a task asks about one graph."""
+  key = '%s/%d/%d/%s' % (task_name, random_seed, graph_index, encoding_method)
+  return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], 'big')
+
+
+def prepare_seeded_examples_dicts(
+    tasks: list[graph_tasks.GraphTask],
+    graphs: list[nx.Graph],
+    generator_algorithms: list[str],
+    text_encoders: list[str],
+    random_seed: int,
+    first_graph_index: int = 0,
+) -> dict[tuple[str, str], dict[int, dict[str, str | list[int]]]]:
+  """Creates the examples of several tasks, seeding each graph separately.
+
+  Args:
+    tasks: the tasks to create examples for.
+    graphs: the list of graphs to use for the tasks.
+    generator_algorithms: the algorithm used to generate each graph.
+    text_encoders: the encoders to use in the tasks.
+    random_seed: the random seed of the split.
+    first_graph_index: the index of graphs[0] in the whole split.
+
+  Returns:
+    A dict from (task name, text encoder) to the examples dict of the task.
+  """
+  examples_dicts = {
+      (task.name, encoding_method): {}
+      for task in tasks
+      for encoding_method in text_encoders
+  }
+  for ind, graph in enumerate(graphs):
+    if len(text_encoders) > 1:
+      graph_cache.prefill_encodings(graph, text_encoders)
+    for encoding_method in text_encoders:
+      for task in tasks:
+        random.seed(
+            example_seed(
+                task.name,
+                random_seed,
+                first_graph_index + ind,
+                encoding_method,
+            )
+        )
+        graph_examples_dict = task.prepare_examples_dict(
+            [graph], generator_algorithms[ind : ind + 1], encoding_method
+        )
+        examples_dict = examples_dicts[(task.name, encoding_method)]
+        for value in graph_examples_dict.values():
+          examples_dict[len(examples_dict)] = value
+  return examples_dicts
+
+
+# For each task with a cost guard, the counts of the guard on a chunk of graphs
+# and the indices of the graphs it deferred, with their generator algorithms.
+_GuardReports = dict[str, tuple[collections.Counter, dict[int, str]]]
+
+
+def _prepare_chunk(
+    tasks: list[graph_tasks.GraphTask],
+    graphs: list[nx.Graph],
+    generator_algorithms: list[str],
+    text_encoders: list[str],
+    random_seed: int,
+    first_graph_index: int,
+) -> tuple[
+    dict[tuple[str, str], dict[int, dict[str, str | list[int]]]],
+    _GuardReports,
+]:
+  """Runs prepare_seeded_examples_dicts on a chunk with new cost guard runs.
+
+  The guards of the tasks are replaced by new runs of them for the chunk, so
+  that what they counted and deferred can be handed back from a worker process
+  and merged with _merge_guard_reports.
+
+  Args:
+    tasks: the tasks to create examples for.
+    graphs: the graphs of the chunk.
+    generator_algorithms: the algorithm used to generate each graph.
+    text_encoders: the encoders to use in the tasks.
+    random_seed: the random seed of the split.
+    first_graph_index: the index of graphs[0] in the whole split.
+
+  Returns:
+    The examples dicts of prepare_seeded_examples_dicts and the guard reports.
+  """
+  cost_guards = {}
+  for task in tasks:
+    if task.cost_guard is not None:
+      cost_guards[task.name] = task.cost_guard
+      task.cost_guard = task.cost_guard.new_run()
+  try:
+    examples_dicts = prepare_seeded_examples_dicts(
+        tasks,
+        graphs,
+        generator_algorithms,
+        text_encoders,
+        random_seed,
+        first_graph_index,
+    )
+    graph_indices = {
+        graph: first_graph_index + ind for ind, graph in enumerate(graphs)
+    }
+    guard_reports = {
+        task.name: (
+            task.cost_guard.counts,
+            {
+                graph_indices[graph]: algorithm
+                for graph, algorithm in task.cost_guard.deferred.items()
+            },
+        )
+        for task in tasks
+        if task.name in cost_guards
+    }
+  finally:
+    for task in tasks:
+      if task.name in cost_guards:
+        task.cost_guard = cost_guards[task.name]
+  return examples_dicts, guard_reports
+
+
+def _merge_guard_reports(
+    tasks: list[graph_tasks.GraphTask],
+    graphs: list[nx.Graph],
+    guard_reports: _GuardReports,
+) -> None:
+  """Merges the guard reports of a chunk into the cost guards of the tasks."""
+  for task in tasks:
+    if task.name in guard_reports:
+      counts, deferred = guard_reports[task.name]
+      task.cost_guard.merge(
+          counts,
+          {graphs[ind]: algorithm for ind, algorithm in deferred.items()},
+      )
+
+
+def _process_pool(num_workers: int) -> futures.ProcessPoolExecutor:
+  # The workers share the encoding store of this process, if any.
+  return futures.ProcessPoolExecutor(
+      max_workers=num_workers,
+      initializer=graph_cache.set_encoding_store,
+      initargs=(graph_cache.encoding_store_directory(),),
+  )
+
+
+def plan_chunks(
+    tasks: list[graph_tasks.GraphTask],
+    graphs: list[nx.Graph],
+    text_encoders: list[str],
+    chunk_size: int = 64,
+    cost_model: work_scheduler.CostModel | None = None,
+) -> list[tuple[int, int]]:
+  """Returns the (start, stop) bounds of the chunks of graphs, in graph order.
+
+  Args:
+    tasks: the tasks to create examples for.
+    graphs: the list of graphs to use for the tasks.
+    text_encoders: the encoders to use in the tasks.
+    chunk_size: the number of graphs per chunk, on average if cost_model is
+      set.
+    cost_model: if set, the chunks have about the same predicted cost instead
+      of the same number of graphs.
+
+  Returns:
+    The chunk bounds.
+  """
+  if cost_model is None:
+    return [
+        (start, min(start + chunk_size, len(graphs)))
+        for start in range(0, len(graphs), chunk_size)
+    ]
+  return work_scheduler.WorkPlan(
+      cost_model,
+      tasks,
+      graphs,
+      text_encoders,
+      math.ceil(len(graphs) / chunk_size),
+  ).units
+
+
+def prepare_examples_dicts(
+    tasks: list[graph_tasks.GraphTask],
+    graphs: list[nx.Graph],
+    generator_algorithms: list[str],
+    text_encoders: list[str],
+    random_seed: int,
+    num_workers: int = 1,
+    chunk_size: int = 64,
+    cost_model: work_scheduler.CostModel | None = None,
+) -> dict[tuple[str, str], dict[int, dict[str, str | list[int]]]]:
+  """Creates the seeded examples of several tasks with a pool of processes.
+
+  Args:
+    tasks: the tasks to create examples for.
+    graphs: the list of graphs to use for the tasks.
+    generator_algorithms: the algorithm used to generate each graph.
+    text_encoders: the encoders to use in the tasks.
+    random_seed: the random seed of the split.
+    num_workers: the number of processes. With one worker the examples are
+      created in this process.
+    chunk_size: the number of graphs handed to a worker at a time.
+    cost_model: if set, the chunks have about the same predicted cost and are
+      handed out by decreasing cost (see work_scheduler).
+
+  Returns:
+    A dict from (task name, text encoder) to the examples dict of the task,
+    the same for any num_workers, chunk_size and cost_model.
+  """
+  if num_workers <= 1:
+    # Workers get copies of the graphs, so the graphs are copied here too in
+    # case a task changes them in place. The guards defer the original graphs.
+    examples_dicts, guard_reports = _prepare_chunk(
+        tasks,
+        copy.deepcopy(graphs),
+        generator_algorithms,
+        text_encoders,
+        random_seed,
+        0,
+    )
+    _merge_guard_reports(tasks, graphs, guard_reports)
+    return examples_dicts
+  if cost_model is None:
+    chunks = plan_chunks(tasks, graphs, text_encoders, chunk_size)
+    order = range(len(chunks))
+  else:
+    plan = work_scheduler.WorkPlan(
+        cost_model,
+        tasks,
+        graphs,
+        text_encoders,
+        math.ceil(len(graphs) / chunk_size),
+    )
+    chunks, order = plan.units, plan.longest_first()
+  with _process_pool(num_workers) as executor:
+    chunk_futures = {}
+    for ind in order:
+      start, stop = chunks[ind]
+      chunk_futures[ind] = executor.submit(
+          _prepare_chunk,
+          tasks,
+          graphs[start:stop],
+          generator_algorithms[start:stop],
+          text_encoders,
+          random_seed,
+          start,
+      )
+    examples_dicts = {
+        (task.name, encoding_method): {}
+        for task in tasks
+        for encoding_method in text_encoders
+    }
+    for ind in range(len(chunks)):
+      chunk_examples_dicts, guard_reports = chunk_futures.pop(ind).result()
+      _merge_guard_reports(tasks, graphs, guard_reports)
+      for key, values in chunk_examples_dicts.items():
+        examples_dict = examples_dicts[key]
+        for value in values.values():
+          examples_dict[len(examples_dict)] = value
+  return examples_dicts
+
+
+def iterate_examples_dicts(
+    tasks: list[graph_tasks.GraphTask],
+    graphs: list[nx.Graph],
+    generator_algorithms: list[str],
+    text_encoders: list[str],
+    random_seed: int,
+    num_workers: int = 1,
+    chunk_size: int = 64,
+    cost_model: work_scheduler.CostModel | None = None,
+) -> Iterator[dict[tuple[str, str], dict[int, dict[str, str | list[int]]]]]:
+  """Yields the seeded examples of several tasks one chunk of graphs at a time.
+
+  At most two chunks per worker are in flight at any time, so memory stays
+  bounded by the chunk size rather than growing with the number of graphs.
+
+  Args:
+    tasks: the tasks to create examples for.
+    graphs: the list of graphs to use for the tasks.
+    generator_algorithms: the algorithm used to generate each graph.
+    text_encoders: the encoders to use in the tasks.
+    random_seed: the random seed of the split.
+    num_workers: the number of processes. With one worker the examples are
+      created in this process.
+    chunk_size: the number of graphs handed to a worker at a time.
+    cost_model: if set, the chunks have about the same predicted cost. They are
+      still handed out in graph order so that they can be yielded in order.
+
+  Yields:
+    For each chunk of graphs in order, a dict from (task name, text encoder) to
+    the examples dict of the task on that chunk.
+  """
+  chunks = plan_chunks(tasks, graphs, text_encoders, chunk_size, cost_model)
+
+  def merged(
+      chunk_result: tuple[
+          dict[tuple[str, str], dict[int, dict[str, str | list[int]]]],
+          _GuardReports,
+      ],
+  ) -> dict[tuple[str, str], dict[int, dict[str, str | list[int]]]]:
+    examples_dicts, guard_reports = chunk_result
+    _merge_guard_reports(tasks, graphs, guard_reports)
+    return examples_dicts
+
+  if num_workers <= 1:
+    for start, stop in chunks:
+      # Workers get copies of the graphs, so the graphs are copied here too in
+      # case a task changes them in place. The guards defer the original
+      # graphs.
+      yield merged(
+          _prepare_chunk(
+              tasks,
+              copy.deepcopy(graphs[start:stop]),
+              generator_algorithms[start:stop],
+              text_encoders,
+              random_seed,
+              start,
+          )
+      )
+    return
+  with _process_pool(num_workers) as executor:
+    pending = collections.deque()
+    for start, stop in chunks:
+      if len(pending) == 2 * num_workers:
+        yield merged(pending.popleft().result())
+      pending.append(
+          executor.submit(
+              _prepare_chunk,
+              tasks,
+              graphs[start:stop],
+              generator_algorithms[start:stop],
+              text_encoders,
+              random_seed,
+              start,
+          )
+      )
+    while pending:
+      yield merged(pending.popleft().result())
+
+
+def iterate_examples(
+    task: graph_tasks.GraphTask,
+    graphs: list[nx.Graph],
+    generator_algorithms: list[str],
+    encoding_method: str,
+    random_seed: int,
+    num_workers: int = 1,
+    chunk_size: int = 64,
+    cost_model: work_scheduler.CostModel | None = None,
+) -> Iterator[dict[str, str | list[int]]]:
+  """Yields the seeded examples of a task in graph order.
+
+  Args:
+    task: the task to create examples for.
+    graphs: the list of graphs to use for the task.
+    generator_algorithms: the algorithm used to generate each graph.
+    encoding_method: the encoder to use in the task.
+    random_seed: the random seed of the split.
+    num_workers: the number of processes. With one worker the examples are
+      created in this process.
+    chunk_size: the number of graphs handed to a worker at a time.
+    cost_model: if set, the chunks have about the same predicted cost.
+
+  Yields:
+    The examples of prepare_examples_dicts for (task.name, encoding_method).
+  """
+  for examples_dicts in iterate_examples_dicts(
+      [task],
+      graphs,
+      generator_algorithms,
+      [encoding_method],
+      random_seed,
+      num_workers,
+      chunk_size,
+      cost_model,
+  ):
+    yield from examples_dicts[(task.name, encoding_method)].values()
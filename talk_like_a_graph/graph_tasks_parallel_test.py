@@ -0,0 +1,151 @@
+"""Testing for graph_tasks_parallel.py."""
+
+from . import graph_generators
+from . import graph_tasks
+from . import graph_tasks_parallel
+from . import oracle_guards
+from absl.testing import absltest
+
+
+def _questions_and_answers(examples_dicts):
+  return {
+      key: [
+          (value['question'], value['answer'], value['node_ids'])
+          for value in examples_dict.values()
+      ]
+      for key, examples_dict in examples_dicts.items()
+  }
+
+
+class GraphTasksParallelTest(absltest.TestCase):
+
+  def test_output_does_not_depend_on_workers_or_chunks(self):
+    graphs = graph_generators.generate_graphs(12, 'er', False)
+    algorithms = ['er'] * len(graphs)
+    tasks = [graph_tasks.ShortestPath(), graph_tasks.NodeDegree()]
+    text_encoders = ['adjacency', 'random']
+    serial = graph_tasks_parallel.prepare_examples_dicts(
+        tasks, graphs, algorithms, text_encoders, random_seed=3
+    )
+    parallel = graph_tasks_parallel.prepare_examples_dicts(
+        tasks,
+        graphs,
+        algorithms,
+        text_encoders,
+        random_seed=3,
+        num_workers=2,
+        chunk_size=5,
+    )
+    self.assertLen(serial[('shortest_path', 'random')], 12)
+    self.assertEqual(
+        _questions_and_answers(serial), _questions_and_answers(parallel)
+    )
+
+  def test_repeated_calls_do_not_depend_on_workers(self):
+    graphs = graph_generators.generate_graphs(6, 'er', False)
+    algorithms = ['er'] * len(graphs)
+    tasks = [graph_tasks.MaximumFlow(), graph_tasks.ShortestPath()]
+    outputs = [
+        _questions_and_answers(
+            graph_tasks_parallel.prepare_examples_dicts(
+                tasks,
+                graphs,
+                algorithms,
+                ['adjacency'],
+                random_seed=2,
+                num_workers=num_workers,
+                chunk_size=4,
+            )
+        )
+        for num_workers in (1, 2, 1, 2)
+    ]
+    for output in outputs[1:]:
+      self.assertEqual(output, outputs[0])
+    self.assertFalse(any(graph_tasks.has_edge_weights(g) for g in graphs))
+
+  def test_cost_guards_do_not_depend_on_workers(self):
+    graphs = graph_generators.generate_graphs(8, 'er', False)
+    algorithms = ['er'] * len(graphs)
+    results = []
+    for num_workers in (1, 2):
+      task = graph_tasks.ShortestPath()
+      task.cost_guard = oracle_guards.CostGuard(
+          max_memory={'shortest_path': 500}, defer=True
+      )
+      examples_dicts = graph_tasks_parallel.prepare_examples_dicts(
+          [task],
+          graphs,
+          algorithms,
+          ['adjacency'],
+          random_seed=4,
+          num_workers=num_workers,
+          chunk_size=3,
+      )
+      examples = list(
+          graph_tasks_parallel.iterate_examples(
+              task,
+              graphs,
+              algorithms,
+              'incident',
+              random_seed=4,
+              num_workers=num_workers,
+              chunk_size=3,
+          )
+      )
+      self.assertLen(
+          examples_dicts[('shortest_path', 'adjacency')],
+          len(graphs) - len(task.cost_guard.deferred),
+      )
+      self.assertLen(examples, len(graphs) - len(task.cost_guard.deferred))
+      for graph in task.cost_guard.deferred:
+        self.assertTrue(any(graph is g for g in graphs))
+      results.append((task.cost_guard.counts, task.cost_guard.deferred))
+    self.assertNotEmpty(results[0][1])
+    self.assertLess(len(results[0][1]), len(graphs))
+    self.assertEqual(results[1], results[0])
+    self.assertEqual(
+        results[0][0][('shortest_path', 'memory')], 2 * len(results[0][1])
+    )
+
+  def test_iterate_examples_matches_examples_dicts(self):
+    graphs = graph_generators.generate_graphs(9, 'er', False)
+    algorithms = ['er'] * len(graphs)
+    task = graph_tasks.Reachability(queries_per_graph=2)
+    examples_dicts = graph_tasks_parallel.prepare_examples_dicts(
+        [task], graphs, algorithms, ['adjacency'], random_seed=5
+    )
+    examples = graph_tasks_parallel.iterate_examples(
+        task,
+        graphs,
+        algorithms,
+        'adjacency',
+        random_seed=5,
+        num_workers=2,
+        chunk_size=2,
+    )
+    self.assertEqual(
+        _questions_and_answers(examples_dicts)[('reachability', 'adjacency')],
+        _questions_and_answers(
+            {'streamed': dict(enumerate(examples))}
+        )['streamed'],
+    )
+
+  def test_examples_do_not_depend_on_other_graphs(self):
+    graphs = graph_generators.generate_graphs(6, 'ba', False)
+    tasks = [graph_tasks.EdgeExistence()]
+    all_graphs = graph_tasks_parallel.prepare_seeded_examples_dicts(
+        tasks, graphs, ['ba'] * 6, ['adjacency'], random_seed=1
+    )
+    last_graphs = graph_tasks_parallel.prepare_seeded_examples_dicts(
+        tasks, graphs[4:], ['ba'] * 2, ['adjacency'], 1, first_graph_index=4
+    )
+    self.assertEqual(
+        _questions_and_answers(all_graphs)[('edge_existence', 'adjacency')][
+            4:
+        ],
+        _questions_and_answers(last_graphs)[('edge_existence', 'adjacency')],
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
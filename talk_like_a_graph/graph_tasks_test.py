@@ -0,0 +1,103 @@
+"""Testing for graph_tasks.py."""
+
+import random
+
+import networkx as nx
+
+from . import graph_tasks
+from absl.testing import absltest
+
+
+class GraphTasksTest(absltest.TestCase):
+
+  def test_sample_node_pairs_are_distinct(self):
+    random.seed(0)
+    pairs = graph_tasks.sample_node_pairs(nx.path_graph(4), 100)
+    self.assertLen(pairs, 12)
+    self.assertLen(set(pairs), 12)
+    self.assertTrue(all(source != target for source, target in pairs))
+
+  def test_multiple_queries_share_the_graph_encoding(self):
+    random.seed(0)
+    graph = nx.path_graph(6)
+    examples_dict = graph_tasks.ShortestPath(
+        queries_per_graph=4
+    ).prepare_examples_dict([graph], ['path'], 'adjacency')
+    self.assertLen(examples_dict, 4)
+    self.assertLen(
+        set(tuple(value['node_ids']) for value in examples_dict.values()), 4
+    )
+    for value in examples_dict.values():
+      source, target = value['node_ids']
+      self.assertEqual(value['answer'], '%d.' % abs(source - target))
+      self.assertTrue(value['question'].endswith(value['task_description']))
+      self.assertIs(value['graph'], graph)
+
+  def test_no_path_answer(self):
+    random.seed(0)
+    graph = nx.Graph([(0, 1), (2, 3)])
+    examples_dict = graph_tasks.Reachability(
+        queries_per_graph=12
+    ).prepare_examples_dict([graph], ['er'], 'adjacency')
+    for value in examples_dict.values():
+      source, target = value['node_ids']
+      self.assertEqual(
+          value['answer'], 'Yes.' if source // 2 == target // 2 else 'No.'
+      )
+
+  def test_maximum_flow_weights_a_copy(self):
+    graph = nx.path_graph(5)
+    answers = []
+    for _ in range(2):
+      random.seed(0)
+      examples_dict = graph_tasks.MaximumFlow().prepare_examples_dict(
+          [graph], ['path'], 'adjacency'
+      )
+      self.assertTrue(graph_tasks.has_edge_weights(examples_dict[0]['graph']))
+      answers.append(examples_dict[0]['answer'])
+    self.assertFalse(graph_tasks.has_edge_weights(graph))
+    self.assertEqual(answers[0], answers[1])
+
+  def test_ego_subgraph_keeps_the_answers(self):
+    graph = nx.gnp_random_graph(60, 0.04, seed=0, directed=True)
+    for task_class in (
+        graph_tasks.EdgeExistence,
+        graph_tasks.NodeDegree,
+        graph_tasks.Reachability,
+        graph_tasks.ShortestPath,
+    ):
+      answers = []
+      for ego_radius in (None, 1):
+        random.seed(0)
+        examples_dict = task_class(
+            queries_per_graph=20, ego_radius=ego_radius
+        ).prepare_examples_dict([graph], ['er'], 'adjacency')
+        # The no path answers name the nodes, which are relabeled.
+        answers.append([
+            value['answer'].split(' from ')[0]
+            for value in examples_dict.values()
+        ])
+        if ego_radius is not None:
+          self.assertTrue(
+              all(
+                  value['graph'].number_of_nodes() < 60
+                  for value in examples_dict.values()
+              )
+          )
+      self.assertEqual(answers[0], answers[1])
+
+  def test_ego_subgraph_keeps_the_shortest_path(self):
+    random.seed(0)
+    graph = nx.path_graph(30)
+    examples_dict = graph_tasks.ShortestPath(
+        queries_per_graph=10, ego_radius=0
+    ).prepare_examples_dict([graph], ['path'], 'adjacency')
+    for value in examples_dict.values():
+      source, target = value['node_ids']
+      self.assertEqual(value['answer'], '%d.' % abs(source - target))
+      self.assertEqual(
+          value['graph'].number_of_nodes(), abs(source - target) + 1
+      )
+
+if __name__ == '__main__':
+  absltest.main()
@@ -1,5 +1,8 @@
 """The graph tasks to be tried with LLMs."""
 
+from collections.abc import Callable, Iterable, Iterator, Sequence
+import contextlib
+import json
 import os
 import random
 
@@ -11,7 +14,13 @@ import tensorflow_gnn as tfgnn
 
 # Google-internal import(s).
 # Internal import.
+from . import graph_cache
+from . import graph_generators
 from . import graph_tasks
+from . import graph_tasks_parallel
+from . import prompt_prefixes
+from . import token_budget
+from . import work_scheduler
 from tensorflow.core.example import example_pb2
 from tensorflow.core.example import feature_pb2
 
@@ -30,8 +39,64 @@ def laplacian_pos_embedding(graph: nx.Graph, units: int = 4) -> nx.Graph:
   return graph
 
 
-def to_tfgnn(graph: nx.Graph, node_ids: list[int]) -> tfgnn.GraphTensor:
-  """Convert a given nx graph to a tfgnn graph."""
+def to_tfgnn(
+    graph: nx.Graph,
+    node_ids: list[int],
+    graph_tensor: tfgnn.GraphTensor | None = None,
+) -> tfgnn.GraphTensor:
+  """Convert a given nx graph to a tfgnn graph.
+
+  Args:
+    graph: the graph to convert.
+    node_ids: the nodes mentioned in the task description.
+    graph_tensor: optionally, the output of `graph_to_tfgnn` for `graph`.
+      Otherwise the conversion is shared with the other examples on the graph
+      and on identical graphs (see get_graph_tensor).
+
+  Returns:
+    The graph tensor of the graph with a readout for node_ids.
+  """
+  if graph_tensor is None:
+    graph_tensor = get_graph_tensor(graph)
+  return add_readout(graph_tensor, node_ids)
+
+
+def get_graph_tensor(graph: nx.Graph) -> tfgnn.GraphTensor:
+  """Returns graph_to_tfgnn(graph), reusing the tensor of identical graphs.
+
+  The tensor has the edge weights and the node attributes of the graph as
+  features, besides the laplacian positional embeddings, so graphs are identical
+  if they have the same nodes, edges, edge weights and node attributes. The SBM
+  blocks of the nodes are left out, as they are the answers of the node
+  classification task.
+
+  Args:
+    graph: the graph to convert.
+
+  Returns:
+    The graph tensor of the graph without any readout.
+  """
+  return graph_cache.memoize(
+      graph,
+      'graph_tensor',
+      lambda: graph_to_tfgnn(graph_generators.without_block_labels(graph)),
+      with_edge_data=True,
+      nbytes=_graph_tensor_nbytes(graph),
+      with_node_data=True,
+  )
+
+
+def _graph_tensor_nbytes(graph: nx.Graph) -> int:
+  # The int32 sources, targets and weights of the edges, in both directions in
+  # undirected graphs, and the float32 positional embeddings of the nodes.
+  nedges = graph.number_of_edges()
+  if not graph.is_directed():
+    nedges *= 2
+  return 12 * nedges + 16 * graph.number_of_nodes()
+
+
+def graph_to_tfgnn(graph: nx.Graph) -> tfgnn.GraphTensor:
+  """Convert a given nx graph to a tfgnn graph without any readout."""
   if graph.edges(data=True):
     s, t, w = zip(*[
         (s, t, (d['weight'] if d and 'weight' in d else None))
@@ -44,7 +109,9 @@ def to_tfgnn(graph: nx.Graph, node_ids: list[int]) -> tfgnn.GraphTensor:
   if not graph.is_directed():
     s, t, w = s + t, t + s, w + w
 
-  graph = laplacian_pos_embedding(graph, units=4)
+  # The embeddings are added to a copy, so that the node attributes of the
+  # graph, which are part of the memo keys of its tensor, do not change.
+  graph = laplacian_pos_embedding(graph.copy(), units=4)
   features = set(k for n in graph.nodes for k in graph.nodes[n].keys())  # pylint: disable=g-complex-comprehension
   node_features = {
       f: tf.convert_to_tensor([graph.nodes[n][f] for n in graph.nodes])
@@ -65,7 +132,13 @@ def to_tfgnn(graph: nx.Graph, node_ids: list[int]) -> tfgnn.GraphTensor:
         tf.convert_to_tensor(t, dtype=tf.int32),
         node_features=node_features,
     )
+  return gt
 
+
+def add_readout(
+    gt: tfgnn.GraphTensor, node_ids: list[int]
+) -> tfgnn.GraphTensor:
+  """Adds a readout for the nodes mentioned in the task description."""
   if not node_ids:
     # No node is mentioned in the task description.
     return gt
@@ -124,8 +197,19 @@ def create_example_feature(
     task_description: str,
     graph: nx.Graph,
     node_ids: list[int],
+    graph_tensor: tfgnn.GraphTensor | None = None,
+    question_ids: Sequence[int] | None = None,
+    answer_ids: Sequence[int] | None = None,
+    prefix_lengths: Sequence[int] | None = None,
 ) -> example_pb2.Example:
-  """Create a tensorflow example from a datapoint."""
+  """Create a tensorflow example from a datapoint.
+
+  If question_ids and answer_ids are set, the token ids of the question and the
+  answer are also stored as int64 features, together with their lengths, so
+  that the consumers of the examples do not tokenize them again. The end
+  offsets of the shared prefixes of the question (see prompt_prefixes) are
+  stored as well if set.
+  """
   key_feature = feature_pb2.Feature(
       bytes_list=tf.train.BytesList(value=[str(key).encode()])
   )
@@ -150,29 +234,49 @@ def create_example_feature(
   task_description_feature = feature_pb2.Feature(
       bytes_list=tf.train.BytesList(value=[task_description.encode()])
   )
-  gt = to_tfgnn(graph, node_ids)
+  # The serialized graph only depends on the graph, with its edge and node
+  # attributes, and the readout nodes, so it is shared by all the examples
+  # asking about them.
+  serialized_graph = graph_cache.memoize(
+      graph,
+      ('serialized_graph', tuple(node_ids)),
+      lambda: tfgnn.write_example(
+          to_tfgnn(graph, node_ids, graph_tensor)
+      ).SerializeToString(),
+      with_edge_data=True,
+      with_node_data=True,
+  )
   graph_feature = feature_pb2.Feature(
-      bytes_list=tf.train.BytesList(
-          value=[tfgnn.write_example(gt).SerializeToString()]
-      )
+      bytes_list=tf.train.BytesList(value=[serialized_graph])
   )
   directed_feature = feature_pb2.Feature(
       bytes_list=tf.train.BytesList(value=[str(graph.is_directed()).encode()])
   )
-  example_feats = tf.train.Features(
-      feature={
-          'id': key_feature,
-          'question': question_feature,
-          'answer': answer_feature,
-          'algorithm': algorithm_feature,
-          'text_encoding': encoding_method_feature,
-          'nnodes': nnodes_feature,
-          'nedges': nedges_feature,
-          'task_description': task_description_feature,
-          'graph': graph_feature,
-          'directed': directed_feature,
-      }
-  )
+  feature = {
+      'id': key_feature,
+      'question': question_feature,
+      'answer': answer_feature,
+      'algorithm': algorithm_feature,
+      'text_encoding': encoding_method_feature,
+      'nnodes': nnodes_feature,
+      'nedges': nedges_feature,
+      'task_description': task_description_feature,
+      'graph': graph_feature,
+      'directed': directed_feature,
+  }
+  if question_ids is not None and answer_ids is not None:
+    for name, ids in (('question', question_ids), ('answer', answer_ids)):
+      feature[name + '_ids'] = feature_pb2.Feature(
+          int64_list=tf.train.Int64List(value=ids)
+      )
+      feature[name + '_length'] = feature_pb2.Feature(
+          int64_list=tf.train.Int64List(value=[len(ids)])
+      )
+  if prefix_lengths is not None:
+    feature['prefix_lengths'] = feature_pb2.Feature(
+        int64_list=tf.train.Int64List(value=prefix_lengths)
+    )
+  example_feats = tf.train.Features(feature=feature)
   return example_pb2.Example(features=example_feats)
 
 
@@ -183,7 +287,22 @@ def load_graphs(
     direction: str,
     max_nnodes: int = 20,
 ) -> list[nx.Graph]:
-  """Load a list of graphs from a given algorithm and split."""
+  """Load a list of graphs from a given algorithm and split.
+
+  For the algorithms of graph_generators.BLOCK_LABELED_ALGORITHMS, the SBM
+  blocks written next to a graph by graph_generators_runner are set as the
+  'block' attribute of its nodes.
+
+  Args:
+    base_path: the directory of all graphs.
+    algorithm: the algorithm that generated the graphs.
+    split: the dataset split.
+    direction: 'directed' or 'undirected'.
+    max_nnodes: the graphs with more nodes are skipped.
+
+  Returns:
+    The loaded graphs.
+  """
   graphs_path = os.path.join(
       base_path,
       direction,
@@ -192,11 +311,23 @@ def load_graphs(
   )
   loaded_graphs = []
   all_files = gfile.ListDir(graphs_path)
+  file_set = set(all_files)
   for file in all_files:
     if file.endswith('.graphml'):
       path = os.path.join(graphs_path, file)
       graph = nx.read_graphml(os.Open(path, 'rb'), node_type=int)
       if graph.number_of_nodes() <= max_nnodes:
+        block_labels_file = (
+            file[: -len('.graphml')] + graph_generators.BLOCK_LABELS_SUFFIX
+        )
+        if (
+            algorithm in graph_generators.BLOCK_LABELED_ALGORITHMS
+            and block_labels_file in file_set
+        ):
+          block_labels_path = os.path.join(graphs_path, block_labels_file)
+          graph_generators.set_block_labels(
+              graph, np.load(os.Open(block_labels_path, 'rb'))
+          )
         loaded_graphs.append(graph)
   return loaded_graphs
 
@@ -206,42 +337,39 @@ def prepare_examples(
     encoding_method: str,
 ) -> list[example_pb2.Example]:
   """Create a list of tf.train.Example from a dict of examples."""
-  examples = []
-  for key, value in examples_dict.items():
-    (
-        question,
-        answer,
-        nnodes,
-        nedges,
-        task_description,
-        graph,
-        algorithm,
-        node_ids,
-    ) = (
-        value['question'],
-        value['answer'],
-        value['nnodes'],
-        value['nedges'],
-        value['task_description'],
-        value['graph'],
-        value['algorithm'],
-        value['node_ids'],
-    )
-    examples.append(
-        create_example_feature(
-            key,
-            question,
-            answer,
-            algorithm,
-            encoding_method,
-            nnodes,
-            nedges,
-            task_description,
-            graph,
-            node_ids,
-        )
-    )
-  return examples
+  return list(iterate_tf_examples(examples_dict.items(), encoding_method))
+
+
+def iterate_tf_examples(
+    keyed_examples: Iterable[tuple[int, dict[str, str | list[int]]]],
+    encoding_method: str,
+) -> Iterator[example_pb2.Example]:
+  """Yields a tf.train.Example for each (key, example) pair."""
+  for key, value in keyed_examples:
+    yield _create_tf_example(key, value, encoding_method)
+
+
+def _create_tf_example(
+    key: int,
+    value: dict[str, str | list[int]],
+    encoding_method: str,
+) -> example_pb2.Example:
+  return create_example_feature(
+      key,
+      value['question'],
+      value['answer'],
+      value['algorithm'],
+      # Examples fitted into a token budget can use another graph encoder.
+      value.get('encoding_method', encoding_method),
+      value['nnodes'],
+      value['nedges'],
+      value['task_description'],
+      value['graph'],
+      value['node_ids'],
+      question_ids=value.get('question_ids'),
+      answer_ids=value.get('answer_ids'),
+      prefix_lengths=value.get('prefix_lengths'),
+  )
 
 
 def create_zero_shot_task(
@@ -250,26 +378,297 @@ def create_zero_shot_task(
     generator_algorithms: list[str],
     text_encoders: list[str],
     cot: bool = False,
+    random_seed: int | None = None,
+    num_workers: int | None = None,
 ) -> list[example_pb2.Example]:
-  """Create a recordio file with zero-shot examples for the task."""
-  examples = []
+  """Create a recordio file with zero-shot examples for the task.
+
+  Args:
+    task: the task to create examples for.
+    graphs: the list of graphs to use for the task.
+    generator_algorithms: the algorithm used to generate each graph.
+    text_encoders: the encoders to use in the task.
+    cot: whether to apply cot or not.
+    random_seed: the random seed of the split. Only used with num_workers.
+    num_workers: if set, the examples are created in the seeded mode of
+      graph_tasks_parallel with this many processes.
+
+  Returns:
+    The list of examples.
+  """
+  return list(
+      iterate_zero_shot_task(
+          task,
+          graphs,
+          generator_algorithms,
+          text_encoders,
+          cot=cot,
+          random_seed=random_seed,
+          num_workers=num_workers,
+      )
+  )
+
+
+def iterate_zero_shot_task(
+    task: graph_tasks.GraphTask,
+    graphs: list[nx.Graph],
+    generator_algorithms: list[str],
+    text_encoders: list[str],
+    cot: bool = False,
+    random_seed: int | None = None,
+    num_workers: int | None = None,
+    chunk_size: int = 64,
+) -> Iterator[example_pb2.Example]:
+  """Yields the examples of create_zero_shot_task one at a time.
+
+  Examples are created lazily while they are consumed, e.g. by write_examples,
+  so only a few of them are held in memory at any time.
+
+  Args:
+    task: the task to create examples for.
+    graphs: the list of graphs to use for the task.
+    generator_algorithms: the algorithm used to generate each graph.
+    text_encoders: the encoders to use in the task.
+    cot: whether to apply cot or not.
+    random_seed: the random seed of the split. Only used with num_workers.
+    num_workers: if set, the examples are created in the seeded mode of
+      graph_tasks_parallel with this many processes.
+    chunk_size: the number of graphs handed to a worker at a time in the
+      seeded mode.
+
+  Yields:
+    The same examples as create_zero_shot_task, in the same order.
+  """
   for encoding_method in text_encoders:
-    examples_dict = task.prepare_examples_dict(
-        graphs, generator_algorithms, encoding_method
-    )
+    if num_workers:
+      examples = graph_tasks_parallel.iterate_examples(
+          task,
+          graphs,
+          generator_algorithms,
+          encoding_method,
+          random_seed,
+          num_workers,
+          chunk_size,
+      )
+    else:
+      examples = task.iterate_examples(
+          graphs, generator_algorithms, encoding_method
+      )
     if cot:
-      for key in examples_dict.keys():
-        examples_dict[key]['question'] += "Let's think step by step. "
-    examples += prepare_examples(examples_dict, encoding_method)
+      examples = _append_to_questions(examples, "Let's think step by step. ")
+    yield from iterate_tf_examples(enumerate(examples), encoding_method)
+
+
+def _append_to_questions(
+    examples: Iterable[dict[str, str | list[int]]], text: str
+) -> Iterator[dict[str, str | list[int]]]:
+  for value in examples:
+    value['question'] += text
+    yield value
+
+
+def create_zero_shot_tasks(
+    tasks: list[graph_tasks.GraphTask],
+    graphs: list[nx.Graph],
+    generator_algorithms: list[str],
+    text_encoders: list[str],
+    random_seed: int,
+    num_workers: int | None = None,
+    cost_model: work_scheduler.CostModel | None = None,
+) -> dict[str, tuple[list[example_pb2.Example], list[example_pb2.Example]]]:
+  """Create the zero-shot and zero-cot examples of several tasks in one pass.
+
+  The graphs are visited once per text encoder. Each graph is encoded once per
+  text encoder and all tasks share that encoding and its graph index (see
+  graph_cache). Every (task, text encoder) pair draws from its own random
+  stream seeded with random_seed, so the examples of a task do not depend on
+  which other tasks are run along with it. The zero-cot examples only differ
+  from the zero-shot ones by the cot suffix, so both are built from the same
+  questions.
+
+  Args:
+    tasks: the tasks to create examples for.
+    graphs: the list of graphs to use for the tasks.
+    generator_algorithms: the algorithm used to generate each graph.
+    text_encoders: the encoders to use in the tasks.
+    random_seed: the random seed to use in the process.
+    num_workers: if set, the examples are created in the seeded mode of
+      graph_tasks_parallel with this many processes, each of them visiting a
+      chunk of the graphs once.
+    cost_model: if set with num_workers, the chunks have about the same
+      predicted cost (see work_scheduler).
+
+  Returns:
+    A dict from task name to its zero-shot and zero-cot examples.
+  """
+  examples = {task.name: ([], []) for task in tasks}
+  for task_name, zero_shot_example, zero_cot_example in iterate_zero_shot_tasks(
+      tasks,
+      graphs,
+      generator_algorithms,
+      text_encoders,
+      random_seed,
+      num_workers=num_workers,
+      cost_model=cost_model,
+  ):
+    examples[task_name][0].append(zero_shot_example)
+    examples[task_name][1].append(zero_cot_example)
   return examples
 
 
-def write_examples(examples: list[example_pb2.Example], output_path: str):
+def iterate_zero_shot_tasks(
+    tasks: list[graph_tasks.GraphTask],
+    graphs: list[nx.Graph],
+    generator_algorithms: list[str],
+    text_encoders: list[str],
+    random_seed: int,
+    num_workers: int | None = None,
+    chunk_size: int = 64,
+    cost_model: work_scheduler.CostModel | None = None,
+) -> Iterator[tuple[str, example_pb2.Example, example_pb2.Example]]:
+  """Yields the examples of create_zero_shot_tasks while they are created.
+
+  Only the examples of one graph (or of one chunk of graphs with num_workers)
+  are held in memory at any time.
+
+  Args:
+    tasks: the tasks to create examples for.
+    graphs: the list of graphs to use for the tasks.
+    generator_algorithms: the algorithm used to generate each graph.
+    text_encoders: the encoders to use in the tasks.
+    random_seed: the random seed to use in the process.
+    num_workers: if set, the examples are created in the seeded mode of
+      graph_tasks_parallel with this many processes.
+    chunk_size: the number of graphs handed to a worker at a time in the
+      seeded mode.
+    cost_model: if set with num_workers, the chunks have about the same
+      predicted cost (see work_scheduler).
+
+  Yields:
+    (task name, zero-shot example, zero-cot example) tuples. The examples of
+    each task come in the order of the lists of create_zero_shot_tasks.
+  """
+  for encoding_method in text_encoders:
+    keys = {task.name: 0 for task in tasks}
+    for task_examples in _iterate_task_examples(
+        tasks,
+        graphs,
+        generator_algorithms,
+        encoding_method,
+        random_seed,
+        num_workers,
+        chunk_size,
+        cost_model,
+    ):
+      for task_name, value in task_examples:
+        key = keys[task_name]
+        keys[task_name] += 1
+        zero_shot_example = _create_tf_example(key, value, encoding_method)
+        value['question'] += "Let's think step by step. "
+        zero_cot_example = _create_tf_example(key, value, encoding_method)
+        yield task_name, zero_shot_example, zero_cot_example
+
+
+def _iterate_task_examples(
+    tasks: list[graph_tasks.GraphTask],
+    graphs: list[nx.Graph],
+    generator_algorithms: list[str],
+    encoding_method: str,
+    random_seed: int,
+    num_workers: int | None,
+    chunk_size: int,
+    cost_model: work_scheduler.CostModel | None,
+) -> Iterator[list[tuple[str, dict[str, str | list[int]]]]]:
+  """Yields the (task name, example) pairs of each graph or chunk of graphs."""
+  if num_workers:
+    for examples_dicts in graph_tasks_parallel.iterate_examples_dicts(
+        tasks,
+        graphs,
+        generator_algorithms,
+        [encoding_method],
+        random_seed,
+        num_workers,
+        chunk_size,
+        cost_model,
+    ):
+      yield [
+          (task.name, value)
+          for task in tasks
+          for value in examples_dicts[(task.name, encoding_method)].values()
+      ]
+    return
+  random_states = {}
+  for ind, graph in enumerate(graphs):
+    task_examples = []
+    for task in tasks:
+      if task.name in random_states:
+        random.setstate(random_states[task.name])
+      else:
+        random.seed(random_seed)
+      task_examples += [
+          (task.name, value)
+          for value in task.iterate_examples(
+              [graph], generator_algorithms[ind : ind + 1], encoding_method
+          )
+      ]
+      random_states[task.name] = random.getstate()
+    yield task_examples
+
+
+def write_examples(
+    examples: Iterable[example_pb2.Example], output_path: str
+) -> None:
   with recordio.RecordWriter(output_path) as output_file:
     for example in examples:
       output_file.WriteRecord(example.SerializeToString())
 
 
+def write_prefix_manifest(
+    examples: Sequence[example_pb2.Example], output_path: str
+) -> None:
+  """Writes the spans of the examples sharing prompt prefixes as JSON.
+
+  Args:
+    examples: the examples, in the order they are written, with their
+      prefix_lengths features.
+    output_path: the path of the manifest.
+  """
+  prompts = [
+      (
+          example.features.feature['question'].bytes_list.value[0].decode(),
+          list(example.features.feature['prefix_lengths'].int64_list.value),
+      )
+      for example in examples
+  ]
+  with os.Open(output_path, 'w') as f:
+    json.dump(prompt_prefixes.prefix_manifest(prompts), f)
+
+
+def write_zero_shot_tasks(
+    examples: Iterable[tuple[str, example_pb2.Example, example_pb2.Example]],
+    output_paths: dict[str, tuple[str, str]],
+) -> None:
+  """Writes the examples of iterate_zero_shot_tasks while they are created.
+
+  Args:
+    examples: (task name, zero-shot example, zero-cot example) tuples.
+    output_paths: a dict from task name to the paths of its zero-shot and
+      zero-cot files.
+  """
+  with contextlib.ExitStack() as stack:
+    output_files = {
+        task_name: tuple(
+            stack.enter_context(recordio.RecordWriter(output_path))
+            for output_path in task_output_paths
+        )
+        for task_name, task_output_paths in output_paths.items()
+    }
+    for task_name, zero_shot_example, zero_cot_example in examples:
+      zero_shot_file, zero_cot_file = output_files[task_name]
+      zero_shot_file.WriteRecord(zero_shot_example.SerializeToString())
+      zero_cot_file.WriteRecord(zero_cot_example.SerializeToString())
+
+
 def prepare_few_shots(
     task: graph_tasks.GraphTask,
     graphs: list[nx.Graph],
@@ -301,6 +700,60 @@ def choose_few_shot_examples(
   return few_shots_str
 
 
+def _build_a_graph_first(question: str) -> str:
+  return question.replace(
+      '\nQ: ',
+      "\nLet's construct the graph with the nodes and edges first.\nQ: ",
+  )
+
+
+def _fit_few_shot_example(
+    budget: token_budget.TokenBudget,
+    task_name: str,
+    example: dict[str, str | list[int]],
+    encoding_method: str,
+    few_shots_examples: str,
+    choose_few_shots: Callable[[str], str],
+    bag: bool,
+) -> tuple[dict[str, str | list[int]], str, int] | None:
+  """Fits a few-shot example into a token budget.
+
+  Args:
+    budget: the token budget.
+    task_name: the name of the task that created the example.
+    example: the example, without its few-shot examples.
+    encoding_method: the graph encoder of the example.
+    few_shots_examples: the few-shot examples chosen for the example.
+    choose_few_shots: chooses the few-shot examples of a graph encoder.
+    bag: whether to apply build-a-graph method or not.
+
+  Returns:
+    The example with its few-shot examples, the prefix of its question and its
+    number of tokens, or None if it does not fit.
+  """
+
+  def add_bag(text: str) -> str:
+    # The encodings have no questions, so build-a-graph only changes the
+    # few-shot examples and the task description.
+    return _build_a_graph_first(text) if bag else text
+
+  example = dict(example, question=add_bag(example['question']))
+  fitted = budget.fit(
+      task_name,
+      example,
+      encoding_method,
+      add_bag(few_shots_examples + 'Example: '),
+      lambda graph_encoder: add_bag(
+          choose_few_shots(graph_encoder) + 'Example: '
+      ),
+  )
+  if fitted is None:
+    return None
+  example, prefix, ntokens = fitted
+  example['question'] = prefix + example['question']
+  return example, prefix, ntokens
+
+
 def create_few_shot_task(
     task: graph_tasks.GraphTask,
     graphs: list[nx.Graph],
@@ -310,8 +763,37 @@ def create_few_shot_task(
     cot: bool,
     bag: bool,
     random_seed: int,
+    num_workers: int | None = None,
+    max_tokens: int | None = None,
+    pretokenize: bool = False,
+    prompt_layout: str = 'default',
 ) -> list[example_pb2.Example]:
-  """Create a recordio file with few-shot examples for the task."""
+  """Create a recordio file with few-shot examples for the task.
+
+  Args:
+    task: the task to create examples for.
+    graphs: the list of graphs to use for the task.
+    generator_algorithms: the algorithm used to generate each graph.
+    few_shots_graphs: the list of graphs to create few-shot examples from.
+    text_encoders: the encoders to use in the task.
+    cot: whether to apply cot or not.
+    bag: whether to apply build-a-graph method or not.
+    random_seed: the random seed to use in the process.
+    num_workers: if set, the questions are created in the seeded mode of
+      graph_tasks_parallel with this many processes.
+    max_tokens: if set, the examples over this number of tokens get a compact
+      graph encoding, possibly of a subgraph keeping the answer, or are dropped
+      (see token_budget).
+    pretokenize: whether to also store the token ids of the questions and the
+      answers, and their lengths, as int64 features.
+    prompt_layout: one of prompt_prefixes.PROMPT_LAYOUTS. With
+      'shared_prefix', the few-shot examples are chosen once per text encoder,
+      and the examples store the end offsets of their shared prefixes and are
+      grouped by them (see prompt_prefixes).
+
+  Returns:
+    The list of examples.
+  """
   # LINT.IfChange
   vocab_path = None
   # LINT.ThenChange(//research/graph/llm/graphqa/copy.bara.sky)
@@ -326,31 +808,121 @@ def create_few_shot_task(
       text_encoders,
       cot,
   )
+  if prompt_layout not in prompt_prefixes.PROMPT_LAYOUTS:
+    raise ValueError(f'Unknown prompt layout: {prompt_layout}')
+  # The few-shot examples of each text encoder, in the shared prefix layout.
+  shared_few_shots = {}
+
+  def choose_few_shots(graph_encoder: str) -> str:
+    if prompt_layout != 'shared_prefix':
+      return choose_few_shot_examples(few_shots_examples_dict, graph_encoder)
+    if graph_encoder not in shared_few_shots:
+      shared_few_shots[graph_encoder] = choose_few_shot_examples(
+          few_shots_examples_dict, graph_encoder
+      )
+    return shared_few_shots[graph_encoder]
+
+  # The token ids of each answer, which repeat across examples.
+  answer_ids = {}
+  budget = None
+  if max_tokens:
+    budget = token_budget.TokenBudget(max_tokens, sp_vocab.encode)
+    # Few-shot examples for the examples switching to a compact encoder.
+    few_shots_examples_dict.update(
+        prepare_few_shots(
+            task,
+            few_shots_graphs,
+            [
+                graph_encoder
+                for graph_encoder in budget.compact_encoders
+                if graph_encoder not in few_shots_examples_dict
+            ],
+            cot,
+        )
+    )
+  if num_workers:
+    examples_dicts = graph_tasks_parallel.prepare_examples_dicts(
+        [task],
+        graphs,
+        generator_algorithms,
+        text_encoders,
+        random_seed,
+        num_workers,
+    )
   for encoding_method in text_encoders:
     random.seed(random_seed)
-    examples_dict = task.prepare_examples_dict(
-        graphs, generator_algorithms, encoding_method
-    )
-    for key in examples_dict.keys():
-      few_shots_examples = choose_few_shot_examples(
-          few_shots_examples_dict,
-          encoding_method,
-      )
-      examples_dict[key]['question'] = (
-          few_shots_examples + 'Example: ' + examples_dict[key]['question']
+    if num_workers:
+      examples_dict = examples_dicts[(task.name, encoding_method)]
+    else:
+      examples_dict = task.prepare_examples_dict(
+          graphs, generator_algorithms, encoding_method
       )
-      if bag:
-        examples_dict[key]['question'] = examples_dict[key]['question'].replace(
-            '\nQ: ',
-            "\nLet's construct the graph with the nodes and edges first.\nQ: ",
-        )  # pytype: disable=attribute-error
+    for key in list(examples_dict.keys()):
+      few_shots_examples = choose_few_shots(encoding_method)
+      if budget is not None:
+        fitted = _fit_few_shot_example(
+            budget,
+            task.name,
+            examples_dict[key],
+            encoding_method,
+            few_shots_examples,
+            choose_few_shots,
+            bag,
+        )
+        if fitted is None:
+          del examples_dict[key]
+          continue
+        examples_dict[key], prefix, ntokens = fitted
+      else:
+        prefix = few_shots_examples + 'Example: '
+        examples_dict[key]['question'] = (
+            prefix + examples_dict[key]['question']
+        )
+        if bag:
+          prefix = _build_a_graph_first(prefix)
+          examples_dict[key]['question'] = _build_a_graph_first(
+              examples_dict[key]['question']
+          )
+        question_ids = sp_vocab.encode(examples_dict[key]['question'])
+        ntokens = len(question_ids)
+      if prompt_layout == 'shared_prefix':
+        graph_encoder = examples_dict[key].get(
+            'encoding_method', encoding_method
+        )
+        prefixes = [prefix]
+        # The encodings with random names are never shared by two prompts,
+        # and encoding their graphs again would draw other names.
+        if graph_cache.is_reusable(graph_encoder):
+          # The memoized encoding the example was created with.
+          prefixes.append(
+              graph_cache.encode_graph(
+                  examples_dict[key]['graph'], graph_encoder
+              )
+          )
+        examples_dict[key]['prefix_lengths'] = prompt_prefixes.prefix_lengths(
+            examples_dict[key]['question'], prefixes
+        )
+      if pretokenize:
+        if budget is not None:
+          # The budget only counted the tokens of the parts of the question.
+          question_ids = sp_vocab.encode(examples_dict[key]['question'])
+        answer = examples_dict[key]['answer']
+        if answer not in answer_ids:
+          answer_ids[answer] = sp_vocab.encode(answer)
+        examples_dict[key]['question_ids'] = question_ids
+        examples_dict[key]['answer_ids'] = answer_ids[answer]
       if encoding_method not in number_of_tokens:
         number_of_tokens[encoding_method] = []
-      number_of_tokens[encoding_method].append(
-          len(sp_vocab.encode(examples_dict[key]['question']))
+      number_of_tokens[encoding_method].append(ntokens)
+    if prompt_layout == 'shared_prefix':
+      examples_dict = dict(
+          prompt_prefixes.group_by_prefix(examples_dict.items())
       )
     examples += prepare_examples(examples_dict, encoding_method)
 
+  if budget is not None:
+    print('token budget', max_tokens, dict(budget.counts))
+
   # Printing maximum number of tokens in the sequence.
   for key, value in number_of_tokens.items():
     print(key, np.max(value))
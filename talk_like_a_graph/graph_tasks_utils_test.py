@@ -0,0 +1,32 @@
+"""Testing for graph_tasks_utils.py."""
+
+import random
+
+from . import graph_generators
+from . import graph_tasks
+from . import graph_tasks_utils
+from absl.testing import absltest
+from tensorflow.core.example import example_pb2
+
+
+class GraphTasksUtilsTest(absltest.TestCase):
+
+  def test_node_classification_graph_has_no_block_feature(self):
+    random.seed(0)
+    graph = graph_generators.generate_graphs(1, 'two_block_sbm', False)[0]
+    examples_dict = graph_tasks.NodeClassification().prepare_examples_dict(
+        [graph], ['two_block_sbm'], 'adjacency'
+    )
+    (example,) = graph_tasks_utils.prepare_examples(examples_dict, 'adjacency')
+    serialized_graph = example_pb2.Example.FromString(
+        example.features.feature['graph'].bytes_list.value[0]
+    )
+    feature_names = list(serialized_graph.features.feature)
+    self.assertNotEmpty(feature_names)
+    self.assertFalse(any('block' in name for name in feature_names))
+    # The labels of the graph itself are kept.
+    self.assertIsNotNone(graph_generators.get_block_labels(graph))
+
+
+if __name__ == '__main__':
+  absltest.main()
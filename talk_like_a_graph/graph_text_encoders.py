@@ -1,17 +1,337 @@
 """Library for encoding graphs in text."""
 
+from collections.abc import Callable, Iterable, Iterator, Sequence
+import itertools
+from typing import TextIO
+
 import networkx as nx
+import numpy as np
 
 from . import name_dictionaries
 
 
 def create_node_string(name_dict, nnodes: int) -> str:
-  node_string = ""
-  sorted_keys = list(sorted(name_dict.keys()))
-  for i in sorted_keys[: nnodes - 1]:
-    node_string += name_dict[i] + ", "
-  node_string += "and " + name_dict[sorted_keys[nnodes - 1]]
-  return node_string
+  if isinstance(name_dict, name_dictionaries.NameTable):
+    # The node ids of a name table are already sorted, and its node lists are
+    # shared by all the graphs of the same size.
+    key = ("node_string", nnodes)
+    if key in name_dict.memo:
+      return name_dict.memo[key]
+    if nnodes > len(name_dict.names):
+      # Only the node lists within the listed names are memoized.
+      return _join_node_names(name_dict.first(nnodes), nnodes)
+    name_dict.memo[key] = _join_node_names(name_dict.names, nnodes)
+    return name_dict.memo[key]
+  sorted_keys = sorted(name_dict.keys())
+  return "".join(
+      [name_dict[i] + ", " for i in sorted_keys[: nnodes - 1]]
+      + ["and ", name_dict[sorted_keys[nnodes - 1]]]
+  )
+
+
+def _join_node_names(names, nnodes: int) -> str:
+  return "".join(
+      [name + ", " for name in names[: nnodes - 1]]
+      + ["and ", names[nnodes - 1]]
+  )
+
+
+class EdgeListEncoder:
+  """An encoder describing the nodes of a graph, then each edge on its own.
+
+  The edge list encoders only differ in their templates. They are compiled
+  into an EdgeListEncoder once, which renders a graph by formatting each edge
+  a single time and joining the parts, rather than growing the output string
+  edge by edge.
+
+  Attributes:
+    header: the template of the node list line.
+    edges_header: the text before the edges, if the graph has any.
+    edge_template: the template of an edge, given the names of its nodes.
+    preambles: if set, the text before the header for (undirected, directed)
+      graphs.
+    strip_nodes: whether to strip the node list.
+    final_period: whether the output is stripped and ends with ".\n".
+    directed_error: if set, the ValueError message for directed graphs.
+  """
+
+  def __init__(
+      self,
+      header: str,
+      edges_header: str,
+      edge_template: str,
+      preambles: tuple[str, str] | None = None,
+      strip_nodes: bool = False,
+      final_period: bool = False,
+      directed_error: str | None = None,
+  ):
+    self.header = header
+    self.edges_header = edges_header
+    self.edge_template = edge_template
+    self.preambles = preambles
+    self.strip_nodes = strip_nodes
+    self.final_period = final_period
+    self.directed_error = directed_error
+
+  def __call__(self, graph: nx.Graph, name_dict: dict[int, str]) -> str:
+    return self.render(
+        graph,
+        create_node_string(name_dict, len(graph.nodes())),
+        [(name_dict[i], name_dict[j]) for i, j in graph.edges()],
+    )
+
+  def render(
+      self,
+      graph: nx.Graph,
+      nodes_string: str,
+      name_pairs: list[tuple[str, str]],
+  ) -> str:
+    """Encodes a graph given its node list and the names of its edges.
+
+    Args:
+      graph: the graph to be encoded.
+      nodes_string: the output of create_node_string for the graph.
+      name_pairs: the names of the two nodes of each edge, in edge order.
+
+    Returns:
+      The encoded graph as a string.
+    """
+    self._check_direction(graph)
+    edge_template = self.edge_template
+    return self._assemble(
+        graph,
+        nodes_string,
+        "".join([edge_template % name_pair for name_pair in name_pairs]),
+    )
+
+  def render_arrays(
+      self,
+      graph: nx.Graph,
+      nodes_string: str,
+      sources: np.ndarray,
+      targets: np.ndarray,
+      names: list[str],
+  ) -> str:
+    """Encodes a graph given its edges as arrays of node positions.
+
+    This is the same as `render`, with the edges rendered by render_edge_text.
+
+    Args:
+      graph: the graph to be encoded.
+      nodes_string: the output of create_node_string for the graph.
+      sources: the position of the first node of each edge, in edge order.
+      targets: the position of the second node of each edge, in edge order.
+      names: the name of every node, indexed by position.
+
+    Returns:
+      The encoded graph as a string.
+    """
+    self._check_direction(graph)
+    return self._assemble(
+        graph,
+        nodes_string,
+        render_edge_text(self.edge_template, sources, targets, names),
+    )
+
+  def _check_direction(self, graph: nx.Graph) -> None:
+    if self.directed_error and graph.is_directed():
+      raise ValueError(self.directed_error)
+
+  def _assemble(
+      self, graph: nx.Graph, nodes_string: str, edges_text: str
+  ) -> str:
+    parts = []
+    if self.preambles:
+      parts.append(self.preambles[graph.is_directed()])
+    if self.strip_nodes:
+      nodes_string = nodes_string.strip()
+    parts.append(self.header % nodes_string)
+    # Every edge renders to some text, so there are edges iff there is text.
+    if edges_text:
+      parts.append(self.edges_header)
+      parts.append(edges_text)
+    output = "".join(parts)
+    if self.final_period:
+      return output.strip() + ".\n"
+    return output
+
+  def iter_render(
+      self,
+      graph: nx.Graph,
+      name_dict: dict[int, str],
+      edges_per_chunk: int = 4096,
+  ) -> Iterator[str]:
+    """Returns the chunks of `self(graph, name_dict)`, rendered lazily.
+
+    Args:
+      graph: the graph to be encoded.
+      name_dict: a dictionary from node ids to names.
+      edges_per_chunk: the number of edges per chunk.
+
+    Returns:
+      An iterator over chunks of about edges_per_chunk edges.
+    """
+    self._check_direction(graph)
+    chunks = _join_batches(self._iter_parts(graph, name_dict), edges_per_chunk)
+    if self.final_period:
+      return _strip_chunks(chunks)
+    return chunks
+
+  def _iter_parts(
+      self, graph: nx.Graph, name_dict: dict[int, str]
+  ) -> Iterator[str]:
+    if self.preambles:
+      yield self.preambles[graph.is_directed()]
+    nodes_string = create_node_string(name_dict, len(graph.nodes()))
+    if self.strip_nodes:
+      nodes_string = nodes_string.strip()
+    yield self.header % nodes_string
+    if graph.edges():
+      yield self.edges_header
+      edge_template = self.edge_template
+      for i, j in graph.edges():
+        yield edge_template % (name_dict[i], name_dict[j])
+
+
+def render_edge_text(
+    edge_template: str,
+    sources: np.ndarray,
+    targets: np.ndarray,
+    names: list[str],
+) -> str:
+  """Renders `edge_template` for every edge with array operations.
+
+  The result is `"".join(edge_template % (names[i], names[j]) ...)` over the
+  (sources, targets) pairs. Instead of formatting each edge in Python, the
+  UTF-8 bytes of the names are gathered into one output buffer by position,
+  together with the fixed separators of the template, so the cost per edge is
+  a few array operations.
+
+  Args:
+    edge_template: a template with two "%s" and no other directive.
+    sources: the position of the first node of each edge.
+    targets: the position of the second node of each edge.
+    names: the name of every node, indexed by position.
+
+  Returns:
+    The concatenated text of the edges.
+  """
+  separators = [
+      np.frombuffer(part.encode(), dtype=np.uint8)
+      for part in edge_template.split("%s")
+  ]
+  if len(separators) != 3 or "%" in edge_template.replace("%s", ""):
+    raise ValueError("Unsupported edge template: %r" % edge_template)
+  sources = np.asarray(sources, dtype=np.int64)
+  targets = np.asarray(targets, dtype=np.int64)
+  encoded_names = [name.encode() for name in names]
+  name_lengths = np.fromiter(
+      map(len, encoded_names), dtype=np.int64, count=len(encoded_names)
+  )
+  name_starts = np.cumsum(name_lengths) - name_lengths
+  name_bytes = np.frombuffer(b"".join(encoded_names), dtype=np.uint8)
+  edge_lengths = (
+      sum(len(separator) for separator in separators)
+      + name_lengths[sources]
+      + name_lengths[targets]
+  )
+  output = np.empty(int(edge_lengths.sum()), dtype=np.uint8)
+  # The output position of the next part of each edge.
+  cursor = np.cumsum(edge_lengths) - edge_lengths
+  for separator, endpoints in zip(separators, (sources, targets, None)):
+    if len(separator):
+      output[cursor[:, None] + np.arange(len(separator))] = separator
+      cursor += len(separator)
+    if endpoints is not None:
+      lengths = name_lengths[endpoints]
+      offsets = np.arange(lengths.sum()) - np.repeat(
+          np.cumsum(lengths) - lengths, lengths
+      )
+      output[np.repeat(cursor, lengths) + offsets] = name_bytes[
+          np.repeat(name_starts[endpoints], lengths) + offsets
+      ]
+      cursor += lengths
+  return output.tobytes().decode("utf-8")
+
+
+def _join_batches(parts: Iterable[str], batch_size: int) -> Iterator[str]:
+  parts = iter(parts)
+  while batch := list(itertools.islice(parts, batch_size)):
+    yield "".join(batch)
+
+
+def _strip_chunks(chunks: Iterable[str]) -> Iterator[str]:
+  """Yields the chunks of `"".join(chunks).strip() + ".\n"`.
+
+  The trailing whitespace of each chunk is held back until a later chunk shows
+  that it is not at the end of the text.
+
+  Args:
+    chunks: the chunks of the text.
+
+  Yields:
+    The chunks of the stripped text, then ".\n".
+  """
+  pending = ""
+  started = False
+  for chunk in chunks:
+    if not started:
+      chunk = chunk.lstrip()
+      if not chunk:
+        continue
+      started = True
+    content = chunk.rstrip()
+    if content:
+      yield pending + content
+      pending = chunk[len(content) :]
+    else:
+      pending += chunk
+  yield ".\n"
+
+
+_ADJACENCY_ENCODER = EdgeListEncoder(
+    header="G describes a graph among nodes %s.\n",
+    edges_header="The edges in G are: ",
+    edge_template="(%s, %s) ",
+    preambles=(
+        "In an undirected graph, (i,j) means that node i and node j are"
+        " connected with an undirected edge. ",
+        "In a directed graph, (i,j) means that there is an edge from node i to"
+        " node j. ",
+    ),
+    final_period=True,
+)
+_FRIENDSHIP_ENCODER = EdgeListEncoder(
+    header="G describes a friendship graph among nodes %s.\n",
+    edges_header="We have the following edges in G:\n",
+    edge_template="%s and %s are friends.\n",
+    strip_nodes=True,
+    directed_error="Friendship encoder is not defined for directed graphs.",
+)
+_COAUTHORSHIP_ENCODER = EdgeListEncoder(
+    header="G describes a coauthorship graph among nodes %s.\n",
+    edges_header="In this coauthorship graph:\n",
+    edge_template="%s and %s wrote a paper together.\n",
+    strip_nodes=True,
+    final_period=True,
+    directed_error="Coauthorship encoder is not defined for directed graphs.",
+)
+_SOCIAL_NETWORK_ENCODER = EdgeListEncoder(
+    header="G describes a social network graph among nodes %s.\n",
+    edges_header="We have the following edges in G:\n",
+    edge_template="%s and %s are connected.\n",
+    strip_nodes=True,
+    directed_error="Social network encoder is not defined for directed graphs.",
+)
+_EXPERT_ENCODER = EdgeListEncoder(
+    header=(
+        "You are a graph analyst and you have been given a graph G among nodes"
+        " %s.\n"
+    ),
+    edges_header="G has the following undirected edges:\n",
+    edge_template="%s -> %s\n",
+    strip_nodes=True,
+)
 
 
 def nx_encoder(graph: nx.Graph, _: dict[int, str], edge_type="id") -> str:
@@ -34,142 +354,245 @@ def nx_encoder(graph: nx.Graph, _: dict[int, str], edge_type="id") -> str:
   if graph.edges():
     output += "The edges in G are: "
   for i, j in graph.edges():
-    edge_type = graph.get_edge_data(i, j)[edge_type]
-    if edge_type is None:
-      edge_type = "linked"
-    output += "(%s, %s, %s) " % (name_dict[i], edge_type, name_dict[j])
+    edge_label = graph.get_edge_data(i, j)[edge_type]
+    if edge_label is None:
+      edge_label = "linked"
+    output += "(%s, %s, %s) " % (name_dict[i], edge_label, name_dict[j])
   return output.strip() + ".\n"
 
 
 def adjacency_encoder(graph: nx.Graph, name_dict: dict[int, str]) -> str:
   """Encoding a graph as entries of an adjacency matrix."""
-  if graph.is_directed():
-    output = (
-        "In a directed graph, (i,j) means that there is an edge from node i to"
-        " node j. "
-    )
-  else:
-    output = (
-        "In an undirected graph, (i,j) means that node i and node j are"
-        " connected with an undirected edge. "
-    )
-  nodes_string = create_node_string(name_dict, len(graph.nodes()))
-  output += "G describes a graph among nodes %s.\n" % nodes_string
-  if graph.edges():
-    output += "The edges in G are: "
-  for i, j in graph.edges():
-    output += "(%s, %s) " % (name_dict[i], name_dict[j])
-  return output.strip() + ".\n"
+  return _ADJACENCY_ENCODER(graph, name_dict)
 
 
 def friendship_encoder(graph: nx.Graph, name_dict: dict[int, str]) -> str:
   """Encoding a graph as a friendship graph."""
-  if graph.is_directed():
-    raise ValueError("Friendship encoder is not defined for directed graphs.")
-  nodes_string = create_node_string(name_dict, len(graph.nodes()))
-  output = (
-      "G describes a friendship graph among nodes %s.\n" % nodes_string.strip()
-  )
-  if graph.edges():
-    output += "We have the following edges in G:\n"
-  for i, j in graph.edges():
-    output += "%s and %s are friends.\n" % (name_dict[i], name_dict[j])
-  return output
+  return _FRIENDSHIP_ENCODER(graph, name_dict)
 
 
 def coauthorship_encoder(graph: nx.Graph, name_dict: dict[int, str]) -> str:
   """Encoding a graph as a coauthorship graph."""
-  if graph.is_directed():
-    raise ValueError("Coauthorship encoder is not defined for directed graphs.")
-  nodes_string = create_node_string(name_dict, len(graph.nodes()))
-  output = (
-      "G describes a coauthorship graph among nodes %s.\n"
-      % nodes_string.strip()
-  )
-  if graph.edges():
-    output += "In this coauthorship graph:\n"
-  for i, j in graph.edges():
-    output += "%s and %s wrote a paper together.\n" % (
-        name_dict[i],
-        name_dict[j],
-    )
-  return output.strip() + ".\n"
+  return _COAUTHORSHIP_ENCODER(graph, name_dict)
 
 
 def incident_encoder(graph: nx.Graph, name_dict: dict[int, str]) -> str:
   """Encoding a graph with its incident lists."""
-  nodes_string = create_node_string(name_dict, len(graph.nodes()))
-  output = "G describes a graph among nodes %s.\n" % nodes_string
+  return _render_incident(
+      graph, name_dict, create_node_string(name_dict, len(graph.nodes()))
+  )
+
+
+def _render_incident(
+    graph: nx.Graph, name_dict: dict[int, str], nodes_string: str
+) -> str:
+  return "".join(_iter_incident_lines(graph, name_dict, nodes_string))
+
+
+def _iter_incident_lines(
+    graph: nx.Graph, name_dict: dict[int, str], nodes_string: str
+) -> Iterator[str]:
+  yield "G describes a graph among nodes %s.\n" % nodes_string
   if graph.edges():
-    output += "In this graph:\n"
-  for source_node in graph.nodes():
-    target_nodes = graph.neighbors(source_node)
-    target_nodes_str = ""
-    nedges = 0
-    for target_node in target_nodes:
-      target_nodes_str += name_dict[target_node] + ", "
-      nedges += 1
-    if nedges > 1:
-      output += "Node %s is connected to nodes %s.\n" % (
+    yield "In this graph:\n"
+  # graph.adj yields the same targets as graph.neighbors.
+  for source_node, target_nodes in graph.adj.items():
+    target_names = [name_dict[target_node] for target_node in target_nodes]
+    if len(target_names) > 1:
+      yield "Node %s is connected to nodes %s.\n" % (
           source_node,
-          target_nodes_str[:-2],
+          ", ".join(target_names),
       )
-    elif nedges == 1:
-      output += "Node %d is connected to node %s.\n" % (
+    elif target_names:
+      yield "Node %d is connected to node %s.\n" % (
           source_node,
-          target_nodes_str[:-2],
+          target_names[0],
       )
-  return output
 
 
 def social_network_encoder(graph: nx.Graph, name_dict: dict[int, str]) -> str:
   """Encoding a graph as a social network graph."""
+  return _SOCIAL_NETWORK_ENCODER(graph, name_dict)
+
+
+def expert_encoder(graph: nx.Graph, name_dict: dict[int, str]) -> str:
+  return _EXPERT_ENCODER(graph, name_dict)
+
+
+def _listed_names(graph: nx.Graph, name_dict: dict[int, str]) -> list[str]:
+  return [name_dict[node] for node in graph.nodes()]
+
+
+def _grouped_edges(
+    graph: nx.Graph, name_dict: dict[int, str]
+) -> Iterator[tuple[str, list[str]]]:
+  """Yields the name of each node with edges and the names of their targets.
+
+  Undirected edges are only listed once, from their first node in the order of
+  `graph.edges()`.
+
+  Args:
+    graph: the graph to be encoded.
+    name_dict: a dictionary from node ids to names.
+
+  Yields:
+    (source name, target names) pairs, in edge order.
+  """
+  edge_groups = itertools.groupby(graph.edges(), key=lambda edge: edge[0])
+  for source, edges in edge_groups:
+    yield name_dict[source], [name_dict[target] for _, target in edges]
+
+
+def _compress_ranges(names: list[str]) -> list[str]:
+  """Writes the runs of three or more consecutive integer names as "i-j"."""
+  parts = []
+  start = 0
+  while start < len(names):
+    end = start + 1
+    if names[start].isdigit():
+      while (
+          end < len(names)
+          and names[end].isdigit()
+          and int(names[end]) == int(names[end - 1]) + 1
+      ):
+        end += 1
+    if end - start >= 3:
+      parts.append("%s-%s" % (names[start], names[end - 1]))
+    else:
+      parts += names[start:end]
+    start = end
+  return parts
+
+
+def _compact_preamble(graph: nx.Graph) -> str:
   if graph.is_directed():
-    raise ValueError(
-        "Social network encoder is not defined for directed graphs."
+    return (
+        'In a directed graph, "i: j k" means that there are edges from node i'
+        " to nodes j and k. "
     )
-  nodes_string = create_node_string(name_dict, len(graph.nodes()))
-  output = (
-      "G describes a social network graph among nodes %s.\n"
-      % nodes_string.strip()
+  return (
+      'In an undirected graph, "i: j k" means that node i is connected to nodes'
+      " j and k. Each edge is only listed once. "
   )
-  if graph.edges():
-    output += "We have the following edges in G:\n"
-  for i, j in graph.edges():
-    output += "%s and %s are connected.\n" % (name_dict[i], name_dict[j])
-  return output
 
 
-def expert_encoder(graph: nx.Graph, name_dict: dict[int, str]) -> str:
-  nodes_string = create_node_string(name_dict, len(graph.nodes()))
-  output = (
-      "You are a graph analyst and you have been given a graph G among nodes"
-      " %s.\n"
-      % nodes_string.strip()
-  )
-  output += "G has the following undirected edges:\n" if graph.edges() else ""
-  for i, j in graph.edges():
-    output += "%s -> %s\n" % (name_dict[i], name_dict[j])
-  return output
+def grouped_adjacency_encoder(
+    graph: nx.Graph, name_dict: dict[int, str]
+) -> str:
+  """Encoding a graph as one adjacency list per node with edges."""
+  parts = [
+      _compact_preamble(graph),
+      "G describes a graph among nodes %s.\n"
+      % " ".join(_listed_names(graph, name_dict)),
+  ]
+  for source_name, target_names in _grouped_edges(graph, name_dict):
+    parts.append("%s: %s\n" % (source_name, " ".join(target_names)))
+  return "".join(parts)
+
+
+def ranged_adjacency_encoder(
+    graph: nx.Graph, name_dict: dict[int, str]
+) -> str:
+  """Encoding a graph as adjacency lists with ranges of consecutive nodes."""
+  parts = [
+      _compact_preamble(graph),
+      '"i-j" stands for all the nodes from i to j. ',
+      "G describes a graph among nodes %s.\n"
+      % " ".join(_compress_ranges(_listed_names(graph, name_dict))),
+  ]
+  for source_name, target_names in _grouped_edges(graph, name_dict):
+    if all(name.isdigit() for name in target_names):
+      target_names = sorted(target_names, key=int)
+    parts.append(
+        "%s: %s\n" % (source_name, " ".join(_compress_ranges(target_names)))
+    )
+  return "".join(parts)
+
+
+def csr_encoder(graph: nx.Graph, name_dict: dict[int, str]) -> str:
+  """Encoding a graph in compressed sparse row form."""
+  position = {node: ind for ind, node in enumerate(graph.nodes())}
+  offsets = [0] * (len(position) + 1)
+  target_names = []
+  for source, target in graph.edges():
+    offsets[position[source] + 1] += 1
+    target_names.append(name_dict[target])
+  offsets = itertools.accumulate(offsets)
+  if graph.is_directed():
+    preamble = "In a directed graph in compressed sparse row form, "
+  else:
+    preamble = (
+        "In an undirected graph in compressed sparse row form, where each edge"
+        " is only listed once, "
+    )
+  return "".join([
+      preamble,
+      "the k-th node of G has edges to the targets from position offsets[k]"
+      " to offsets[k + 1] - 1, counting from 0. ",
+      "G describes a graph among nodes %s.\n"
+      % " ".join(_listed_names(graph, name_dict)),
+      "offsets: %s\n" % " ".join(map(str, offsets)),
+      "targets: %s\n" % " ".join(target_names),
+  ])
+
+
+def measure_tokens(
+    graphs: list[nx.Graph],
+    graph_encoders: list[str],
+    tokenize: Callable[[str], Sequence[int]],
+) -> dict[str, dict[str, float]]:
+  """Measures the number of tokens the graph encoders spend on graphs.
+
+  Args:
+    graphs: the graphs to encode.
+    graph_encoders: the names of the graph encoders to measure.
+    tokenize: a function from text to its tokens, e.g. the encode method of a
+      SentencePiece vocabulary.
+
+  Returns:
+    A dict from graph encoder name to the number of graphs it could encode and
+    the total number of tokens, tokens per node and tokens per edge over them.
+    Graphs an encoder does not support, e.g. directed graphs for friendship,
+    are skipped.
+  """
+  report = {}
+  for graph_encoder in graph_encoders:
+    ngraphs = ntokens = nnodes = nedges = 0
+    for graph in graphs:
+      try:
+        encoding = encode_graph(graph, graph_encoder)
+      except (ValueError, KeyError, IndexError):
+        continue
+      ngraphs += 1
+      ntokens += len(tokenize(encoding))
+      nnodes += graph.number_of_nodes()
+      nedges += graph.number_of_edges()
+    report[graph_encoder] = {
+        "graphs": ngraphs,
+        "tokens": ntokens,
+        "tokens_per_node": ntokens / nnodes if nnodes else float("nan"),
+        "tokens_per_edge": ntokens / nedges if nedges else float("nan"),
+    }
+  return report
 
 
 def nodes_to_text(graph, encoding_type):
   """Get dictionary converting node ids to text."""
-  if encoding_type == "integer":
-    return name_dictionaries.create_name_dict(graph, "integer", nnodes=1000)
-  elif encoding_type == "popular":
-    return name_dictionaries.create_name_dict(graph, "popular")
-  elif encoding_type == "alphabet":
-    return name_dictionaries.create_name_dict(graph, "alphabet")
-  elif encoding_type == "got":
-    return name_dictionaries.create_name_dict(graph, "got")
-  elif encoding_type == "south_park":
-    return name_dictionaries.create_name_dict(graph, "south_park")
-  elif encoding_type == "politician":
-    return name_dictionaries.create_name_dict(graph, "politician")
+  if encoding_type in (
+      "integer",
+      "popular",
+      "alphabet",
+      "got",
+      "south_park",
+      "politician",
+  ):
+    # The fixed names lists do not depend on the graph, so their tables are
+    # built once and shared.
+    return name_dictionaries.get_name_table(encoding_type)
   elif encoding_type == "random":
-    return name_dictionaries.create_name_dict(
-        graph, "random_integer", nnodes=1000
+    # Only as many names as the node ids of the graph need are drawn.
+    return name_dictionaries.NameTable(
+        name_dictionaries.random_integer_names(_node_id_range(graph))
     )
   elif encoding_type == "nx_node_name":
     return name_dictionaries.create_name_dict(graph, "nx_node_name")
@@ -177,32 +600,47 @@ def nodes_to_text(graph, encoding_type):
     raise ValueError("Unknown encoding type: %s" % encoding_type)
 
 
+def _node_id_range(graph) -> int:
+  """Returns the number of names needed to name the nodes of a graph by id."""
+  if graph is None:
+    # Tasks create some name dicts before seeing the graphs.
+    return 1000
+  # Node lists of empty graphs still name one node, see create_node_string.
+  try:
+    return max(max(graph.nodes(), default=0) + 1, len(graph))
+  except TypeError:
+    return max(len(graph), 1)
+
+
+# The node encoder of each graph encoder used in the 'Talk Like a Graph' paper.
+_TLAG_NODE_ENCODER = {
+    "adjacency": "integer",
+    "incident": "integer",
+    "friendship": "popular",
+    "south_park": "south_park",
+    "got": "got",
+    "politician": "politician",
+    "social_network": "popular",
+    "expert": "expert",
+    "coauthorship": "popular",
+    "random": "random",
+    "nx_node_name": "nx_node_name",
+    "grouped_adjacency": "integer",
+    "ranged_adjacency": "integer",
+    "csr": "integer",
+}
+
+
+def get_tlag_node_encoder_name(encoder_name: str) -> str:
+  """Returns the name of the node encoder of a graph encoder."""
+  if encoder_name not in _TLAG_NODE_ENCODER:
+    raise ValueError("Unknown graph encoder strategy: %s" % encoder_name)
+  return _TLAG_NODE_ENCODER[encoder_name]
+
+
 def get_tlag_node_encoder(graph, encoder_name):
   """Find the node encoder used in the 'Talk Like a Graph' paper."""
-  if encoder_name == "adjacency":
-    return nodes_to_text(graph, "integer")
-  elif encoder_name == "incident":
-    return nodes_to_text(graph, "integer")
-  elif encoder_name == "friendship":
-    return nodes_to_text(graph, "popular")
-  elif encoder_name == "south_park":
-    return nodes_to_text(graph, "south_park")
-  elif encoder_name == "got":
-    return nodes_to_text(graph, "got")
-  elif encoder_name == "politician":
-    return nodes_to_text(graph, "politician")
-  elif encoder_name == "social_network":
-    return nodes_to_text(graph, "popular")
-  elif encoder_name == "expert":
-    return nodes_to_text(graph, "expert")
-  elif encoder_name == "coauthorship":
-    return nodes_to_text(graph, "popular")
-  elif encoder_name == "random":
-    return nodes_to_text(graph, "random")
-  elif encoder_name == "nx_node_name":
-    return nodes_to_text(graph, "nx_node_name")
-  else:
-    raise ValueError("Unknown graph encoder strategy: %s" % encoder_name)
+  return nodes_to_text(graph, get_tlag_node_encoder_name(encoder_name))
 
 
 # A dictionary from edge encoder name to the corresponding function.
@@ -218,6 +656,16 @@ EDGE_ENCODER_FN = {
     "coauthorship": coauthorship_encoder,
     "random": adjacency_encoder,
     "nx_edge_encoder": nx_encoder,
+    "grouped_adjacency": grouped_adjacency_encoder,
+    "ranged_adjacency": ranged_adjacency_encoder,
+    "csr": csr_encoder,
+}
+_EDGE_LIST_ENCODERS = {
+    adjacency_encoder: _ADJACENCY_ENCODER,
+    friendship_encoder: _FRIENDSHIP_ENCODER,
+    coauthorship_encoder: _COAUTHORSHIP_ENCODER,
+    social_network_encoder: _SOCIAL_NETWORK_ENCODER,
+    expert_encoder: _EXPERT_ENCODER,
 }
 
 
@@ -297,3 +745,169 @@ def encode_graph(
   else:
     node_encoder_dict = nodes_to_text(graph, node_encoder)
     return EDGE_ENCODER_FN[edge_encoder](graph, node_encoder_dict)
+
+
+def encode_edge_arrays(
+    graph: nx.Graph,
+    graph_encoder: str,
+    sources: np.ndarray,
+    targets: np.ndarray,
+) -> str:
+  """Encodes a graph whose edges are given as arrays of node positions.
+
+  The edge list encoders (adjacency, friendship, coauthorship, social network,
+  expert and the ones sharing their templates) render the edges with
+  render_edge_text, which is much faster on large graphs. The other encoders,
+  and name dicts missing some nodes of the graph, fall back to encode_graph.
+
+  Args:
+    graph: the graph to be encoded.
+    graph_encoder: the name of the graph encoder to use.
+    sources: the position in `graph.nodes()` of the first node of each edge, in
+      the order of `graph.edges()`.
+    targets: the position of the second node of each edge.
+
+  Returns:
+    The same string as `encode_graph(graph, graph_encoder)`.
+  """
+  name_dict = get_tlag_node_encoder(graph, graph_encoder)
+  edge_encoder = EDGE_ENCODER_FN[graph_encoder]
+  if edge_encoder not in _EDGE_LIST_ENCODERS:
+    return edge_encoder(graph, name_dict)
+  names = [name_dict.get(node) for node in graph.nodes()]
+  if None in names:
+    return edge_encoder(graph, name_dict)
+  return _EDGE_LIST_ENCODERS[edge_encoder].render_arrays(
+      graph,
+      create_node_string(name_dict, len(graph.nodes())),
+      sources,
+      targets,
+      names,
+  )
+
+
+def encode_graph_multi(
+    graph: nx.Graph,
+    graph_encoders: list[str],
+    edge_arrays: tuple[np.ndarray, np.ndarray] | None = None,
+) -> dict[str, str]:
+  """Encodes a graph with several graph encoders in a single pass.
+
+  The edges of the graph are listed once. The graph encoders with the same node
+  encoder (e.g. friendship and coauthorship) share its name dict, node list and
+  edge names. Random names are drawn in the order of `graph_encoders`, so the
+  encodings are the same as the ones of successive
+  `encode_graph(graph, graph_encoder)` calls.
+
+  Args:
+    graph: the graph to be encoded.
+    graph_encoders: the names of the graph encoders to use.
+    edge_arrays: if set, the (sources, targets) node positions of the edges, as
+      taken by encode_edge_arrays. The edge list encoders then render the edges
+      with render_edge_text.
+
+  Returns:
+    A dict from graph encoder name to the encoded graph.
+  """
+  if edge_arrays is None:
+    edges = list(graph.edges())
+  else:
+    nodes = list(graph.nodes())
+  # For each node encoder, its name dict, the node list and the edge names.
+  name_tables = {}
+  encodings = {}
+  for graph_encoder in graph_encoders:
+    edge_encoder = EDGE_ENCODER_FN.get(graph_encoder)
+    if edge_encoder not in _EDGE_LIST_ENCODERS and (
+        edge_encoder is not incident_encoder
+    ):
+      encodings[graph_encoder] = encode_graph(graph, graph_encoder)
+      continue
+    node_encoder = _TLAG_NODE_ENCODER[graph_encoder]
+    if node_encoder not in name_tables or node_encoder == "random":
+      name_dict = nodes_to_text(graph, node_encoder)
+      name_tables[node_encoder] = [
+          name_dict,
+          create_node_string(name_dict, len(graph.nodes())),
+          None,
+      ]
+    name_table = name_tables[node_encoder]
+    name_dict, nodes_string, name_pairs = name_table
+    if edge_encoder is incident_encoder:
+      encodings[graph_encoder] = _render_incident(
+          graph, name_dict, nodes_string
+      )
+      continue
+    if edge_arrays is not None:
+      if name_pairs is None:
+        # Here the edge names are the node names, indexed by position.
+        name_pairs = [name_dict.get(node) for node in nodes]
+        name_table[2] = name_pairs
+      if None not in name_pairs:
+        encodings[graph_encoder] = _EDGE_LIST_ENCODERS[
+            edge_encoder
+        ].render_arrays(graph, nodes_string, *edge_arrays, name_pairs)
+      else:
+        encodings[graph_encoder] = edge_encoder(graph, name_dict)
+      continue
+    if name_pairs is None:
+      name_pairs = [(name_dict[i], name_dict[j]) for i, j in edges]
+      name_table[2] = name_pairs
+    encodings[graph_encoder] = _EDGE_LIST_ENCODERS[edge_encoder].render(
+        graph, nodes_string, name_pairs
+    )
+  return encodings
+
+
+def iter_encode_graph(
+    graph: nx.Graph, graph_encoder: str, edges_per_chunk: int = 4096
+) -> Iterator[str]:
+  """Returns the encoding of a graph as an iterator over text chunks.
+
+  The chunks are rendered while they are consumed, so the encoding of a large
+  graph can be written out or measured without holding it as one string. They
+  join into `encode_graph(graph, graph_encoder)`.
+
+  Args:
+    graph: the graph to be encoded.
+    graph_encoder: the name of the graph encoder to use.
+    edges_per_chunk: the number of edges (or incident lists) per chunk.
+
+  Returns:
+    An iterator over the chunks of the encoding.
+  """
+  name_dict = get_tlag_node_encoder(graph, graph_encoder)
+  edge_encoder = EDGE_ENCODER_FN[graph_encoder]
+  if edge_encoder in _EDGE_LIST_ENCODERS:
+    return _EDGE_LIST_ENCODERS[edge_encoder].iter_render(
+        graph, name_dict, edges_per_chunk
+    )
+  if edge_encoder is incident_encoder:
+    nodes_string = create_node_string(name_dict, len(graph.nodes()))
+    return _join_batches(
+        _iter_incident_lines(graph, name_dict, nodes_string), edges_per_chunk
+    )
+  return iter([edge_encoder(graph, name_dict)])
+
+
+def write_encoded_graph(
+    graph: nx.Graph,
+    graph_encoder: str,
+    f: TextIO,
+    edges_per_chunk: int = 4096,
+) -> int:
+  """Writes the encoding of a graph to a text file chunk by chunk.
+
+  Args:
+    graph: the graph to be encoded.
+    graph_encoder: the name of the graph encoder to use.
+    f: the file or buffer to write to.
+    edges_per_chunk: the number of edges (or incident lists) per chunk.
+
+  Returns:
+    The number of characters written.
+  """
+  nchars = 0
+  for chunk in iter_encode_graph(graph, graph_encoder, edges_per_chunk):
+    nchars += f.write(chunk)
+  return nchars
@@ -1,9 +1,14 @@
 """Testing for graph_text_encoders.py."""
 
+import io
+import random
+
 from absl.testing import parameterized
 import networkx as nx
 
+from . import graph_index
 from . import graph_text_encoders
+from . import name_dictionaries
 from absl.testing import absltest
 
 _G = nx.Graph()
@@ -69,5 +74,216 @@ class GraphTextEncodersTest(absltest.TestCase, parameterized.TestCase):
     )
 
 
+  def test_edgeless_and_directed_graphs(self):
+    self.assertEqual(
+        graph_text_encoders.encode_graph(nx.empty_graph(2), 'adjacency'),
+        'In an undirected graph, (i,j) means that node i and node j are'
+        ' connected with an undirected edge. G describes a graph among nodes'
+        ' 0, and 1..\n',
+    )
+    directed_graph = nx.DiGraph([(1, 0)])
+    self.assertEqual(
+        graph_text_encoders.encode_graph(
+            directed_graph, node_encoder='integer', edge_encoder='expert'
+        ),
+        'You are a graph analyst and you have been given a graph G among nodes'
+        ' 0, and 1.\nG has the following undirected edges:\n1 -> 0\n',
+    )
+    with self.assertRaises(ValueError):
+      graph_text_encoders.encode_graph(directed_graph, 'friendship')
+
+  def test_nx_edge_encoder(self):
+    graph = nx.path_graph(3)
+    nx.set_edge_attributes(graph, {(0, 1): None, (1, 2): 'knows'}, name='id')
+    self.assertEndsWith(
+        graph_text_encoders.encode_graph(
+            graph, node_encoder='nx_node_name', edge_encoder='nx_edge_encoder'
+        ),
+        'The edges in G are: (0, linked, 1) (1, knows, 2).\n',
+    )
+
+  def test_encode_graph_multi(self):
+    graph_encoders = [
+        'adjacency',
+        'incident',
+        'friendship',
+        'coauthorship',
+        'social_network',
+        'got',
+        'south_park',
+        'politician',
+        'random',
+        'random',
+    ]
+    for graph in (_G, nx.DiGraph([(0, 1), (2, 1)])):
+      random.seed(0)
+      encodings = graph_text_encoders.encode_graph_multi(
+          graph, graph_encoders[:2] + graph_encoders[-2:]
+      )
+      random.seed(0)
+      self.assertEqual(
+          encodings,
+          {
+              graph_encoder: graph_text_encoders.encode_graph(
+                  graph, graph_encoder
+              )
+              for graph_encoder in graph_encoders[:2] + graph_encoders[-2:]
+          },
+      )
+    random.seed(0)
+    encodings = graph_text_encoders.encode_graph_multi(
+        _G, graph_encoders[:-1]
+    )
+    random.seed(0)
+    for graph_encoder in graph_encoders[:-1]:
+      self.assertEqual(
+          encodings[graph_encoder],
+          graph_text_encoders.encode_graph(_G, graph_encoder),
+      )
+
+  def test_iter_encode_graph(self):
+    graph = nx.DiGraph([(0, 1), (1, 2), (2, 0), (3, 1)])
+    for graph_encoder in ('adjacency', 'incident', 'expert', 'got'):
+      for edges_per_chunk in (1, 3, 4096):
+        try:
+          encoding = graph_text_encoders.encode_graph(graph, graph_encoder)
+        except ValueError:
+          with self.assertRaises(ValueError):
+            graph_text_encoders.iter_encode_graph(graph, graph_encoder)
+          continue
+        chunks = list(
+            graph_text_encoders.iter_encode_graph(
+                graph, graph_encoder, edges_per_chunk
+            )
+        )
+        self.assertEqual(''.join(chunks), encoding)
+        if edges_per_chunk == 1:
+          self.assertGreater(len(chunks), 4)
+
+  def test_write_encoded_graph(self):
+    buffer = io.StringIO()
+    nchars = graph_text_encoders.write_encoded_graph(
+        _G, 'coauthorship', buffer, edges_per_chunk=2
+    )
+    encoding = graph_text_encoders.encode_graph(_G, 'coauthorship')
+    self.assertEqual(buffer.getvalue(), encoding)
+    self.assertEqual(nchars, len(encoding))
+  def test_shared_name_tables(self):
+    name_table = graph_text_encoders.nodes_to_text(_G, 'popular')
+    self.assertIs(
+        graph_text_encoders.nodes_to_text(None, 'popular'), name_table
+    )
+    name_dict = name_dictionaries.create_name_dict(_G, 'popular')
+    self.assertEqual(dict(name_table), name_dict)
+    self.assertNotIn(-1, name_table)
+    self.assertLen(name_table, len(name_dict))
+    for nnodes in (0, 1, 5):
+      self.assertEqual(
+          graph_text_encoders.create_node_string(name_table, nnodes),
+          graph_text_encoders.create_node_string(name_dict, nnodes),
+      )
+
+  def test_name_tables_scale_past_the_names_lists(self):
+    name_table = graph_text_encoders.nodes_to_text(None, 'got')
+    nnames = len(name_table)
+    self.assertEqual(name_table[nnames], name_table[0] + '2')
+    self.assertEqual(name_table[2 * nnames + 1], name_table[1] + '3')
+    names = name_table.first(5 * nnames)
+    self.assertLen(set(names), 5 * nnames)
+    self.assertEqual(
+        graph_text_encoders.nodes_to_text(None, 'integer')[12345], '12345'
+    )
+    nnodes = 3 * nnames
+    self.assertIn(
+        '%s and %s are friends.' % (names[nnodes - 2], names[nnodes - 1]),
+        graph_text_encoders.encode_graph(nx.path_graph(nnodes), 'got'),
+    )
+
+  def test_compact_encoders(self):
+    graph = nx.Graph([(0, 1), (0, 2), (0, 3), (0, 5), (1, 2), (4, 4)])
+    self.assertEndsWith(
+        graph_text_encoders.encode_graph(graph, 'grouped_adjacency'),
+        'among nodes 0 1 2 3 5 4.\n0: 1 2 3 5\n1: 2\n4: 4\n',
+    )
+    self.assertEndsWith(
+        graph_text_encoders.encode_graph(graph, 'ranged_adjacency'),
+        'among nodes 0-3 5 4.\n0: 1-3 5\n1: 2\n4: 4\n',
+    )
+    self.assertEndsWith(
+        graph_text_encoders.encode_graph(graph, 'csr'),
+        'offsets: 0 4 5 5 5 5 6\ntargets: 1 2 3 5 2 4\n',
+    )
+
+  def test_measure_tokens(self):
+    report = graph_text_encoders.measure_tokens(
+        [_G, nx.DiGraph(_G)], ['adjacency', 'friendship', 'csr'], str.split
+    )
+    self.assertEqual(report['friendship']['graphs'], 1)
+    self.assertEqual(report['csr']['graphs'], 2)
+    tokens = len(graph_text_encoders.encode_graph(_G, 'friendship').split())
+    self.assertEqual(report['friendship']['tokens'], tokens)
+    self.assertEqual(
+        report['friendship']['tokens_per_edge'], tokens / _G.number_of_edges()
+    )
+    report = graph_text_encoders.measure_tokens(
+        [nx.gnp_random_graph(40, 0.2, seed=0)],
+        ['adjacency', 'grouped_adjacency', 'csr'],
+        str.split,
+    )
+    for graph_encoder in ('grouped_adjacency', 'csr'):
+      self.assertLess(
+          report[graph_encoder]['tokens_per_edge'],
+          report['adjacency']['tokens_per_edge'],
+      )
+
+  def test_random_names(self):
+    names = name_dictionaries.random_integer_names(500, seed=7)
+    self.assertLen(set(names), 500)
+    self.assertEqual(name_dictionaries.random_integer_names(500, seed=7), names)
+    random.seed(0)
+    name_dict = graph_text_encoders.nodes_to_text(nx.path_graph(8), 'random')
+    self.assertLen(name_dict, 8)
+    random.seed(0)
+    self.assertEqual(
+        graph_text_encoders.nodes_to_text(nx.path_graph(8), 'random'),
+        name_dict,
+    )
+
+  def test_render_edge_text(self):
+    self.assertEqual(
+        graph_text_encoders.render_edge_text(
+            '%s -> %s\n', [0, 2, 1], [1, 1, 2], ['Zoë', 'b', '東京']
+        ),
+        'Zoë -> b\n東京 -> b\nb -> 東京\n',
+    )
+    self.assertEqual(
+        graph_text_encoders.render_edge_text('(%s, %s) ', [], [], ['a']), ''
+    )
+
+  def test_encode_edge_arrays(self):
+    graphs = [
+        _G,
+        nx.MultiGraph([(0, 1), (0, 1), (2, 2), (1, 3)]),
+        nx.DiGraph([(3, 1), (1, 2), (2, 0), (0, 1)]),
+        nx.empty_graph(3),
+    ]
+    for graph in graphs:
+      edge_arrays = graph_index.GraphIndex(graph).edge_arrays()
+      for graph_encoder in ('adjacency', 'incident', 'coauthorship', 'got'):
+        try:
+          encoding = graph_text_encoders.encode_graph(graph, graph_encoder)
+        except ValueError:
+          with self.assertRaises(ValueError):
+            graph_text_encoders.encode_edge_arrays(
+                graph, graph_encoder, *edge_arrays
+            )
+          continue
+        self.assertEqual(
+            graph_text_encoders.encode_edge_arrays(
+                graph, graph_encoder, *edge_arrays
+            ),
+            encoding,
+        )
+
 if __name__ == '__main__':
   googletest.main()
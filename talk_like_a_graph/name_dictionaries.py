@@ -1,12 +1,13 @@
 """Creates a dictionary mapping integers to node names."""
 
+from collections.abc import Callable, Iterator, Mapping, Sequence
 import random
 
+import numpy as np
+
 _RANDOM_SEED = 1234
 random.seed(_RANDOM_SEED)
 
-_INTEGER_NAMES = [str(x) for x in range(10000)]
-
 _POPULAR_NAMES = [
     "James",
     "Robert",
@@ -262,6 +263,147 @@ _ALPHABET_NAMES = [
 ]
 
 
+_NAMES_LISTS = {
+    "alphabet": _ALPHABET_NAMES,
+    "popular": _POPULAR_NAMES,
+    "south_park": _SOUTH_PARK_NAMES,
+    "got": _GOT_NAMES,
+    "politician": _POLITICIAN_NAMES,
+}
+
+# The number of integer names listed by create_name_dict and iterated over in
+# the "integer" name table. Larger ids are named on demand.
+_NUM_INTEGER_NAMES = 10000
+
+
+def _names_list(name: str) -> list[str]:
+  if name == "integer":
+    return [str(x) for x in range(_NUM_INTEGER_NAMES)]
+  return _NAMES_LISTS[name]
+
+
+def _integer_name(node: int) -> str:
+  return str(node)
+
+
+class _SuffixedName:
+  """Names the ids past a names list by cycling through it with a suffix.
+
+  With k names, id i is named names[i % k] followed by i // k + 1, e.g. James2
+  for the first id past the list. The names lists have no digits, so these
+  names are distinct from the listed ones and from each other.
+  """
+
+  def __init__(self, names: Sequence[str]):
+    self.names = names
+
+  def __call__(self, node: int) -> str:
+    rounds, ind = divmod(node, len(self.names))
+    return "%s%d" % (self.names[ind], rounds + 1)
+
+
+class NameTable(Mapping):
+  """An immutable mapping from the node ids 0, ..., n - 1 to names.
+
+  It reads like the dict of create_name_dict, but is backed by a tuple, so a
+  table can be built once and shared by all the encoders and tasks. Tables
+  with an `expand` function also name the ids past their names, on demand,
+  so they work on graphs of any size. Iterating over such a table still only
+  yields the ids of its names.
+
+  Attributes:
+    names: the names, indexed by node id.
+    expand: if set, a function naming the ids from len(names) on.
+    memo: values derived from the names, e.g. the node list of a graph size,
+      computed once per table by their users.
+  """
+
+  def __init__(
+      self,
+      names: Sequence[str],
+      expand: Callable[[int], str] | None = None,
+  ):
+    self.names = tuple(names)
+    self.expand = expand
+    self.memo = {}
+
+  def __getitem__(self, node) -> str:
+    try:
+      if node >= 0:
+        return self.names[node]
+    except IndexError:
+      if self.expand is not None:
+        return self.expand(int(node))
+    except TypeError:
+      pass
+    raise KeyError(node)
+
+  def first(self, nnodes: int) -> tuple[str, ...]:
+    """Returns the names of the ids below nnodes, as far as they exist."""
+    if nnodes <= len(self.names) or self.expand is None:
+      return self.names[:nnodes]
+    return self.names + tuple(
+        self.expand(node) for node in range(len(self.names), nnodes)
+    )
+
+  def __iter__(self) -> Iterator[int]:
+    return iter(range(len(self.names)))
+
+  def __len__(self) -> int:
+    return len(self.names)
+
+  def __repr__(self) -> str:
+    return "NameTable(%d names)" % len(self.names)
+
+
+_NAME_TABLES = {}
+
+# Random integer names are drawn from range(_RANDOM_INTEGER_RANGE).
+_RANDOM_INTEGER_RANGE = 1000001
+
+
+def random_integer_names(nnodes: int, seed: int | None = None) -> list[str]:
+  """Draws distinct random integer names with a NumPy Generator.
+
+  Args:
+    nnodes: the number of names to draw.
+    seed: the seed of the generator. By default, it is drawn from the global
+      random state, which graph_tasks_parallel seeds for every graph, so the
+      names are reproducible without being shared across examples.
+
+  Returns:
+    A list of nnodes distinct names.
+  """
+  if seed is None:
+    seed = random.getrandbits(64)
+  values = np.random.default_rng(seed).choice(
+      _RANDOM_INTEGER_RANGE, size=nnodes, replace=False
+  )
+  return [str(value) for value in values.tolist()]
+
+
+def get_name_table(name: str) -> NameTable:
+  """Returns the shared name table of a fixed names list.
+
+  The table is built on first use and the same object is returned afterwards.
+
+  Args:
+    name: name of the approach for mapping, e.g. "integer" or "popular".
+
+  Returns:
+    A NameTable with the same items as `create_name_dict(None, name)`.
+  """
+  if name not in _NAME_TABLES:
+    if name == "integer":
+      expand = _integer_name
+    elif name in _NAMES_LISTS:
+      expand = _SuffixedName(_NAMES_LISTS[name])
+    else:
+      raise ValueError(f"Unknown approach: {name}")
+    _NAME_TABLES[name] = NameTable(_names_list(name), expand)
+  return _NAME_TABLES[name]
+
+
 def create_name_dict(graph, name: str, nnodes: int = 20) -> dict[int, str]:
   """The runner function to map integers to node names.
 
@@ -273,22 +415,10 @@ def create_name_dict(graph, name: str, nnodes: int = 20) -> dict[int, str]:
   Returns:
     A dictionary from integers to strings.
   """
-  if name == "alphabet":
-    names_list = _ALPHABET_NAMES
-  elif name == "integer":
-    names_list = _INTEGER_NAMES
+  if name == "integer" or name in _NAMES_LISTS:
+    names_list = _names_list(name)
   elif name == "random_integer":
-    names_list = []
-    for _ in range(nnodes):
-      names_list.append(str(random.randint(0, 1000000)))
-  elif name == "popular":
-    names_list = _POPULAR_NAMES
-  elif name == "south_park":
-    names_list = _SOUTH_PARK_NAMES
-  elif name == "got":
-    names_list = _GOT_NAMES
-  elif name == "politician":
-    names_list = _POLITICIAN_NAMES
+    names_list = random_integer_names(nnodes)
   elif name == "nx_node_name":
     return {x: str(x) for x in graph.nodes()}
   else:
@@ -0,0 +1,190 @@
+"""Time and memory budgets for the oracles computing the answers of tasks.
+
+A single large or adversarial graph can make an oracle such as maximum flow
+run for hours. A CostGuard attached to a task (see GraphTask.cost_guard) checks
+the estimated memory of each oracle before running it and interrupts it once it
+runs out of time. The graph is then skipped by the task, or deferred to be
+processed later without budgets, and the guard counts what happened.
+"""
+
+import collections
+from collections.abc import Callable, Iterator
+import contextlib
+import signal
+from typing import Any
+
+import networkx as nx
+
+# Rough bytes per node, per edge and per node pair used by each oracle. These
+# only need to be accurate enough to tell small graphs from huge ones.
+_MEMORY_PER_ELEMENT = {
+    'find_cycle': (100, 100, 0),
+    'triangles': (200, 100, 0),
+    # networkx builds a residual network with its own node and edge dicts.
+    'maximum_flow': (500, 1000, 0),
+    'shortest_path': (16, 8, 0),
+    # An int64 distance matrix and a boolean label matrix.
+    'distance_matrix': (0, 0, 9),
+}
+
+ORACLES = tuple(_MEMORY_PER_ELEMENT)
+
+
+class BudgetExceededError(Exception):
+  """Raised when an oracle exceeds its budget on a graph."""
+
+
+class _OracleTimeoutError(Exception):
+  pass
+
+
+def estimate_memory(oracle: str, graph: nx.Graph) -> int:
+  """Estimates the peak memory in bytes of running an oracle on a graph."""
+  per_node, per_edge, per_pair = _MEMORY_PER_ELEMENT[oracle]
+  nnodes = graph.number_of_nodes()
+  return (
+      per_node * nnodes
+      + per_edge * graph.number_of_edges()
+      + per_pair * nnodes * nnodes
+  )
+
+
+@contextlib.contextmanager
+def _time_limit(seconds: float) -> Iterator[None]:
+  """Raises _OracleTimeoutError in the block once `seconds` have passed.
+
+  The limit relies on SIGALRM, so it is only enforced in the main thread of a
+  process (which includes the workers of graph_tasks_parallel).
+
+  Args:
+    seconds: the time limit.
+
+  Yields:
+    Nothing.
+  """
+
+  def handler(signum, frame):
+    del signum, frame
+    raise _OracleTimeoutError()
+
+  try:
+    previous_handler = signal.signal(signal.SIGALRM, handler)
+  except ValueError:
+    # Not in the main thread.
+    yield
+    return
+  signal.setitimer(signal.ITIMER_REAL, seconds)
+  try:
+    yield
+  finally:
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    signal.signal(signal.SIGALRM, previous_handler)
+
+
+class CostGuard:
+  """Per-oracle budgets and the record of the graphs that exceeded them.
+
+  Attributes:
+    max_seconds: a dict from oracle name to its time budget in seconds.
+    max_memory: a dict from oracle name to its estimated memory budget in
+      bytes.
+    defer: whether the graphs exceeding a budget are kept in `deferred` to be
+      processed later, e.g. by a slower queue without budgets.
+    counts: a counter of (oracle, reason) pairs, where reason is 'time' or
+      'memory', and of the 'skipped' and 'deferred' graphs.
+    deferred: a dict from each deferred graph to its generator algorithm, in
+      the order they were deferred. A graph is only deferred once, however
+      many of its examples exceeded a budget.
+  """
+
+  def __init__(
+      self,
+      max_seconds: dict[str, float] | None = None,
+      max_memory: dict[str, int] | None = None,
+      defer: bool = False,
+  ):
+    self.max_seconds = dict(max_seconds or {})
+    self.max_memory = dict(max_memory or {})
+    self.defer = defer
+    self.counts = collections.Counter()
+    self.deferred = {}
+
+  def new_run(self) -> 'CostGuard':
+    """Returns a guard with the same budgets, and no counts or deferrals."""
+    return CostGuard(self.max_seconds, self.max_memory, self.defer)
+
+  def merge(
+      self, counts: collections.Counter, deferred: dict[nx.Graph, str]
+  ) -> None:
+    """Adds the counts and deferred graphs of another run of the guard.
+
+    The workers of graph_tasks_parallel run copies of the guards, whose counts
+    and deferred graphs are merged back into the guards of the main process.
+
+    Args:
+      counts: the counts of the other run.
+      deferred: the graphs deferred by the other run, and their generator
+        algorithms. Graphs already deferred here are not counted again.
+    """
+    for key, count in counts.items():
+      if key != 'deferred':
+        self.counts[key] += count
+    for graph, algorithm in deferred.items():
+      self._defer(graph, algorithm)
+
+  def run(
+      self,
+      oracle: str,
+      graph: nx.Graph,
+      algorithm: str,
+      compute: Callable[[], Any],
+  ) -> Any:
+    """Runs an oracle within its budgets.
+
+    Args:
+      oracle: the name of the oracle, one of ORACLES.
+      graph: the graph the oracle runs on.
+      algorithm: the algorithm that generated the graph.
+      compute: runs the oracle.
+
+    Returns:
+      The value of compute().
+
+    Raises:
+      BudgetExceededError: if the oracle exceeds one of its budgets. The graph
+        is then recorded as skipped or deferred.
+    """
+    max_memory = self.max_memory.get(oracle)
+    if max_memory and estimate_memory(oracle, graph) > max_memory:
+      self._reject(oracle, 'memory', graph, algorithm)
+    max_seconds = self.max_seconds.get(oracle)
+    if not max_seconds:
+      return compute()
+    try:
+      with _time_limit(max_seconds):
+        return compute()
+    except _OracleTimeoutError:
+      self._reject(oracle, 'time', graph, algorithm)
+
+  def _reject(
+      self, oracle: str, reason: str, graph: nx.Graph, algorithm: str
+  ) -> None:
+    self.counts[(oracle, reason)] += 1
+    if self.defer:
+      self._defer(graph, algorithm)
+    else:
+      self.counts['skipped'] += 1
+    raise BudgetExceededError(
+        'The %s oracle exceeded its %s budget on a graph with %d nodes and %d'
+        ' edges.' % (
+            oracle,
+            reason,
+            graph.number_of_nodes(),
+            graph.number_of_edges(),
+        )
+    )
+
+  def _defer(self, graph: nx.Graph, algorithm: str) -> None:
+    if graph not in self.deferred:
+      self.counts['deferred'] += 1
+      self.deferred[graph] = algorithm
@@ -0,0 +1,74 @@
+"""Testing for oracle_guards.py."""
+
+import time
+
+import networkx as nx
+
+from . import graph_tasks
+from . import oracle_guards
+from absl.testing import absltest
+
+
+class OracleGuardsTest(absltest.TestCase):
+
+  def test_time_budget(self):
+    cost_guard = oracle_guards.CostGuard(max_seconds={'maximum_flow': 0.05})
+    with self.assertRaises(oracle_guards.BudgetExceededError):
+      cost_guard.run(
+          'maximum_flow', nx.path_graph(3), 'path', lambda: time.sleep(5)
+      )
+    self.assertEqual(
+        cost_guard.run('maximum_flow', nx.path_graph(3), 'path', lambda: 1), 1
+    )
+    self.assertEqual(
+        cost_guard.counts, {('maximum_flow', 'time'): 1, 'skipped': 1}
+    )
+
+  def test_memory_budget_skips_graphs(self):
+    task = graph_tasks.TriangleCounting()
+    task.cost_guard = oracle_guards.CostGuard(max_memory={'triangles': 10_000})
+    small_graph, large_graph = nx.complete_graph(4), nx.complete_graph(40)
+    examples_dict = task.prepare_examples_dict(
+        [small_graph, large_graph], ['complete', 'complete'], 'adjacency'
+    )
+    self.assertLen(examples_dict, 1)
+    self.assertIs(examples_dict[0]['graph'], small_graph)
+    self.assertEqual(task.cost_guard.counts['skipped'], 1)
+
+  def test_deferred_graphs(self):
+    task = graph_tasks.ShortestPath(queries_per_graph=2)
+    task.cost_guard = oracle_guards.CostGuard(
+        max_memory={'shortest_path': 100}, defer=True
+    )
+    large_graph = nx.path_graph(20)
+    for encoding_method in ('adjacency', 'incident'):
+      task.prepare_examples_dict([large_graph], ['path'], encoding_method)
+    self.assertEqual(task.cost_guard.deferred, {large_graph: 'path'})
+    self.assertEqual(task.cost_guard.counts['deferred'], 1)
+    self.assertEqual(task.cost_guard.counts[('shortest_path', 'memory')], 2)
+
+  def test_merge_runs(self):
+    cost_guard = oracle_guards.CostGuard(
+        max_memory={'shortest_path': 100}, defer=True
+    )
+    graphs = [nx.path_graph(20), nx.path_graph(30)]
+    cost_guard.deferred[graphs[0]] = 'path'
+    cost_guard.counts['deferred'] += 1
+    run = cost_guard.new_run()
+    self.assertEqual(run.max_memory, cost_guard.max_memory)
+    self.assertTrue(run.defer)
+    self.assertEmpty(run.counts)
+    self.assertEmpty(run.deferred)
+    for graph in graphs:
+      with self.assertRaises(oracle_guards.BudgetExceededError):
+        run.run('shortest_path', graph, 'path', lambda: None)
+    cost_guard.merge(run.counts, run.deferred)
+    self.assertEqual(cost_guard.deferred, dict.fromkeys(graphs, 'path'))
+    self.assertEqual(
+        cost_guard.counts,
+        {('shortest_path', 'memory'): 2, 'deferred': 2},
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
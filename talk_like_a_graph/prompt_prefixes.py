@@ -0,0 +1,119 @@
+"""Prompts sharing their prefixes across examples, and their grouped export.
+
+Serving stacks with a prefix (KV) cache reuse the computation of the prefix a
+prompt shares with an earlier one. In the 'shared_prefix' layout of
+graph_tasks_utils.create_few_shot_task, the few-shot examples are chosen once
+per text encoder, so the prompts of an encoder start with the same few-shot
+block, followed by the graph encoding, which the questions about the same graph
+share. Each example records the end offsets of these shared prefixes. The
+examples are then written grouped by prefix, with a manifest of the spans of
+records sharing each prefix.
+"""
+
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+PROMPT_LAYOUTS = ('default', 'shared_prefix')
+
+
+def prefix_lengths(question: str, parts: Sequence[str]) -> list[int]:
+  """Returns the end offsets of the leading parts of a question.
+
+  Args:
+    question: the full question.
+    parts: the parts the question is expected to start with, in order.
+
+  Returns:
+    The end offset of each part, up to the first one not found where expected.
+  """
+  lengths = []
+  end = 0
+  for part in parts:
+    if not question.startswith(part, end):
+      break
+    end += len(part)
+    lengths.append(end)
+  return lengths
+
+
+def group_by_prefix(
+    keyed_examples: Iterable[tuple[Any, dict[str, Any]]],
+) -> list[tuple[Any, dict[str, Any]]]:
+  """Orders examples so that the ones sharing prefixes are adjacent.
+
+  The examples are grouped by their first prefix, then within each group by
+  their second one, and so on. Groups come in the order of their first example,
+  and the examples keep their order within a group.
+
+  Args:
+    keyed_examples: (key, example) pairs. The 'prefix_lengths' of an example are
+      the end offsets of the prefixes of its question.
+
+  Returns:
+    The (key, example) pairs in grouped order.
+  """
+  groups = {}
+  for key, example in keyed_examples:
+    question = example['question']
+    group = groups
+    for length in example.get('prefix_lengths', ()):
+      group = group.setdefault(question[:length], {})
+    group.setdefault(None, []).append((key, example))
+  grouped = []
+  stack = [iter(groups.items())]
+  while stack:
+    for prefix, value in stack[-1]:
+      if prefix is None:
+        grouped += value
+      else:
+        stack.append(iter(value.items()))
+        break
+    else:
+      stack.pop()
+  return grouped
+
+
+def _has_prefix(
+    prompt: tuple[str, Sequence[int]], level: int, prefix: str
+) -> bool:
+  question, lengths = prompt
+  return (
+      level < len(lengths)
+      and lengths[level] == len(prefix)
+      and question.startswith(prefix)
+  )
+
+
+def prefix_manifest(
+    prompts: Sequence[tuple[str, Sequence[int]]],
+) -> list[dict[str, int]]:
+  """Returns the spans of consecutive prompts sharing a prefix.
+
+  Args:
+    prompts: the question and prefix lengths of each example, in record order.
+
+  Returns:
+    For each level of prefix, the runs of at least two consecutive records
+    sharing their prefix at that level, as dicts with the 'level', the 'start'
+    and 'stop' record indices and the 'prefix_length' in characters.
+  """
+  manifest = []
+  nlevels = max((len(lengths) for _, lengths in prompts), default=0)
+  for level in range(nlevels):
+    start = 0
+    while start < len(prompts):
+      question, lengths = prompts[start]
+      stop = start + 1
+      if level < len(lengths):
+        prefix = question[: lengths[level]]
+        while stop < len(prompts) and _has_prefix(prompts[stop], level, prefix):
+          stop += 1
+        if stop - start > 1:
+          manifest.append({
+              'level': level,
+              'start': start,
+              'stop': stop,
+              'prefix_length': len(prefix),
+          })
+      start = stop
+  return manifest
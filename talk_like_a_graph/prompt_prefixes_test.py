@@ -0,0 +1,56 @@
+"""Testing for prompt_prefixes.py."""
+
+from . import prompt_prefixes
+from absl.testing import absltest
+
+
+def _example(question: str, *parts: str) -> dict[str, object]:
+  return {
+      'question': question,
+      'prefix_lengths': prompt_prefixes.prefix_lengths(question, parts),
+  }
+
+
+class PromptPrefixesTest(absltest.TestCase):
+
+  def test_prefix_lengths(self):
+    self.assertEqual(
+        prompt_prefixes.prefix_lengths('abcdef', ['ab', 'cd']), [2, 4]
+    )
+    self.assertEqual(
+        prompt_prefixes.prefix_lengths('abcdef', ['ab', 'xy', 'ef']), [2]
+    )
+    self.assertEqual(prompt_prefixes.prefix_lengths('abcdef', ['xy']), [])
+
+  def test_group_by_prefix(self):
+    examples = [
+        (0, _example('F1 G1 Q1', 'F1 ', 'G1 ')),
+        (1, _example('F1 G2 Q1', 'F1 ', 'G2 ')),
+        (2, _example('F2 G1 Q1', 'F2 ', 'G1 ')),
+        (3, _example('F1 G1 Q2', 'F1 ', 'G1 ')),
+        (4, {'question': 'Q'}),
+        (5, _example('F1 G2 Q2', 'F1 ', 'G2 ')),
+    ]
+    grouped = prompt_prefixes.group_by_prefix(examples)
+    self.assertEqual([key for key, _ in grouped], [0, 3, 1, 5, 2, 4])
+
+  def test_prefix_manifest(self):
+    prompts = [
+        ('F1 G1 Q1', [3, 6]),
+        ('F1 G1 Q2', [3, 6]),
+        ('F1 G2 Q1', [3, 6]),
+        ('F2 G2 Q1', [3, 6]),
+        ('Q', []),
+    ]
+    self.assertEqual(
+        prompt_prefixes.prefix_manifest(prompts),
+        [
+            {'level': 0, 'start': 0, 'stop': 3, 'prefix_length': 3},
+            {'level': 1, 'start': 0, 'stop': 2, 'prefix_length': 6},
+        ],
+    )
+    self.assertEqual(prompt_prefixes.prefix_manifest([]), [])
+
+
+if __name__ == '__main__':
+  absltest.main()
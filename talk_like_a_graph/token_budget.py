@@ -0,0 +1,248 @@
+"""Fitting the examples of a build into the token budget of a serving context.
+
+Examples are checked once they are created. The graph encoding of an example
+over the budget is replaced by a more compact encoding with the same node names
+(see graph_text_encoders.grouped_adjacency_encoder and the like). For the tasks
+whose answers only depend on the nodes around the ones they ask about, the
+compact encoders are then tried on that neighborhood of the graph alone.
+Examples that still do not fit are dropped rather than written, and a
+TokenBudget counts what happened.
+
+Tokens are counted part by part (the prompt prefix, the graph encoding and the
+rest of the question) and each distinct part is only tokenized once, so the full
+prompts are never tokenized. The sum of the part counts can differ from the
+count of the whole prompt by about a token per part boundary.
+"""
+
+import collections
+from collections.abc import Callable, Sequence
+import functools
+
+import networkx as nx
+
+from . import graph_cache
+from . import graph_text_encoders
+
+# The graph encoders tried, in order, on the examples over budget.
+COMPACT_ENCODERS = ('grouped_adjacency', 'ranged_adjacency', 'csr')
+
+# The number of texts whose token counts a TokenCounter keeps.
+COUNT_CACHE_SIZE = 1024
+
+# The number of hops around the nodes of a question that keep its answer, for
+# the tasks whose answers are local. Reachability and shortest path also keep
+# the nodes of a shortest path between their two nodes.
+_SUBGRAPH_RADIUS = {
+    'edge_existence': 0,
+    'node_degree': 1,
+    'connected_nodes': 1,
+    'reachability': 0,
+    'shortest_path': 0,
+}
+
+
+class TokenCounter:
+  """Counts the tokens of texts, tokenizing each recently counted text once.
+
+  The counts of the cache_size most recently counted texts are kept, e.g. the
+  prompt prefixes and graph encodings shared by many prompts.
+  """
+
+  def __init__(
+      self,
+      tokenize: Callable[[str], Sequence[int]],
+      cache_size: int = COUNT_CACHE_SIZE,
+  ):
+    self.tokenize = tokenize
+    self._count = functools.lru_cache(maxsize=cache_size)(
+        lambda text: len(tokenize(text))
+    )
+
+  def count(self, text: str) -> int:
+    return self._count(text)
+
+  def count_encoding(
+      self, graph: nx.Graph, graph_encoder: str, max_tokens: int
+  ) -> tuple[str, int] | None:
+    """Encodes a graph chunk by chunk while counting its tokens.
+
+    The encoding stops as soon as it goes over max_tokens, so encodings far
+    over the budget are never rendered in full.
+
+    Args:
+      graph: the graph to be encoded.
+      graph_encoder: the name of the graph encoder to use.
+      max_tokens: the maximum number of tokens of the encoding.
+
+    Returns:
+      The encoding and its number of tokens, or None if it has more than
+      max_tokens tokens.
+    """
+    chunks = []
+    ntokens = 0
+    for chunk in graph_text_encoders.iter_encode_graph(graph, graph_encoder):
+      ntokens += len(self.tokenize(chunk))
+      if ntokens > max_tokens:
+        return None
+      chunks.append(chunk)
+    return ''.join(chunks), ntokens
+
+
+def answer_subgraph(
+    task_name: str, graph: nx.Graph, node_ids: list[int]
+) -> nx.Graph | None:
+  """Returns a subgraph on which a question has the same answer.
+
+  Unlike graph_tasks.ego_subgraph, the nodes keep their ids, so the names in the
+  question still refer to them.
+
+  Args:
+    task_name: the name of the task asking the question.
+    graph: the graph the question is about.
+    node_ids: the nodes the question is about.
+
+  Returns:
+    The subgraph, or None if the answer of the task is not local.
+  """
+  if task_name not in _SUBGRAPH_RADIUS or not node_ids:
+    return None
+  index = graph_cache.get_index(graph)
+  positions = index.ego_positions(
+      [index.position[node] for node in node_ids], _SUBGRAPH_RADIUS[task_name]
+  )
+  nodes = {index.nodes[position] for position in positions}
+  if task_name in ('reachability', 'shortest_path'):
+    nodes.update(index.shortest_path(*node_ids) or [])
+  # Keeping the nodes and edges in the order of the graph.
+  subgraph = graph.__class__()
+  subgraph.add_nodes_from(node for node in graph if node in nodes)
+  subgraph.add_edges_from(
+      (source, target)
+      for source, target in graph.edges()
+      if source in nodes and target in nodes
+  )
+  return subgraph
+
+
+class TokenBudget:
+  """Keeps the examples of a build within a maximum number of tokens.
+
+  Attributes:
+    max_tokens: the maximum number of tokens of a prompt.
+    counter: the TokenCounter counting the parts of the prompts.
+    compact_encoders: the graph encoders tried on examples over budget.
+    counts: the number of examples that fit as they are ('fit'), with a compact
+      encoding ('compact'), with a compact encoding of a subgraph ('subgraph'),
+      or not at all ('dropped').
+  """
+
+  def __init__(
+      self,
+      max_tokens: int,
+      tokenize: Callable[[str], Sequence[int]],
+      compact_encoders: Sequence[str] = COMPACT_ENCODERS,
+  ):
+    self.max_tokens = max_tokens
+    self.counter = TokenCounter(tokenize)
+    self.compact_encoders = compact_encoders
+    self.counts = collections.Counter()
+
+  def fit(
+      self,
+      task_name: str,
+      example: dict[str, str | list[int]],
+      encoding_method: str,
+      prefix: str = '',
+      compact_prefix: Callable[[str], str] | None = None,
+  ) -> tuple[dict[str, str | list[int]], str, int] | None:
+    """Fits an example into the budget.
+
+    Args:
+      task_name: the name of the task that created the example.
+      example: an example of GraphTask.prepare_examples_dict, created with
+        encoding_method. Its question starts with the encoding of its graph.
+      encoding_method: the graph encoder of the example.
+      prefix: the text before the question in the prompt, e.g. the few-shot
+        examples.
+      compact_prefix: if set, the prefix to use with a compact graph encoder,
+        e.g. few-shot examples with the same encoder. By default, the prefix is
+        kept.
+
+    Returns:
+      The example within the budget, the prefix to put before it and the number
+      of tokens of the prompt, or None if the example does not fit. An example
+      with a compact encoding is a new dict, with 'encoding_method' set to the
+      graph encoder used.
+    """
+    counter = self.counter
+    question = example['question']
+    if not graph_cache.is_reusable(encoding_method):
+      # Encoding the graph again would draw other random names, and change
+      # the random draws of the examples created after this one.
+      ntokens = counter.count(prefix) + counter.count(question)
+      return self._keep(example, prefix, ntokens)
+    encoding = graph_cache.encode_graph(example['graph'], encoding_method)
+    if not question.startswith(encoding):
+      # Only the parts of questions made of the encoding of their graph are
+      # counted apart.
+      ntokens = counter.count(prefix) + counter.count(question)
+      return self._keep(example, prefix, ntokens)
+    rest = question[len(encoding) :]
+    ntokens = (
+        counter.count(prefix) + counter.count(encoding) + counter.count(rest)
+    )
+    if ntokens <= self.max_tokens:
+      return self._keep(example, prefix, ntokens)
+    node_encoder = graph_text_encoders.get_tlag_node_encoder_name(
+        encoding_method
+    )
+    graph_encoders = [
+        graph_encoder
+        for graph_encoder in self.compact_encoders
+        if graph_text_encoders.get_tlag_node_encoder_name(graph_encoder)
+        == node_encoder
+    ]
+    graphs = [('compact', example['graph'])]
+    subgraph = answer_subgraph(
+        task_name, example['graph'], example['node_ids']
+    )
+    if subgraph is not None:
+      graphs.append(('subgraph', subgraph))
+    prefixes = {}
+    for outcome, graph in graphs:
+      for graph_encoder in graph_encoders:
+        if outcome == 'compact' and graph_encoder == encoding_method:
+          continue
+        if graph_encoder not in prefixes:
+          prefixes[graph_encoder] = prefix
+          if compact_prefix is not None:
+            prefixes[graph_encoder] = compact_prefix(graph_encoder)
+        graph_prefix = prefixes[graph_encoder]
+        other_tokens = counter.count(graph_prefix) + counter.count(rest)
+        fitted = counter.count_encoding(
+            graph, graph_encoder, self.max_tokens - other_tokens
+        )
+        if fitted is None:
+          continue
+        compact_encoding, encoding_tokens = fitted
+        self.counts[outcome] += 1
+        compact_example = dict(example)
+        compact_example.update(
+            question=compact_encoding + rest,
+            encoding_method=graph_encoder,
+            graph=graph,
+            nnodes=str(graph.number_of_nodes()),
+            nedges=str(graph.number_of_edges()),
+        )
+        return compact_example, graph_prefix, other_tokens + encoding_tokens
+    self.counts['dropped'] += 1
+    return None
+
+  def _keep(
+      self, example: dict[str, str | list[int]], prefix: str, ntokens: int
+  ) -> tuple[dict[str, str | list[int]], str, int] | None:
+    if ntokens > self.max_tokens:
+      self.counts['dropped'] += 1
+      return None
+    self.counts['fit'] += 1
+    return example, prefix, ntokens
@@ -0,0 +1,104 @@
+"""Testing for token_budget.py."""
+
+import random
+
+import networkx as nx
+
+from . import graph_tasks
+from . import graph_text_encoders
+from . import token_budget
+from absl.testing import absltest
+
+
+def _node_degree_example(graph: nx.Graph) -> dict[str, str | list[int]]:
+  random.seed(0)
+  return graph_tasks.NodeDegree().prepare_examples_dict(
+      [graph], ['er'], 'adjacency'
+  )[0]
+
+
+class TokenBudgetTest(absltest.TestCase):
+
+  def test_examples_within_budget_are_kept(self):
+    example = _node_degree_example(nx.gnp_random_graph(20, 0.2, seed=0))
+    budget = token_budget.TokenBudget(10_000, str.split)
+    fitted_example, prefix, ntokens = budget.fit(
+        'node_degree', example, 'adjacency', 'Example: '
+    )
+    self.assertIs(fitted_example, example)
+    self.assertEqual(prefix, 'Example: ')
+    self.assertEqual(ntokens, len((prefix + example['question']).split()))
+    self.assertEqual(budget.counts, {'fit': 1})
+
+  def test_compact_encodings(self):
+    graph = nx.gnp_random_graph(60, 0.2, seed=0)
+    example = _node_degree_example(graph)
+    encoding = graph_text_encoders.encode_graph(graph, 'grouped_adjacency')
+    rest = example['question'][
+        len(graph_text_encoders.encode_graph(graph, 'adjacency')) :
+    ]
+    max_tokens = len(encoding.split()) + len(rest.split())
+    budget = token_budget.TokenBudget(max_tokens, str.split)
+    fitted_example, _, ntokens = budget.fit('node_degree', example, 'adjacency')
+    self.assertEqual(fitted_example['question'], encoding + rest)
+    self.assertEqual(fitted_example['encoding_method'], 'grouped_adjacency')
+    self.assertEqual(fitted_example['answer'], example['answer'])
+    self.assertEqual(ntokens, max_tokens)
+    self.assertEqual(budget.counts, {'compact': 1})
+
+  def test_subgraphs_keep_the_answer(self):
+    graph = nx.gnp_random_graph(60, 0.2, seed=0)
+    example = _node_degree_example(graph)
+    budget = token_budget.TokenBudget(300, str.split)
+    fitted_example, _, _ = budget.fit('node_degree', example, 'adjacency')
+    subgraph = fitted_example['graph']
+    (node,) = example['node_ids']
+    self.assertLess(subgraph.number_of_nodes(), graph.number_of_nodes())
+    self.assertEqual(subgraph.degree(node), graph.degree(node))
+    self.assertEqual(fitted_example['answer'], example['answer'])
+    self.assertEqual(budget.counts, {'subgraph': 1})
+
+  def test_examples_over_budget_are_dropped(self):
+    random.seed(0)
+    example = graph_tasks.NodeCount().prepare_examples_dict(
+        [nx.gnp_random_graph(60, 0.2, seed=0)], ['er'], 'adjacency'
+    )[0]
+    budget = token_budget.TokenBudget(300, str.split)
+    self.assertIsNone(budget.fit('node_count', example, 'adjacency'))
+    self.assertEqual(budget.counts, {'dropped': 1})
+
+  def test_count_encoding_stops_early(self):
+    graph = nx.complete_graph(30)
+    counter = token_budget.TokenCounter(str.split)
+    encoding, ntokens = counter.count_encoding(graph, 'csr', 10_000)
+    self.assertEqual(encoding, graph_text_encoders.encode_graph(graph, 'csr'))
+    self.assertEqual(ntokens, len(encoding.split()))
+    self.assertIsNone(counter.count_encoding(graph, 'csr', ntokens - 1))
+
+  def test_counts_are_cached_up_to_cache_size(self):
+    tokenized = []
+
+    def tokenize(text):
+      tokenized.append(text)
+      return text.split()
+
+    counter = token_budget.TokenCounter(tokenize, cache_size=2)
+    for text in ('a b', 'c', 'a b', 'd e f', 'c', 'a b'):
+      self.assertEqual(counter.count(text), len(text.split()))
+    self.assertEqual(tokenized, ['a b', 'c', 'd e f', 'c', 'a b'])
+
+  def test_random_encodings_are_not_drawn_again(self):
+    random.seed(0)
+    example = graph_tasks.NodeDegree().prepare_examples_dict(
+        [nx.gnp_random_graph(20, 0.2, seed=0)], ['er'], 'random'
+    )[0]
+    random_state = random.getstate()
+    budget = token_budget.TokenBudget(10_000, str.split)
+    fitted_example, _, ntokens = budget.fit('node_degree', example, 'random')
+    self.assertIs(fitted_example, example)
+    self.assertEqual(ntokens, len(example['question'].split()))
+    self.assertEqual(random.getstate(), random_state)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,231 @@
+"""Cost-model-driven scheduling of the seeded creation of examples.
+
+Creating the examples of a graph costs very different times across tasks and
+graph sizes, e.g. maximum flow on a complete graph against node count. Chunks
+with the same number of graphs therefore leave the workers of
+graph_tasks_parallel imbalanced. A CostModel predicts the cost of each graph
+from a short calibration run, and plan_work_units splits the graphs into
+contiguous work units of about the same predicted cost. As the examples are
+seeded per graph, the output does not depend on the plan.
+"""
+
+import heapq
+import random
+import time
+
+import networkx as nx
+import numpy as np
+
+from . import graph_cache
+from . import graph_tasks
+
+
+def _features(nnodes: int, nedges: int) -> np.ndarray:
+  return np.asarray(
+      [1.0, nnodes, nedges, nnodes * nnodes, nnodes * nedges], dtype=np.float64
+  )
+
+
+class CostModel:
+  """Predicts the seconds a task takes on a graph from its size.
+
+  The cost of each task is a least-squares fit of the measured seconds on the
+  features [1, nnodes, nedges, nnodes^2, nnodes * nedges].
+
+  Attributes:
+    coefficients: a dict from task name to its fitted coefficients.
+  """
+
+  def __init__(self, coefficients: dict[str, np.ndarray]):
+    self.coefficients = coefficients
+
+  @classmethod
+  def fit(cls, samples: list[tuple[str, int, int, float]]) -> 'CostModel':
+    """Fits a cost model to (task name, nnodes, nedges, seconds) samples."""
+    task_samples = {}
+    for task_name, nnodes, nedges, seconds in samples:
+      task_samples.setdefault(task_name, []).append(
+          (_features(nnodes, nedges), seconds)
+      )
+    coefficients = {}
+    for task_name, points in task_samples.items():
+      features, seconds = zip(*points)
+      coefficients[task_name] = np.linalg.lstsq(
+          np.stack(features), np.asarray(seconds), rcond=None
+      )[0]
+    return cls(coefficients)
+
+  @classmethod
+  def calibrate(
+      cls,
+      tasks: list[graph_tasks.GraphTask],
+      graphs: list[nx.Graph],
+      generator_algorithms: list[str],
+      text_encoders: list[str],
+      num_samples: int = 20,
+  ) -> 'CostModel':
+    """Fits a cost model by timing the tasks on a sample of the graphs.
+
+    The tasks run on copies of evenly spaced graphs, and the global random
+    state is restored afterwards, so the calibration does not change the
+    examples created later. The tasks are timed without their cost guards and
+    with the graph_cache memo cleared, so that they neither count nor defer
+    graphs, nor run on the memoized oracle values of earlier graphs.
+
+    Args:
+      tasks: the tasks to time.
+      graphs: the graphs to sample from.
+      generator_algorithms: the algorithm used to generate each graph.
+      text_encoders: the encoders to use in the tasks.
+      num_samples: the number of graphs to time the tasks on.
+
+    Returns:
+      The fitted cost model.
+    """
+    random_state = random.getstate()
+    cost_guards = [task.cost_guard for task in tasks]
+    for task in tasks:
+      task.cost_guard = None
+    graph_cache.clear()
+    samples = []
+    try:
+      for ind in np.unique(
+          np.linspace(0, len(graphs) - 1, num=num_samples).astype(int)
+      ):
+        graph = graphs[ind].copy()
+        for task in tasks:
+          start = time.perf_counter()
+          for encoding_method in text_encoders:
+            task.prepare_examples_dict(
+                [graph], generator_algorithms[ind : ind + 1], encoding_method
+            )
+          samples.append((
+              task.name,
+              graph.number_of_nodes(),
+              graph.number_of_edges(),
+              time.perf_counter() - start,
+          ))
+    finally:
+      # The memoized values of the sampled graphs would make their later
+      # examples cheaper than predicted.
+      graph_cache.clear()
+      for task, cost_guard in zip(tasks, cost_guards):
+        task.cost_guard = cost_guard
+      random.setstate(random_state)
+    return cls.fit(samples)
+
+  def predict(self, task_name: str, nnodes: int, nedges: int) -> float:
+    """Returns the predicted seconds of a task on a graph of the given size."""
+    # Extrapolating a least-squares fit can go below zero.
+    return max(
+        float(_features(nnodes, nedges) @ self.coefficients[task_name]), 1e-6
+    )
+
+  def graph_cost(
+      self, tasks: list[graph_tasks.GraphTask], graph: nx.Graph
+  ) -> float:
+    """Returns the predicted seconds of all tasks on a graph."""
+    nnodes, nedges = graph.number_of_nodes(), graph.number_of_edges()
+    return sum(self.predict(task.name, nnodes, nedges) for task in tasks)
+
+
+def plan_work_units(
+    costs: list[float], num_units: int
+) -> list[tuple[int, int]]:
+  """Splits graphs into contiguous work units of about the same cost.
+
+  Args:
+    costs: the predicted cost of each graph.
+    num_units: the number of units to aim for. A graph costing at least a
+      unit on its own forms a unit by itself, so there can be more or fewer
+      units.
+
+  Returns:
+    The (start, stop) graph index bounds of each unit, in graph order.
+  """
+  target_cost = sum(costs) / max(num_units, 1)
+  units = []
+  start, unit_cost = 0, 0.0
+  for ind, cost in enumerate(costs):
+    if cost >= target_cost and ind > start:
+      units.append((start, ind))
+      start, unit_cost = ind, 0.0
+    unit_cost += cost
+    if unit_cost >= target_cost:
+      units.append((start, ind + 1))
+      start, unit_cost = ind + 1, 0.0
+  if start < len(costs):
+    units.append((start, len(costs)))
+  return units
+
+
+def estimate_completion_time(
+    unit_costs: list[float], num_workers: int
+) -> float:
+  """Estimates the time to run units handed out in order to free workers.
+
+  Args:
+    unit_costs: the cost of each unit, in the order they are handed out.
+    num_workers: the number of workers.
+
+  Returns:
+    The predicted time at which the last worker finishes.
+  """
+  finish_times = [0.0] * max(num_workers, 1)
+  for cost in unit_costs:
+    heapq.heapreplace(finish_times, finish_times[0] + cost)
+  return max(finish_times)
+
+
+class WorkPlan:
+  """Work units of about the same predicted cost for a build.
+
+  Attributes:
+    units: the (start, stop) graph index bounds of each unit, in graph order.
+    unit_costs: the predicted seconds of each unit.
+  """
+
+  def __init__(
+      self,
+      cost_model: CostModel,
+      tasks: list[graph_tasks.GraphTask],
+      graphs: list[nx.Graph],
+      text_encoders: list[str],
+      num_units: int,
+  ):
+    costs = [
+        cost_model.graph_cost(tasks, graph) * len(text_encoders)
+        for graph in graphs
+    ]
+    self.units = plan_work_units(costs, num_units)
+    self.unit_costs = [sum(costs[start:stop]) for start, stop in self.units]
+
+  def longest_first(self) -> list[int]:
+    """Returns the unit indices by decreasing cost.
+
+    Handing the units out in this order to free workers (the LPT rule) keeps
+    the cheap units for the end, which shortens the tail of the build.
+
+    Returns:
+      A permutation of range(len(units)).
+    """
+    return sorted(range(len(self.units)), key=lambda ind: -self.unit_costs[ind])
+
+  def estimated_seconds(
+      self, num_workers: int, longest_first: bool = True
+  ) -> float:
+    """Returns the predicted time to completion of the build.
+
+    Args:
+      num_workers: the number of workers.
+      longest_first: whether the units are handed out by decreasing cost
+        rather than in graph order.
+
+    Returns:
+      The predicted wall time in seconds.
+    """
+    if longest_first:
+      unit_costs = [self.unit_costs[ind] for ind in self.longest_first()]
+    else:
+      unit_costs = self.unit_costs
+    return estimate_completion_time(unit_costs, num_workers)
@@ -0,0 +1,72 @@
+"""Testing for work_scheduler.py."""
+
+import networkx as nx
+import numpy as np
+
+from . import graph_cache
+from . import graph_tasks
+from . import oracle_guards
+from . import work_scheduler
+from absl.testing import absltest
+
+
+class WorkSchedulerTest(absltest.TestCase):
+
+  def test_fit_recovers_the_cost(self):
+    samples = [
+        ('maximum_flow', nnodes, nedges, 0.5 + 0.01 * nnodes * nedges)
+        for nnodes, nedges in [(5, 4), (10, 20), (15, 60), (20, 150), (8, 9)]
+    ]
+    cost_model = work_scheduler.CostModel.fit(samples)
+    self.assertAlmostEqual(cost_model.predict('maximum_flow', 12, 30), 4.1)
+
+  def test_plan_work_units(self):
+    units = work_scheduler.plan_work_units([1, 1, 1, 1, 8, 1, 1, 1, 1], 3)
+    self.assertEqual(units, [(0, 4), (4, 5), (5, 9)])
+    self.assertEqual(
+        work_scheduler.plan_work_units([1] * 10, 4),
+        [(0, 3), (3, 6), (6, 9), (9, 10)],
+    )
+
+  def test_estimate_completion_time(self):
+    self.assertEqual(
+        work_scheduler.estimate_completion_time([1, 1, 1, 1, 4], 2), 6
+    )
+    self.assertEqual(
+        work_scheduler.estimate_completion_time([4, 1, 1, 1, 1], 2), 4
+    )
+
+  def test_work_plan_hands_out_longest_units_first(self):
+    cost_model = work_scheduler.CostModel(
+        {'node_count': np.asarray([0.0, 1.0, 0.0, 0.0, 0.0])}
+    )
+    graphs = [nx.path_graph(nnodes) for nnodes in (2, 2, 2, 2, 12)]
+    plan = work_scheduler.WorkPlan(
+        cost_model, [graph_tasks.NodeCount()], graphs, ['adjacency'], 2
+    )
+    self.assertEqual(plan.units, [(0, 4), (4, 5)])
+    plan = work_scheduler.WorkPlan(
+        cost_model, [graph_tasks.NodeCount()], graphs, ['adjacency'], 3
+    )
+    self.assertEqual(plan.units, [(0, 4), (4, 5)])
+    self.assertEqual(plan.longest_first(), [1, 0])
+    self.assertEqual(plan.estimated_seconds(2), 12)
+    self.assertEqual(plan.estimated_seconds(1), 20)
+
+  def test_calibrate_detaches_guards_and_clears_memo(self):
+    task = graph_tasks.ShortestPath()
+    task.cost_guard = oracle_guards.CostGuard(
+        max_memory={'shortest_path': 1}, defer=True
+    )
+    graphs = [nx.path_graph(nnodes) for nnodes in (4, 8, 12)]
+    cost_model = work_scheduler.CostModel.calibrate(
+        [task], graphs, ['path'] * 3, ['adjacency'], num_samples=3
+    )
+    self.assertIn('shortest_path', cost_model.coefficients)
+    self.assertEmpty(task.cost_guard.counts)
+    self.assertEmpty(task.cost_guard.deferred)
+    self.assertEmpty(graph_cache.memo_stats())
+
+
+if __name__ == '__main__':
+  absltest.main()